@@ -1,28 +1,99 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import hashlib
 import pandas as pd
 import numpy as np
 import os
-import scipy.stats as stats
 import sys
+import threading
+import warnings
 package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+from instrumentation import METRICS, call_in_worker, instrumented
+from lazy_imports import LazyModule
+#scipy.stats takes longer to import than everything else here, only the p-values need it
+stats = LazyModule('scipy.stats')
 
 import logging
-logging.basicConfig(filename='../logger.log', format='%(asctime)s %(levelname)s:%(name)s :: %(message)s', datefmt='%m/%d/%Y %H:%M:%S', encoding='utf-8', level=logging.DEBUG)
+import logging_config
+logging_config.configure_logging()
 Logger = logging.getLogger(__name__)
 
-def normalized_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
+#LRU cache of normalized frames shared by every entry point, keyed on the input frame's fingerprint and the filters
+NORMALIZATION_CACHE_SIZE = 32
+_normalization_cache = OrderedDict()
+_normalization_lock = threading.Lock()
+
+
+def frame_fingerprint(df):
     """
-    Create a dataframe of normalized fantasy points by age
+    Get a fingerprint of a dataframe's contents, labels and dtypes
+    Arguments:
+        df: pd.DataFrame, dataframe to fingerprint
+    Returns:
+        fingerprint: string, hex digest that changes whenever the dataframe does
+    """
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(df, index = True).to_numpy().tobytes())
+    h.update(repr((list(df.columns), [str(d) for d in df.dtypes])).encode())
+    return h.hexdigest()
+
+
+def clear_normalization_cache():
+    """
+    Empty the cache of normalized frames
+    Returns:
+        None
+    """
+    with _normalization_lock:
+        _normalization_cache.clear()
+
+
+def cached_normalized_fantasy_points(age_df, *, by = 'age', min_years = 0, fp_cutoff_flat = 0):
+    """
+    Get normalized fantasy points by age or by career season from the shared cache, computing them on a miss.
+      The returned frame is shared with the cache and must not be modified
+    Arguments:
+        age_df: pd.DataFrame, fantasy points by age
+        keyword:
+            by: string, default 'age', either 'age' or 'career_season'
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+    Returns:
+        df: pd.DataFrame, normalized fantasy points, with rows as players, columns as ages or career seasons
+    """
+    key = (frame_fingerprint(age_df), by, min_years, fp_cutoff_flat)
+    with _normalization_lock:
+        if key in _normalization_cache:
+            _normalization_cache.move_to_end(key)
+            return _normalization_cache[key]
+    if by == 'age':
+        fp_age = normalize_fantasy_points_by_age(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    elif by == 'career_season':
+        fp_age = normalize_fantasy_points_by_career_season(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    else:
+        raise ValueError("by must be 'age' or 'career_season', got {b}".format(b = by))
+    with _normalization_lock:
+        _normalization_cache[key] = fp_age
+        while len(_normalization_cache) > NORMALIZATION_CACHE_SIZE:
+            _normalization_cache.popitem(last = False)
+    return fp_age
+
+
+def normalize_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0):
+    """
+    Filter and normalize fantasy points by age, without caching
     Arguments:
         age_df: pd.DataFrame, fantasy points by age
         keyword:
             min_years: int, minimum number of years played
             fp_cutoff_flat: float, minimum fantasy points to have hit in a year
-            download: boolean, default false, whether to save the plot to the data/processed folder
     Returns:
         df: pd.DataFrame, normalized fantasy points by age, with rows as players, 
           columns as ages, entries as fantasy points in that season
     """
-    fp_age = age_df.copy()
+    fp_age = age_df
     initial_players = len(fp_age)
     #Get the players who have played a certain number of years
     fp_age = fp_age.dropna(axis = 0, thresh = min_years)
@@ -33,7 +104,76 @@ def normalized_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat =
     Logger.debug("Cut off {n} players: did not hit {p} fantasy points".format(n = players_left - len(fp_age), p = fp_cutoff_flat))
     Logger.debug("Players Left: {n}".format(n = len(fp_age)))
     #Normalize the fantasy points by scaling them to the player's best season
-    fp_age = fp_age.divide(fp_age.max(axis = 1), axis = 0)
+    return fp_age.divide(fp_age.max(axis = 1), axis = 0)
+
+
+def career_season_views(fp_age):
+    """
+    Re-index fantasy points by age to fantasy points by season in career (1 is rookie year) by shifting each
+      player's row to start at their first season, building the wide and unstacked views in one pass
+    Arguments:
+        fp_age: pd.DataFrame, fantasy points by age, with rows as players, columns as ages
+    Returns:
+        wide: pd.DataFrame, fantasy points by season in career, with rows as players (sorted by name),
+          columns as season in career, entries as fantasy points in that season
+        long: pd.DataFrame, fantasy points by season in career unstacked (Columns: Player Name, Career Season, Fantasy Points)
+    """
+    values = fp_age.to_numpy()
+    ages = np.asarray(fp_age.columns.astype(int))
+    present = ~np.isnan(values)
+    #Players with no seasons have no career
+    has_seasons = present.any(axis = 1)
+    values, present, players = values[has_seasons], present[has_seasons], fp_age.index[has_seasons]
+    #Players are sorted by name, as a pivot would
+    order = np.argsort(np.asarray(players, dtype = str), kind = 'stable')
+    values, present, players = values[order], present[order], players[order]
+    rows, cols = np.nonzero(present)
+    #Each player's career year is their age minus (first age - 1)
+    first_age = ages[present.argmax(axis = 1)]
+    career_years = ages[cols] - first_age[rows] + 1
+    career_labels, career_cols = np.unique(career_years, return_inverse = True)
+    career = np.full((len(players), len(career_labels)), np.nan, dtype = values.dtype)
+    career[rows, career_cols] = values[rows, cols]
+    wide = pd.DataFrame(career, index = pd.Index(players, name = 'Player Name'), columns = pd.Index(career_labels, name = 'Career Year'))
+    #Unstacked in career season order, then player order, as DataFrame.unstack would
+    long_cols, long_rows = np.nonzero(~np.isnan(career.T))
+    long = pd.DataFrame({'Player Name' : np.asarray(players)[long_rows], 'Career Season' : career_labels[long_cols], 'Fantasy Points' : career[long_rows, long_cols]})
+    return wide, long
+
+
+def normalize_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cutoff_flat = 0):
+    """
+    Filter and normalize fantasy points by season in career (1 is rookie year), reusing the cached
+      normalization by age
+    Arguments:
+        age_df: pd.DataFrame, fantasy points by age
+        keyword:
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+    Returns:
+        df: pd.DataFrame, normalized fantasy points by season in career, with rows as players, 
+          columns as season in career (1 is rookie year), entries as fantasy points in that season
+    """
+    #Normalize the fantasy points by scaling them to the player's best season
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    return career_season_views(fp_age)[0]
+
+
+@instrumented
+def normalized_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
+    """
+    Create a dataframe of normalized fantasy points by age
+    Arguments:
+        age_df: pd.DataFrame, fantasy points by age
+        keyword:
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            download: boolean, default false, whether to save the plot to the data/processed folder
+    Returns:
+        df: pd.DataFrame, normalized fantasy points by age, with rows as players, 
+          columns as ages, entries as fantasy points in that season
+    """
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat).copy()
     if download:
         if not os.path.exists(os.path.abspath('../data/')):
             Logger.debug('Making data folder')
@@ -45,6 +185,7 @@ def normalized_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat =
     return fp_age
 
 
+@instrumented
 def normalized_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
     """
     Create a dataframe of normalized fantasy points by season in career (1 is rookie year)
@@ -58,20 +199,7 @@ def normalized_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cuto
         df: pd.DataFrame, normalized fantasy points by season in career, with rows as players, 
           columns as season in career (1 is rookie year), entries as fantasy points in that season
     """
-    fp_age = age_df.copy()
-    #Normalize the fantasy points by scaling them to the player's best season
-    fp_age = normalized_fantasy_points_by_age(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    #Unstack the dataframe to get row entries of player name, age, fantasy oints
-    fp_age = fp_age.unstack().to_frame().reset_index(drop = False)
-    fp_age.columns = ['Age', 'Player Name', 'Fantasy Points']
-    #Drop rows where no fantasy points present
-    fp_age = fp_age[fp_age['Fantasy Points'].notnull()].reset_index(drop = True)
-    fp_age['Age'] = fp_age['Age'].astype(int)
-    #Get the career year by taking each player's minimum age in the dataset and subtracting that (min_age - 1) from their age
-    fp_age['Career Year'] = fp_age['Age'] - (fp_age.groupby('Player Name')['Age'].transform(np.min) - 1)
-    fp_age = fp_age[['Player Name', 'Career Year', 'Fantasy Points']]
-    #Pivot the table back to get the columns as the career year, index as player name, entries as fantasy points
-    fp_age = fp_age.pivot(index = 'Player Name', columns = 'Career Year', values = 'Fantasy Points')
+    fp_age = cached_normalized_fantasy_points(age_df, by = 'career_season', min_years = min_years, fp_cutoff_flat = fp_cutoff_flat).copy()
     if download:
         if not os.path.exists(os.path.abspath('../data/')):
             Logger.debug('Making data folder')
@@ -83,6 +211,7 @@ def normalized_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cuto
     return fp_age
     
 
+@instrumented
 def median_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
     """
     Create the final series of median fantasy points by age
@@ -95,9 +224,8 @@ def median_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, d
     Returns:
         df: pd.Series, median fantasy points by age
     """
-    fp_age = age_df.copy()
     #Get the normalized fantasy points by age
-    fp_age = normalized_fantasy_points_by_age(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
     #Calculate the median of each age
     fp_age = fp_age.median(axis = 0).sort_index()
     if download:
@@ -111,6 +239,7 @@ def median_fantasy_points_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, d
     return fp_age
 
 
+@instrumented
 def median_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
     """
     Create the final series of median fantasy points by season in career (1 is rookie year)
@@ -123,17 +252,10 @@ def median_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cutoff_f
     Returns:
         df: pd.Series, median fantasy points by season in career (1 is rookie)
     """
-    fp_age = age_df.copy()
-    #Normalize the fantasy points by scaling them to the player's best season
-    fp_age = normalized_fantasy_points_by_age(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    #Get the median fantasy points by age
-    fp_age = fp_age.unstack().to_frame().reset_index(drop = False)
-    fp_age.columns = ['Age', 'Player Name', 'Fantasy Points']
-    fp_age = fp_age[fp_age['Fantasy Points'].notnull()].reset_index(drop = True)
-    fp_age['Age'] = fp_age['Age'].astype(int)
-    fp_age['Career Year'] = fp_age['Age'] - (fp_age.groupby('Player Name')['Age'].transform(np.min) - 1)
-    fp_age = fp_age[['Player Name', 'Career Year', 'Fantasy Points']]
-    fp_age = fp_age[['Career Year', 'Fantasy Points']].groupby('Career Year').median()['Fantasy Points'].sort_index()
+    #Get the normalized fantasy points by season in career
+    fp_age = cached_normalized_fantasy_points(age_df, by = 'career_season', min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    #Calculate the median of each career season
+    fp_age = fp_age.median(axis = 0).rename('Fantasy Points')
     if download:
         if not os.path.exists(os.path.abspath('../data/')):
             Logger.debug('Making data folder')
@@ -144,6 +266,7 @@ def median_fantasy_points_by_career_season(age_df, *, min_years = 0, fp_cutoff_f
         fp_age.to_csv(os.path.abspath('../data/processed/median_fp_by_career_season_min_szn_{y}_fp_cutoff_{fp}.csv'.format(y = min_years, fp = fp_cutoff_flat)))
     return fp_age
 
+@instrumented
 def unstack_fantasy_points_and_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
     """
     Unstack the fantasy points by age dataframe
@@ -173,6 +296,7 @@ def unstack_fantasy_points_and_age(age_df, *, min_years = 0, fp_cutoff_flat = 0,
     return fp_age
 
 
+@instrumented
 def unstack_and_normalize_fantasy_points_and_age(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
     """
     Unstack and normalize the fantasy points by age dataframe
@@ -185,8 +309,7 @@ def unstack_and_normalize_fantasy_points_and_age(age_df, *, min_years = 0, fp_cu
     Returns:
         fp_age: pd.DataFrame, fantasy points by age unstacked (Columns: Player Name, Age, Fantasy Points)
     """
-    fp_age = age_df.copy()
-    fp_age = normalized_fantasy_points_by_age(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
     fp_age = fp_age.unstack().to_frame().reset_index(drop = False)
     fp_age.columns = ['Age', 'Player Name', 'Fantasy Points']
     fp_age = fp_age[fp_age['Fantasy Points'].notnull()].reset_index(drop = True)
@@ -203,6 +326,7 @@ def unstack_and_normalize_fantasy_points_and_age(age_df, *, min_years = 0, fp_cu
     return fp_age
 
 
+@instrumented
 def unstack_and_normalize_fantasy_points_and_career_season(age_df, *, min_years = 0, fp_cutoff_flat = 0, download = False):
     """
     Unstack age dataframe to fantasy points by career season dataframe
@@ -215,13 +339,9 @@ def unstack_and_normalize_fantasy_points_and_career_season(age_df, *, min_years
     Returns:
         fp_age: pd.DataFrame, fantasy points by career season unstacked (Columns: Player Name, Career Season, Fantasy Points)
     """
-    fp_age = age_df.copy()
-    fp_age = normalized_fantasy_points_by_career_season(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    fp_age = fp_age.unstack().to_frame().reset_index(drop = False)
-    fp_age.columns = ['Career Season', 'Player Name', 'Fantasy Points']
-    fp_age = fp_age[fp_age['Fantasy Points'].notnull()].reset_index(drop = True)
-    fp_age['Career Season'] = fp_age['Career Season'].astype(int)
-    fp_age = fp_age[['Player Name', 'Career Season', 'Fantasy Points']]
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    #Shift straight from the normalized ages to the unstacked career seasons, without pivoting in between
+    fp_age = career_season_views(fp_age)[1]
     if download:
         if not os.path.exists(os.path.abspath('../data/')):
             Logger.debug('Making data folder')
@@ -233,7 +353,76 @@ def unstack_and_normalize_fantasy_points_and_career_season(age_df, *, min_years
     return fp_age
 
 
-def paired_t_test_by_age(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0):
+def lag_list(lags):
+    """
+        Get the lags of a paired t-test as a list, checking that every one is a positive integer
+        Arguments:
+            lags: int or list of ints, how many columns apart the compared columns are
+        Returns:
+            lags: list, the lags
+    """
+    lags = [lags] if np.isscalar(lags) else list(lags)
+    for lag in lags:
+        if isinstance(lag, (bool, np.bool_)) or not isinstance(lag, (int, np.integer)) or lag < 1:
+            raise ValueError('lags must be positive integers, got {l}'.format(l = lags))
+    return lags
+
+
+def t_test_p_values(t, dof, *, alternative = 'greater'):
+    """
+        Get the p-values of t statistics
+        Arguments:
+            t: np.ndarray, t statistics
+            dof: np.ndarray, degrees of freedom of each t statistic
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis, one of 'less', 'greater' or 'two-sided'
+        Returns:
+            p: np.ndarray, p-value of each t statistic
+    """
+    if alternative == 'two-sided':
+        return 2 * stats.t.sf(np.abs(t), dof)
+    elif alternative == 'greater':
+        return stats.t.sf(t, dof)
+    elif alternative == 'less':
+        return stats.t.cdf(t, dof)
+    raise ValueError("alternative must be 'less', 'greater' or 'two-sided', got {a}".format(a = alternative))
+
+
+def paired_t_test_table(fp_df, *, alternative = 'greater', lags = 1):
+    """
+        Get the paired t-test statistics for every jump between columns of a normalized dataframe in one
+          vectorized pass, equivalent to calling stats.ttest_rel on each pair of columns
+        Arguments:
+            fp_df: pd.DataFrame, normalized fantasy points, with rows as players, columns as ages or career seasons
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+                lags: int or list of ints, default 1, how many columns apart the compared columns are
+                  (1 compares consecutive columns, e.g. 23-24, 2 compares e.g. 23-25)
+        Returns:
+            t_tests: pd.DataFrame, with a row per jump (e.g. 23-24) and columns n, Mean Difference,
+              Std Difference, T-statistic and P-value. Jumps with fewer than two players are left out
+    """
+    lags = lag_list(lags)
+    values = fp_df.to_numpy(dtype = float)
+    columns = [str(c) for c in fp_df.columns]
+    #Stack the earlier minus later season differences of every lag side by side
+    jump_names = [columns[i] + '-' + columns[i + lag] for lag in lags for i in range(len(columns) - lag)]
+    diffs = np.concatenate([values[:, :-lag] - values[:, lag:] for lag in lags if lag < len(columns)] + [np.empty((len(values), 0))], axis = 1)
+    #Players only count towards a jump if they have entries for both seasons
+    valid = ~np.isnan(diffs)
+    n = valid.sum(axis = 0)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = np.where(valid, diffs, 0).sum(axis = 0) / n
+        std = np.sqrt((np.where(valid, diffs - mean, 0) ** 2).sum(axis = 0) / (n - 1))
+        t = mean / (std / np.sqrt(n))
+    p = t_test_p_values(t, n - 1, alternative = alternative)
+    t_tests = pd.DataFrame({'n' : n, 'Mean Difference' : mean, 'Std Difference' : std, 'T-statistic' : t, 'P-value' : p}, index = jump_names)
+    #Need at least two values in sample to calculate paired t-test
+    return t_tests[t_tests['n'] > 1]
+
+
+@instrumented
+def paired_t_test_by_age(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0, lags = 1):
     """
         Get a table of paired t-test p-values by age jump
         Arguments:
@@ -242,26 +431,16 @@ def paired_t_test_by_age(age_df, *, alternative = 'greater', min_years = 0, fp_c
             alternative: string, default 'greater', alternative hypothesis for paired t-test
             min_years: int, minimum number of years played
             fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            lags: int or list of ints, default 1, how many ages apart the compared ages are
         Returns:
             p_values: pd.DataFrame, paired t-test p-values by age jumps
     """
-    fp_age = age_df.copy()
-    fp_age = normalized_fantasy_points_by_age(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    p_values = pd.Series()
-    for i in range(len(fp_age.columns) - 1):
-        #Create the column name to show the age comparison/jump (e.g. 23-24)
-        col_name = str(fp_age.columns[i]) + '-' + str(fp_age.columns[i + 1])
-        #Get players who have entries at both ages for comparison
-        temp_df = fp_age[fp_age[fp_age.columns[i]].notnull() & fp_age[fp_age.columns[i + 1]].notnull()]
-        #Need at least two values in sample to calculate paired t-test
-        if len(temp_df) <= 1:
-            continue
-        #Calculate paired t-test p-value
-        p_values[col_name] = stats.ttest_rel(temp_df[fp_age.columns[i]], temp_df[fp_age.columns[i + 1]], alternative = alternative)[1]
-    return p_values
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    return paired_t_test_table(fp_age, alternative = alternative, lags = lags)['P-value'].rename(None)
 
 
-def paired_t_test_by_career_season(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0):
+@instrumented
+def paired_t_test_by_career_season(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0, lags = 1):
     """
         Get a table of paired t-test p-values by career season jumps
         Arguments:
@@ -270,25 +449,96 @@ def paired_t_test_by_career_season(age_df, *, alternative = 'greater', min_years
                 alternative: string, default 'greater', alternative hypothesis for paired t-test
                 min_years: int, minimum number of years played
                 fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+                lags: int or list of ints, default 1, how many career seasons apart the compared seasons are
         Returns:
             p_values: pd.DataFrame, paired t-test p-values by age jumps
     """
-    fp_age = age_df.copy()
-    fp_age = normalized_fantasy_points_by_career_season(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    p_values = pd.Series()
-    for i in range(len(fp_age.columns) - 1):
-        #Create the column name to show the career season comparison/jump (e.g. 3-4)
-        col_name = str(fp_age.columns[i]) + '-' + str(fp_age.columns[i + 1])
-        #Get players who have entries at both career seasons for comparison
-        temp_df = fp_age[fp_age[fp_age.columns[i]].notnull() & fp_age[fp_age.columns[i + 1]].notnull()]
-        #Need at least two values in sample to calculate paired t-test
-        if len(temp_df) <= 1:
-            continue
-        #Calculate paired t-test p-value
-        p_values[col_name] = stats.ttest_rel(temp_df[temp_df.columns[i]], temp_df[temp_df.columns[i + 1]], alternative = alternative)[1]
-    return p_values
+    fp_age = cached_normalized_fantasy_points(age_df, by = 'career_season', min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    return paired_t_test_table(fp_age, alternative = alternative, lags = lags)['P-value'].rename(None)
+
+
+def stack_cohorts(fp_dfs):
+    """
+        Stack the normalized fantasy points of several cohorts into one array, each cohort keeping its own columns in
+          order along the last axis, so a jump is always between a cohort's own neighbouring columns (e.g. 24-26 for a
+          cohort nobody in played at 25). Cohorts are padded with NaN rows up to the largest one and NaN columns up to
+          the one with the most columns
+        Arguments:
+            fp_dfs: dictionary, cohort to normalized fantasy points, with rows as players, columns as ages or career seasons
+        Returns:
+            values: np.ndarray, cohorts x players x columns normalized fantasy points
+            labels: list, columns of each cohort, the labels of its slice of the last axis
+    """
+    labels = [fp_df.columns for fp_df in fp_dfs.values()]
+    values = np.full((len(fp_dfs), max([len(fp_df) for fp_df in fp_dfs.values()], default = 0), max([len(l) for l in labels], default = 0)), np.nan)
+    for i, fp_df in enumerate(fp_dfs.values()):
+        values[i, :len(fp_df), :len(fp_df.columns)] = fp_df.to_numpy(dtype = float)
+    return values, labels
+
+
+def paired_t_test_stack(values, *, alternative = 'greater', lags = 1):
+    """
+        Get the paired t-test statistics of every jump of every cohort in one batched pass over a stacked array,
+          equivalent to paired_t_test_table on each cohort
+        Arguments:
+            values: np.ndarray, cohorts x players x columns normalized fantasy points, as stack_cohorts returns
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+                lags: int or list of ints, default 1, how many columns apart the compared columns are
+        Returns:
+            jumps: list, (earlier, later) column index of each jump
+            t_tests: dictionary, n, Mean Difference, Std Difference, T-statistic and P-value, each a cohorts x jumps
+              np.ndarray. Jumps of a cohort with fewer than two players are NaN
+    """
+    lags = lag_list(lags)
+    n_labels = values.shape[2]
+    jumps = [(i, i + lag) for lag in lags for i in range(n_labels - lag)]
+    #Earlier minus later season of every jump, cohorts x players x jumps
+    diffs = np.concatenate([values[:, :, :-lag] - values[:, :, lag:] for lag in lags if lag < n_labels] + [np.empty(values.shape[:2] + (0,))], axis = 2)
+    valid = ~np.isnan(diffs)
+    n = valid.sum(axis = 1)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = np.where(valid, diffs, 0).sum(axis = 1) / n
+        std = np.sqrt((np.where(valid, diffs - mean[:, None, :], 0) ** 2).sum(axis = 1) / (n - 1))
+        t = mean / (std / np.sqrt(n))
+    p = t_test_p_values(t, n - 1, alternative = alternative)
+    tested = n > 1
+    return jumps, {'n' : n, 'Mean Difference' : np.where(tested, mean, np.nan), 'Std Difference' : np.where(tested, std, np.nan), 'T-statistic' : np.where(tested, t, np.nan), 'P-value' : np.where(tested, p, np.nan)}
+
+
+@instrumented
+def paired_t_test_by_cohort(age_dfs, *, by = 'age', alternative = 'greater', min_years_dict = {}, fp_cutoff_flat_dict = {}, lags = 1):
+    """
+        Get a table of paired t-test p-values by jump for any number of cohorts (positions, draft eras, draft rounds, ...),
+          tested together in one batched pass
+        Arguments:
+            age_dfs: dictionary, cohort to fantasy points by age dataframe
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+                min_years_dict: dictionary, minimum number of years played by cohort. Default is 0 for all cohorts
+                fp_cutoff_flat_dict: dictionary, minimum fantasy points to have hit in a year by cohort. Default is 0 for all cohorts
+                lags: int or list of ints, default 1, how many ages or career seasons apart the compared seasons are
+        Returns:
+            p_values: pd.DataFrame, paired t-test p-values by jump, with each row as a cohort
+    """
+    if by not in ('age', 'career_season'):
+        raise ValueError("by must be 'age' or 'career_season', got {b}".format(b = by))
+    fp_dfs = {cohort : cached_normalized_fantasy_points(age_df, by = by, min_years = min_years_dict.get(cohort, 0), fp_cutoff_flat = fp_cutoff_flat_dict.get(cohort, 0)) for cohort, age_df in age_dfs.items()}
+    values, labels = stack_cohorts(fp_dfs)
+    jumps, t_tests = paired_t_test_stack(values, alternative = alternative, lags = lags)
+    p_values = []
+    for k, (cohort, columns) in enumerate(zip(fp_dfs, labels)):
+        #Each cohort keeps the jumps between its own columns that have two players, NaN p-values included, as
+        #paired_t_test_table gives them
+        tested = [m for m, (i, j) in enumerate(jumps) if j < len(columns) and t_tests['n'][k, m] > 1]
+        p_values.append(pd.Series(t_tests['P-value'][k, tested], index = [str(columns[jumps[m][0]]) + '-' + str(columns[jumps[m][1]]) for m in tested], name = cohort, dtype = float))
+    #Then the cohorts are aligned as the per-position concat always did
+    p_values = pd.concat(p_values, axis = 1)
+    return p_values.T.dropna(axis = 1, how = 'all')
 
 
+@instrumented
 def paired_t_test_by_age_and_position(qb_age_df, rb_age_df, wr_age_df, te_age_df, *, alternative = 'greater', min_years_dict = {}, fp_cutoff_flat_dict = {}, download = False):
     """
         Get a table of paired t-test p-values by age jump, where each row is a position
@@ -305,21 +555,8 @@ def paired_t_test_by_age_and_position(qb_age_df, rb_age_df, wr_age_df, te_age_df
         Returns:
             p_values: pd.DataFrame, paired t-test p-values by age jumps, with each row as a position
     """
-    #Perform the paired t_tests for each position
-    qb_p_values = paired_t_test_by_age(qb_age_df, min_years = min_years_dict.get('QB', 0), alternative = alternative, fp_cutoff_flat = fp_cutoff_flat_dict.get('QB', 0))
-    rb_p_values = paired_t_test_by_age(rb_age_df, min_years = min_years_dict.get('RB', 0), alternative = alternative, fp_cutoff_flat = fp_cutoff_flat_dict.get('RB', 0))
-    wr_p_values = paired_t_test_by_age(wr_age_df, min_years = min_years_dict.get('WR', 0), alternative = alternative, fp_cutoff_flat = fp_cutoff_flat_dict.get('WR', 0))
-    te_p_values = paired_t_test_by_age(te_age_df, min_years = min_years_dict.get('TE', 0), alternative = alternative, fp_cutoff_flat = fp_cutoff_flat_dict.get('TE', 0))
-    #Name each of the resulting series
-    qb_p_values.name = 'QB'
-    rb_p_values.name = 'RB'
-    wr_p_values.name = 'WR'
-    te_p_values.name = 'TE'
-    #Concatenate the series into a dataframe
-    p_values = pd.concat([qb_p_values, rb_p_values, wr_p_values, te_p_values], axis = 1)
-    #Transpose the dataframe to make the rows positions and drop null columns
-    p_values = p_values.T
-    p_values = p_values.dropna(axis = 1, how = 'all')
+    age_dfs = {'QB' : qb_age_df, 'RB' : rb_age_df, 'WR' : wr_age_df, 'TE' : te_age_df}
+    p_values = paired_t_test_by_cohort(age_dfs, by = 'age', alternative = alternative, min_years_dict = min_years_dict, fp_cutoff_flat_dict = fp_cutoff_flat_dict)
     if download:
         if not os.path.exists(os.path.abspath('../data/')):
             Logger.debug('Making data folder')
@@ -330,6 +567,7 @@ def paired_t_test_by_age_and_position(qb_age_df, rb_age_df, wr_age_df, te_age_df
         p_values.to_csv(os.path.abspath('../data/processed/p_values_by_age.csv'))
     return p_values
 
+@instrumented
 def paired_t_test_by_career_season_and_position(qb_age_df, rb_age_df, wr_age_df, te_age_df, *, alternative = 'greater', min_years_dict = {}, fp_cutoff_flat_dict = {}, download = False):
     """
         Get a table of paired t-test p-values by season in career jump, where each row is a position
@@ -346,21 +584,8 @@ def paired_t_test_by_career_season_and_position(qb_age_df, rb_age_df, wr_age_df,
         Returns:
             p_values: pd.DataFrame, paired t-test p-values by age jumps, with each row as a position
     """
-    #Perform the paired t_tests for each position
-    qb_p_values = paired_t_test_by_career_season(qb_age_df, alternative = alternative, min_years = min_years_dict.get('QB', 0), fp_cutoff_flat = fp_cutoff_flat_dict.get('QB', 0))
-    rb_p_values = paired_t_test_by_career_season(rb_age_df, alternative = alternative, min_years = min_years_dict.get('RB', 0), fp_cutoff_flat = fp_cutoff_flat_dict.get('RB', 0))
-    wr_p_values = paired_t_test_by_career_season(wr_age_df, alternative = alternative, min_years = min_years_dict.get('WR', 0), fp_cutoff_flat = fp_cutoff_flat_dict.get('WR', 0))
-    te_p_values = paired_t_test_by_career_season(te_age_df, alternative = alternative, min_years = min_years_dict.get('TE', 0), fp_cutoff_flat = fp_cutoff_flat_dict.get('TE', 0))
-    #Name each of the resulting series
-    qb_p_values.name = 'QB'
-    rb_p_values.name = 'RB'
-    wr_p_values.name = 'WR'
-    te_p_values.name = 'TE'
-    #Concatenate the series into a dataframe
-    p_values = pd.concat([qb_p_values, rb_p_values, wr_p_values, te_p_values], axis = 1)
-    #Transpose the dataframe to make the rows positions and drop null columns
-    p_values = p_values.T
-    p_values = p_values.dropna(axis = 1, how = 'all')
+    age_dfs = {'QB' : qb_age_df, 'RB' : rb_age_df, 'WR' : wr_age_df, 'TE' : te_age_df}
+    p_values = paired_t_test_by_cohort(age_dfs, by = 'career_season', alternative = alternative, min_years_dict = min_years_dict, fp_cutoff_flat_dict = fp_cutoff_flat_dict)
     if download:
         if not os.path.exists(os.path.abspath('../data/')):
             Logger.debug('Making data folder')
@@ -371,6 +596,7 @@ def paired_t_test_by_career_season_and_position(qb_age_df, rb_age_df, wr_age_df,
         p_values.to_csv(os.path.abspath('../data/processed/p_values_by_career_season.csv'))
     return p_values
 
+@instrumented
 def median_differences_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0):
     """
         Get a table of changes in median by age jump
@@ -382,9 +608,8 @@ def median_differences_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0):
         Returns:
             med_diffs: pd.DataFrame, difference in median between ages
     """
-    fp_age = age_df.copy()
-    fp_age = normalized_fantasy_points_by_age(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    med_vals = pd.Series()
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    med_vals = pd.Series(dtype = float)
     for i in range(len(fp_age.columns) - 1):
         #Create the column name to show the age comparison/jump (e.g. 23-24)
         col_name = str(fp_age.columns[i]) + '-' + str(fp_age.columns[i + 1])
@@ -392,6 +617,7 @@ def median_differences_by_age(age_df, *, min_years = 0, fp_cutoff_flat = 0):
         med_vals[col_name] = fp_age[fp_age.columns[i + 1]].median() - fp_age[fp_age.columns[i]].median()
     return med_vals
 
+@instrumented
 def median_differences_by_career_season(age_df, *, min_years = 0, fp_cutoff_flat = 0):
     """
         Get a table of changes in median by season in career jump
@@ -403,9 +629,8 @@ def median_differences_by_career_season(age_df, *, min_years = 0, fp_cutoff_flat
         Returns:
             med_diffs: pd.DataFrame, difference in median between career seasons
     """
-    fp_age = age_df.copy()
-    fp_age = normalized_fantasy_points_by_career_season(fp_age, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
-    med_vals = pd.Series()
+    fp_age = cached_normalized_fantasy_points(age_df, by = 'career_season', min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    med_vals = pd.Series(dtype = float)
     for i in range(len(fp_age.columns) - 1):
         #Create the column name to show the age comparison/jump (e.g. 23-24)
         col_name = str(fp_age.columns[i]) + '-' + str(fp_age.columns[i + 1])
@@ -414,6 +639,7 @@ def median_differences_by_career_season(age_df, *, min_years = 0, fp_cutoff_flat
     return med_vals
 
 
+@instrumented
 def median_and_p_vals_by_age(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0):
     """
         Get a table of changes in median and paired t-test p-values by age jump
@@ -433,6 +659,7 @@ def median_and_p_vals_by_age(age_df, *, alternative = 'greater', min_years = 0,
     return medians_and_p_vals
 
 
+@instrumented
 def median_and_p_vals_by_career_season(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0):
     """
         Get a table of changes in median and paired t-test p-values by age jump
@@ -449,4 +676,177 @@ def median_and_p_vals_by_career_season(age_df, *, alternative = 'greater', min_y
     p_vals = paired_t_test_by_career_season(age_df, alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
     medians_and_p_vals = pd.concat([medians, p_vals], axis = 1)
     medians_and_p_vals.columns = ['Change in Median', 'P-value']
-    return medians_and_p_vals
\ No newline at end of file
+    return medians_and_p_vals
+
+def resampled_jump_statistics(fp_df, *, alternative = 'greater', n_resamples = 10000, confidence = .95, seed = None, chunk_size = None):
+    """
+        Get bootstrap confidence intervals on the change in median and sign-flip permutation test p-values for every
+          jump between consecutive columns, drawing one matrix of resamples per jump instead of looping over resamples
+        Arguments:
+            fp_df: pd.DataFrame, normalized fantasy points, with rows as players, columns as ages or career seasons
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis for the permutation test, same meaning as for the paired t-test
+                n_resamples: int, default 10000, number of bootstrap resamples and of permutations per jump
+                confidence: float, default .95, confidence level of the bootstrap intervals
+                seed: int, default None, random seed
+                chunk_size: int, default None (all at once), number of resamples to draw at a time, to cap memory
+        Returns:
+            intervals: pd.DataFrame, with a row per jump (e.g. 23-24) and columns Median CI Lower, Median CI Upper and Permutation P-value
+    """
+    if alternative not in ('less', 'greater', 'two-sided'):
+        raise ValueError("alternative must be 'less', 'greater' or 'two-sided', got {a}".format(a = alternative))
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or n_resamples
+    chunks = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    values = fp_df.to_numpy(dtype = float)
+    columns = [str(c) for c in fp_df.columns]
+    intervals = pd.DataFrame(np.nan, index = [columns[i] + '-' + columns[i + 1] for i in range(len(columns) - 1)], columns = ['Median CI Lower', 'Median CI Upper', 'Permutation P-value'])
+    for i in range(len(columns) - 1):
+        earlier, later = values[:, i], values[:, i + 1]
+        #Bootstrap the change in median by resampling the players with an entry at either season
+        players = ~np.isnan(earlier) | ~np.isnan(later)
+        earlier_players, later_players = earlier[players], later[players]
+        if players.any():
+            boot = []
+            with warnings.catch_warnings():
+                #Resamples that happen to draw no entries at one of the seasons have no median
+                warnings.simplefilter('ignore', RuntimeWarning)
+                for size in chunks:
+                    idx = rng.integers(0, len(earlier_players), (size, len(earlier_players)))
+                    boot.append(np.nanmedian(later_players[idx], axis = 1) - np.nanmedian(earlier_players[idx], axis = 1))
+            boot = np.concatenate(boot)
+            intervals.iloc[i, :2] = np.nanpercentile(boot, [50 * (1 - confidence), 50 * (1 + confidence)])
+        #Permutation test of the paired differences, flipping the sign of each player's difference at random
+        paired = ~np.isnan(earlier) & ~np.isnan(later)
+        diffs = earlier[paired] - later[paired]
+        if len(diffs) > 1:
+            observed = diffs.mean()
+            extreme = 0
+            for size in chunks:
+                permuted = (rng.choice([-1.0, 1.0], (size, len(diffs))) * diffs).mean(axis = 1)
+                if alternative == 'greater':
+                    extreme += (permuted >= observed).sum()
+                elif alternative == 'less':
+                    extreme += (permuted <= observed).sum()
+                else:
+                    extreme += (np.abs(permuted) >= abs(observed)).sum()
+            intervals.iloc[i, 2] = (extreme + 1) / (n_resamples + 1)
+    return intervals
+
+
+@instrumented
+def median_and_p_vals_with_intervals_by_age(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0, n_resamples = 10000, confidence = .95, seed = None, chunk_size = None):
+    """
+        Get a table of changes in median and paired t-test p-values by age jump, with bootstrap confidence
+          intervals on the change in median and permutation test p-values
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age
+        keyword:
+            alternative: string, default 'greater', alternative hypothesis for paired t-test and permutation test
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            n_resamples: int, default 10000, number of bootstrap resamples and of permutations per jump
+            confidence: float, default .95, confidence level of the bootstrap intervals
+            seed: int, default None, random seed
+            chunk_size: int, default None (all at once), number of resamples to draw at a time, to cap memory
+        Returns:
+            med_diffs: pd.DataFrame, difference in median between ages, its confidence interval, and p-values
+    """
+    medians_and_p_vals = median_and_p_vals_by_age(age_df, alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    fp_age = cached_normalized_fantasy_points(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    intervals = resampled_jump_statistics(fp_age, alternative = alternative, n_resamples = n_resamples, confidence = confidence, seed = seed, chunk_size = chunk_size)
+    return pd.concat([medians_and_p_vals, intervals], axis = 1)
+
+
+@instrumented
+def median_and_p_vals_with_intervals_by_career_season(age_df, *, alternative = 'greater', min_years = 0, fp_cutoff_flat = 0, n_resamples = 10000, confidence = .95, seed = None, chunk_size = None):
+    """
+        Get a table of changes in median and paired t-test p-values by career season jump, with bootstrap
+          confidence intervals on the change in median and permutation test p-values
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age
+        keyword:
+            alternative: string, default 'greater', alternative hypothesis for paired t-test and permutation test
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            n_resamples: int, default 10000, number of bootstrap resamples and of permutations per jump
+            confidence: float, default .95, confidence level of the bootstrap intervals
+            seed: int, default None, random seed
+            chunk_size: int, default None (all at once), number of resamples to draw at a time, to cap memory
+        Returns:
+            med_diffs: pd.DataFrame, difference in median between career seasons, its confidence interval, and p-values
+    """
+    medians_and_p_vals = median_and_p_vals_by_career_season(age_df, alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    fp_age = cached_normalized_fantasy_points(age_df, by = 'career_season', min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    intervals = resampled_jump_statistics(fp_age, alternative = alternative, n_resamples = n_resamples, confidence = confidence, seed = seed, chunk_size = chunk_size)
+    return pd.concat([medians_and_p_vals, intervals], axis = 1)
+
+
+@instrumented
+def sweep_grid_point_task(task):
+    """
+        Compute the medians and paired t-tests for every fp_cutoff_flat at one position and min_years,
+          run in a worker process by sweep_parameters
+        Arguments:
+            task: tuple of (position, by, alternative, fp_df, seasons_played, best_season, min_years, fp_cutoff_flats),
+              where fp_df is the position normalized under the loosest filters of the sweep and seasons_played
+              and best_season are each player's number of seasons and most fantasy points in a season
+        Returns:
+            results: list of pd.DataFrame, one tidy table per fp_cutoff_flat
+    """
+    position, by, alternative, fp_df, seasons_played, best_season, min_years, fp_cutoff_flats = task
+    results = []
+    for fp_cutoff_flat in fp_cutoff_flats:
+        #The filters only ever remove whole players, so every grid point is a subset of the loosest one
+        sub = fp_df[(seasons_played >= min_years) & (best_season > fp_cutoff_flat)]
+        if by == 'career_season':
+            #The career season pivot only has columns for seasons someone in the sample played
+            sub = sub.dropna(axis = 1, how = 'all')
+        medians = sub.median(axis = 0)
+        med_diffs = pd.Series(medians.iloc[1:].to_numpy() - medians.iloc[:-1].to_numpy(), index = [str(sub.columns[i]) + '-' + str(sub.columns[i + 1]) for i in range(len(sub.columns) - 1)])
+        t_tests = paired_t_test_table(sub, alternative = alternative)
+        result = pd.concat([med_diffs.rename('Change in Median'), t_tests[['n', 'P-value']]], axis = 1)
+        result.index.name = 'Jump'
+        result = result.reset_index()
+        result.insert(0, 'Position', position)
+        result.insert(1, 'Min Years', min_years)
+        result.insert(2, 'FP Cutoff', fp_cutoff_flat)
+        results.append(result)
+    return results
+
+
+@instrumented
+def sweep_parameters(age_dfs, min_years_grid, fp_cutoff_flat_grid, *, by = 'age', alternative = 'greater', max_workers = None):
+    """
+        Get the changes in median and paired t-test p-values for every combination of min_years and
+          fp_cutoff_flat at every position, normalizing each position once and running the grid across a process pool
+        Arguments:
+            age_dfs: dictionary, position to pd.DataFrame of fantasy points by age, e.g. {'QB' : qb_age_df}
+            min_years_grid: list of ints, minimum numbers of years played to try
+            fp_cutoff_flat_grid: list of floats, minimum fantasy points to have hit in a year to try
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+                max_workers: int, default None (one per CPU), number of worker processes, 1 runs in this process
+        Returns:
+            sweep: pd.DataFrame, one row per position, min_years, fp_cutoff_flat and jump, with columns Position,
+              Min Years, FP Cutoff, Jump, Change in Median, n and P-value
+    """
+    tasks = []
+    for position, age_df in age_dfs.items():
+        #Each player's normalized season only depends on their own best season, so normalize under the loosest filters once
+        fp_df = cached_normalized_fantasy_points(age_df, by = by, min_years = min(min_years_grid), fp_cutoff_flat = min(fp_cutoff_flat_grid))
+        fp_age = age_df.loc[fp_df.index]
+        seasons_played = fp_age.notnull().sum(axis = 1)
+        best_season = fp_age.max(axis = 1)
+        for min_years in min_years_grid:
+            tasks.append((position, by, alternative, fp_df, seasons_played, best_season, min_years, list(fp_cutoff_flat_grid)))
+    if max_workers == 1:
+        results = [sweep_grid_point_task(task) for task in tasks]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers = max_workers) as executor:
+            for task_results, metrics in executor.map(functools.partial(call_in_worker, sweep_grid_point_task), tasks):
+                METRICS.merge(metrics)
+                results.append(task_results)
+    return pd.concat([result for task_results in results for result in task_results], ignore_index = True)
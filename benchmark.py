@@ -0,0 +1,511 @@
+import numpy as np
+import os
+import argparse
+import inspect
+import json
+import pandas as pd
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+import etl
+import viz
+
+
+def synthetic_career_stats(n_players, *, seed = 0):
+    """
+    Generate career stats tables shaped like the ones returned by pfr_scraping
+    Arguments:
+        n_players: int, number of players to generate
+        keyword:
+            seed: int, default 0, random seed
+    Returns:
+        career_stats: dictionary, player name to career stats dataframe with 'Age' and '*Fantasy Points*' columns
+    """
+    rng = np.random.default_rng(seed)
+    start_ages = rng.integers(21, 25, n_players)
+    n_seasons = rng.integers(1, 12, n_players)
+    career_stats = {}
+    for i in range(n_players):
+        ages = np.arange(start_ages[i], min(start_ages[i] + n_seasons[i], 46))
+        career_stats['Player {i:07d}'.format(i = i)] = pd.DataFrame({'Age' : ages, '*Fantasy Points*' : rng.uniform(0, 350, len(ages)).round(2)})
+    return career_stats
+
+
+def merge_fantasy_points_by_age(career_stats):
+    """
+    Reference implementation of the old ETL assembly, merging one player at a time
+    Arguments:
+        career_stats: dictionary, player name to career stats dataframe
+    Returns:
+        df: pandas dataframe, fantasy points by age, with rows as players, columns as ages
+    """
+    age_df = pd.DataFrame()
+    for player, stats in career_stats.items():
+        fantasy_points = stats.set_index('Age')['*Fantasy Points*']
+        fantasy_points.name = player
+        age_df = pd.merge(age_df, fantasy_points, how = 'outer', left_index = True, right_index = True)
+    return age_df.T
+
+
+def time_call(fn, *args, repeat = 1, **kwargs):
+    """
+    Time a function call
+    Arguments:
+        fn: function, function to time
+        *args: arguments to pass to fn
+        keyword:
+            repeat: int, default 1, number of calls to take the best time of
+            **kwargs: keyword arguments to pass to fn
+    Returns:
+        seconds: float, best wall time over the calls
+        result: the return value of the last call
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark_etl_assembly(sizes = (500, 1000, 2500, 10000, 100000), *, max_merge_players = 2500):
+    """
+    Compare the bulk ETL assembly against merging one player at a time. The merge grows worse than quadratically
+      (about 68s at 2,500 players, so 10,000 would take most of an hour), so above max_merge_players its time is
+      extrapolated from a power law fitted to the sizes it was timed at, and reported as an estimate
+    Arguments:
+        sizes: iterable of int, default (500, 1000, 2500, 10000, 100000), numbers of synthetic players to time
+        keyword:
+            max_merge_players: int, default 2500, largest size to time the merge on, None to time it at every size
+    Returns:
+        results: list of dictionaries, with the number of players, the merge and bulk wall times in seconds, whether
+          the merge time is an extrapolated estimate, the speedup of the bulk assembly and the growth exponent of
+          each implementation (log time ratio over log size ratio from the previous size)
+    """
+    results = []
+    for n_players in sizes:
+        career_stats = synthetic_career_stats(n_players)
+        bulk_time, bulk = time_call(etl.fantasy_points_by_age_from_stats, career_stats, repeat = 3)
+        merge_time = None
+        if max_merge_players is None or n_players <= max_merge_players:
+            merge_time, merged = time_call(merge_fantasy_points_by_age, career_stats)
+            pd.testing.assert_frame_equal(merged, bulk, check_names = False)
+        results.append({'players' : n_players, 'merge' : merge_time, 'bulk' : bulk_time, 'merge_estimated' : False})
+    timed = [r for r in results if r['merge'] is not None]
+    if len(timed) >= 2:
+        #Fit log(time) = a + b log(players) over the timed sizes and extrapolate to the rest
+        slope, intercept = np.polyfit(np.log([r['players'] for r in timed]), np.log([r['merge'] for r in timed]), 1)
+        for r in results:
+            if r['merge'] is None:
+                r['merge'], r['merge_estimated'] = float(np.exp(intercept + slope * np.log(r['players']))), True
+    for previous, r in zip([None] + results[:-1], results):
+        r['speedup'] = r['merge'] / r['bulk'] if r['merge'] is not None else None
+        for name in ('merge', 'bulk'):
+            grows = previous is not None and r[name] is not None and previous[name] is not None
+            r[name + '_exponent'] = float(np.log(r[name] / previous[name]) / np.log(r['players'] / previous['players'])) if grows else None
+    return results
+
+
+def synthetic_age_matrix(n_players, *, seed = 0):
+    """
+    Generate a fantasy points by age table shaped like data/raw/*_age_fantasy_points.csv
+    Arguments:
+        n_players: int, number of players to generate
+        keyword:
+            seed: int, default 0, random seed
+    Returns:
+        df: pd.DataFrame, fantasy points by age, with rows as players, columns as ages 21 to 45
+    """
+    rng = np.random.default_rng(seed)
+    ages = np.arange(21, 46)
+    start_ages = rng.integers(21, 25, n_players)
+    n_seasons = rng.integers(1, 12, n_players)
+    values = np.full((n_players, len(ages)), np.nan)
+    cols = np.arange(len(ages))
+    in_career = (cols >= (start_ages - 21)[:, None]) & (cols < (start_ages - 21 + n_seasons)[:, None])
+    values[in_career] = rng.uniform(0, 350, in_career.sum()).round(2)
+    return pd.DataFrame(values, index = ['Player {i:07d}'.format(i = i) for i in range(n_players)], columns = ages)
+
+
+def pivot_career_season_views(fp_age):
+    """
+    Reference implementation of the old career season re-indexing, unstacking, grouping by player and pivoting back,
+      then unstacking again for the long view
+    Arguments:
+        fp_age: pd.DataFrame, fantasy points by age, with rows as players, columns as ages
+    Returns:
+        wide: pd.DataFrame, fantasy points by season in career
+        long: pd.DataFrame, fantasy points by season in career unstacked
+    """
+    fp_age = fp_age.unstack().to_frame().reset_index(drop = False)
+    fp_age.columns = ['Age', 'Player Name', 'Fantasy Points']
+    fp_age = fp_age[fp_age['Fantasy Points'].notnull()].reset_index(drop = True)
+    fp_age['Age'] = fp_age['Age'].astype(int)
+    fp_age['Career Year'] = fp_age['Age'] - (fp_age.groupby('Player Name')['Age'].transform(np.min) - 1)
+    wide = fp_age.pivot(index = 'Player Name', columns = 'Career Year', values = 'Fantasy Points')
+    long = wide.unstack().to_frame().reset_index(drop = False)
+    long.columns = ['Career Season', 'Player Name', 'Fantasy Points']
+    long = long[long['Fantasy Points'].notnull()].reset_index(drop = True)
+    long['Career Season'] = long['Career Season'].astype(int)
+    long = long[['Player Name', 'Career Season', 'Fantasy Points']]
+    return wide, long
+
+
+def benchmark_career_season_views(sizes = (1000, 10000, 100000, 1000000)):
+    """
+    Compare the shift based career season re-indexing against the unstack, groupby and pivot round trip
+    Arguments:
+        sizes: iterable of int, default (1000, 10000, 100000, 1000000), numbers of synthetic players to time
+    Returns:
+        results: list of dictionaries, wall time in seconds for each implementation at each size
+    """
+    results = []
+    for n_players in sizes:
+        age_df = synthetic_age_matrix(n_players)
+        pivot_time, (pivot_wide, pivot_long) = time_call(pivot_career_season_views, age_df)
+        shift_time, (shift_wide, shift_long) = time_call(analysis.career_season_views, age_df, repeat = 3)
+        pd.testing.assert_frame_equal(pivot_wide, shift_wide)
+        pd.testing.assert_frame_equal(pivot_long, shift_long, check_dtype = False)
+        results.append({'players' : n_players, 'pivot' : pivot_time, 'shift' : shift_time})
+    return results
+
+
+#Modules that must not be imported by the fast start paths, and the wall time each path may take in a fresh interpreter
+HEAVY_MODULES = ('scipy.stats', 'matplotlib.pyplot', 'seaborn', 'pfr_scraping')
+IMPORT_TIME_BUDGET = 1.0
+FAST_START_PATHS = ('import etl', 'import analysis', 'import viz', "import etl; etl.read_raw_data('QB')")
+
+
+def measure_fast_start(statement, *, repeat = 3):
+    """
+    Time a statement in fresh interpreters started from the notebooks folder, the way scripted jobs run
+    Arguments:
+        statement: string, python code to time (e.g. 'import etl')
+        keyword:
+            repeat: int, default 3, number of interpreters to start, the best time is kept
+    Returns:
+        seconds: float, best wall time of the statement
+        heavy: list, heavy modules the statement imported
+    """
+    code = '\n'.join(['import json, sys, time', 'sys.path.insert(0, {p!r})'.format(p = package_directory), 'start = time.perf_counter()', statement,
+                      'print(json.dumps([time.perf_counter() - start, [m for m in {h!r} if m in sys.modules]]))'.format(h = HEAVY_MODULES)])
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd = os.path.join(package_directory, 'notebooks'), capture_output = True, text = True, check = True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return min(r[0] for r in runs), runs[0][1]
+
+
+def check_fast_start(statements = FAST_START_PATHS, *, budget = IMPORT_TIME_BUDGET):
+    """
+    Check that every fast start path stays inside the import time budget without importing any heavy module
+    Arguments:
+        statements: iterable of string, default FAST_START_PATHS, python code of each path
+        keyword:
+            budget: float, default IMPORT_TIME_BUDGET, seconds each path may take
+    Returns:
+        results: list of dictionaries, time and heavy modules imported of each path
+    """
+    results = []
+    for statement in statements:
+        seconds, heavy = measure_fast_start(statement)
+        results.append({'statement' : statement, 'seconds' : seconds, 'heavy' : heavy})
+    failures = [r for r in results if r['seconds'] > budget or r['heavy']]
+    if failures:
+        raise RuntimeError('Fast start paths over the {b}s budget or importing heavy modules: {f}'.format(b = budget, f = failures))
+    return results
+
+
+#Share of players of each position in data/raw, used to split a synthetic league
+POSITION_SHARES = {'QB' : 213, 'RB' : 255, 'WR' : 372, 'TE' : 197}
+SUITE_SIZES = (100, 10000, 1000000)
+SUITE_FILTERS = {'min_years' : 4, 'fp_cutoff_flat' : 70}
+
+
+def synthetic_position_data(position, n_players, *, seed = 0):
+    """
+    Generate a fantasy points by age table with the shape and sparsity of data/raw/{position}_age_fantasy_points.csv,
+      by resampling its players' careers (which ages they played and missed) and scaling each career by lognormal noise
+    Arguments:
+        position: string, two letter position abbreviation
+        n_players: int, number of players to generate
+        keyword:
+            seed: int, default 0, random seed
+    Returns:
+        df: pd.DataFrame, fantasy points by age, with rows as players, integer ages as columns
+    """
+    csv_path = os.path.join(package_directory, 'data', 'raw', '{pos}_age_fantasy_points.csv'.format(pos = position))
+    if not os.path.exists(csv_path):
+        return synthetic_age_matrix(n_players, seed = seed)
+    template = pd.read_csv(csv_path, index_col = 0).to_numpy(dtype = float)
+    ages = pd.read_csv(csv_path, index_col = 0, nrows = 0).columns.astype(int)
+    rng = np.random.default_rng(seed)
+    values = template[rng.integers(0, len(template), n_players)]
+    values *= rng.lognormal(0, .15, (n_players, 1))
+    return pd.DataFrame(values.round(2), index = ['{pos} Player {i:07d}'.format(pos = position, i = i) for i in range(n_players)], columns = ages)
+
+
+def synthetic_league(n_players, *, seed = 0):
+    """
+    Generate fantasy points by age tables for every position, splitting the players as data/raw does
+    Arguments:
+        n_players: int, total number of players to generate
+        keyword:
+            seed: int, default 0, random seed
+    Returns:
+        age_dfs: dictionary, position to fantasy points by age dataframe
+    """
+    total = sum(POSITION_SHARES.values())
+    return {position : synthetic_position_data(position, max(2, n_players * share // total), seed = seed + i) for i, (position, share) in enumerate(POSITION_SHARES.items())}
+
+
+def suite_inputs(n_players, *, seed = 0):
+    """
+    Build every input the suite cases take, outside of the timed calls
+    Arguments:
+        n_players: int, number of synthetic players
+        keyword:
+            seed: int, default 0, random seed
+    Returns:
+        data: dictionary, input name to value
+    """
+    age_df = synthetic_position_data('WR', n_players, seed = seed)
+    data = {'age_df' : age_df, 'league' : synthetic_league(n_players, seed = seed)}
+    data['fp_age'] = analysis.normalize_fantasy_points_by_age(age_df, **SUITE_FILTERS)
+    data['fp_career'] = analysis.career_season_views(data['fp_age'])[0]
+    data['unstacked_age'] = analysis.unstack_and_normalize_fantasy_points_and_age(age_df, **SUITE_FILTERS)
+    data['unstacked_career'] = analysis.unstack_and_normalize_fantasy_points_and_career_season(age_df, **SUITE_FILTERS)
+    data['medians_age'] = analysis.median_fantasy_points_by_age(age_df, **SUITE_FILTERS)
+    data['medians_career'] = analysis.median_fantasy_points_by_career_season(age_df, **SUITE_FILTERS)
+    data['med_p_age'] = analysis.median_and_p_vals_by_age(age_df, alternative = 'two-sided', **SUITE_FILTERS)
+    data['med_p_career'] = analysis.median_and_p_vals_by_career_season(age_df, alternative = 'two-sided', **SUITE_FILTERS)
+    league_filters = {'min_years_dict' : {p : SUITE_FILTERS['min_years'] for p in POSITION_SHARES}, 'fp_cutoff_flat_dict' : {p : SUITE_FILTERS['fp_cutoff_flat'] for p in POSITION_SHARES}}
+    data['league_filters'] = league_filters
+    data['p_vals_age'] = analysis.paired_t_test_by_age_and_position(*data['league'].values(), alternative = 'two-sided', **league_filters)
+    data['p_vals_career'] = analysis.paired_t_test_by_career_season_and_position(*data['league'].values(), alternative = 'two-sided', **league_filters)
+    data['league_fp'] = {p : analysis.normalize_fantasy_points_by_age(league_df, **SUITE_FILTERS) for p, league_df in data['league'].items()}
+    data['stacked'] = analysis.stack_cohorts(data['league_fp'])[0]
+    played = age_df.loc[data['fp_age'].index]
+    data['sweep_task'] = ('WR', 'age', 'two-sided', data['fp_age'], played.notnull().sum(axis = 1), played.max(axis = 1), SUITE_FILTERS['min_years'], [70, 90, 110])
+    table = analysis.paired_t_test_table(data['fp_age'])
+    data['t'], data['dof'] = table['T-statistic'].to_numpy(), table['n'].to_numpy() - 1
+    return data
+
+
+#Every public analysis.py function and viz.py renderer, as (module, function name, call on the suite inputs, largest
+#number of players to run it on). Resampling and the sweep grow with resamples and grid points times players
+SUITE_CASES = [
+    ('analysis', 'frame_fingerprint', lambda d : analysis.frame_fingerprint(d['age_df']), None),
+    ('analysis', 'clear_normalization_cache', lambda d : analysis.clear_normalization_cache(), None),
+    ('analysis', 'cached_normalized_fantasy_points', lambda d : analysis.cached_normalized_fantasy_points(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'normalize_fantasy_points_by_age', lambda d : analysis.normalize_fantasy_points_by_age(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'career_season_views', lambda d : analysis.career_season_views(d['fp_age']), None),
+    ('analysis', 'normalize_fantasy_points_by_career_season', lambda d : analysis.normalize_fantasy_points_by_career_season(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'normalized_fantasy_points_by_age', lambda d : analysis.normalized_fantasy_points_by_age(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'normalized_fantasy_points_by_career_season', lambda d : analysis.normalized_fantasy_points_by_career_season(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'median_fantasy_points_by_age', lambda d : analysis.median_fantasy_points_by_age(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'median_fantasy_points_by_career_season', lambda d : analysis.median_fantasy_points_by_career_season(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'unstack_fantasy_points_and_age', lambda d : analysis.unstack_fantasy_points_and_age(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'unstack_and_normalize_fantasy_points_and_age', lambda d : analysis.unstack_and_normalize_fantasy_points_and_age(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'unstack_and_normalize_fantasy_points_and_career_season', lambda d : analysis.unstack_and_normalize_fantasy_points_and_career_season(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'lag_list', lambda d : analysis.lag_list([1, 2, 3]), None),
+    ('analysis', 't_test_p_values', lambda d : analysis.t_test_p_values(d['t'], d['dof'], alternative = 'two-sided'), None),
+    ('analysis', 'paired_t_test_table', lambda d : analysis.paired_t_test_table(d['fp_age'], alternative = 'two-sided', lags = [1, 2]), None),
+    ('analysis', 'paired_t_test_by_age', lambda d : analysis.paired_t_test_by_age(d['age_df'], alternative = 'two-sided', **SUITE_FILTERS), None),
+    ('analysis', 'paired_t_test_by_career_season', lambda d : analysis.paired_t_test_by_career_season(d['age_df'], alternative = 'two-sided', **SUITE_FILTERS), None),
+    ('analysis', 'paired_t_test_by_age_and_position', lambda d : analysis.paired_t_test_by_age_and_position(*d['league'].values(), alternative = 'two-sided', **d['league_filters']), None),
+    ('analysis', 'paired_t_test_by_career_season_and_position', lambda d : analysis.paired_t_test_by_career_season_and_position(*d['league'].values(), alternative = 'two-sided', **d['league_filters']), None),
+    ('analysis', 'stack_cohorts', lambda d : analysis.stack_cohorts(d['league_fp']), None),
+    ('analysis', 'paired_t_test_stack', lambda d : analysis.paired_t_test_stack(d['stacked'], alternative = 'two-sided'), None),
+    ('analysis', 'paired_t_test_by_cohort', lambda d : analysis.paired_t_test_by_cohort(d['league'], by = 'career_season', alternative = 'two-sided', **d['league_filters']), None),
+    ('analysis', 'median_differences_by_age', lambda d : analysis.median_differences_by_age(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'median_differences_by_career_season', lambda d : analysis.median_differences_by_career_season(d['age_df'], **SUITE_FILTERS), None),
+    ('analysis', 'median_and_p_vals_by_age', lambda d : analysis.median_and_p_vals_by_age(d['age_df'], alternative = 'two-sided', **SUITE_FILTERS), None),
+    ('analysis', 'median_and_p_vals_by_career_season', lambda d : analysis.median_and_p_vals_by_career_season(d['age_df'], alternative = 'two-sided', **SUITE_FILTERS), None),
+    ('analysis', 'resampled_jump_statistics', lambda d : analysis.resampled_jump_statistics(d['fp_age'], alternative = 'two-sided', n_resamples = 1000, seed = 0), 10000),
+    ('analysis', 'median_and_p_vals_with_intervals_by_age', lambda d : analysis.median_and_p_vals_with_intervals_by_age(d['age_df'], alternative = 'two-sided', n_resamples = 1000, seed = 0, **SUITE_FILTERS), 10000),
+    ('analysis', 'median_and_p_vals_with_intervals_by_career_season', lambda d : analysis.median_and_p_vals_with_intervals_by_career_season(d['age_df'], alternative = 'two-sided', n_resamples = 1000, seed = 0, **SUITE_FILTERS), 10000),
+    ('analysis', 'sweep_grid_point_task', lambda d : analysis.sweep_grid_point_task(d['sweep_task']), None),
+    ('analysis', 'sweep_parameters', lambda d : analysis.sweep_parameters(d['league'], [3, 4, 5], [50, 70, 90], alternative = 'two-sided', max_workers = 1), 10000),
+    ('viz', 'plot_median_fantasy_points_age', lambda d : viz.plot_median_fantasy_points_age(d['medians_age'], 'Wide Receiver', True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_median_fantasy_points_career_season', lambda d : viz.plot_median_fantasy_points_career_season(d['medians_career'], 'Wide Receiver', True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_box_and_whiskers_age', lambda d : viz.plot_box_and_whiskers_age(d['unstacked_age'], 'Wide Receiver', True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_box_and_whiskers_age_with_table', lambda d : viz.plot_box_and_whiskers_age_with_table(d['unstacked_age'], d['med_p_age'], 'Wide Receiver', True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_box_and_whiskers_career_season', lambda d : viz.plot_box_and_whiskers_career_season(d['unstacked_career'], 'Wide Receiver', True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_box_and_whiskers_career_season_with_table', lambda d : viz.plot_box_and_whiskers_career_season_with_table(d['unstacked_career'], d['med_p_career'], 'Wide Receiver', True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_heatmap_p_values_age_jumps', lambda d : viz.plot_heatmap_p_values_age_jumps(d['p_vals_age'], True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'plot_heatmap_p_values_career_season_jumps', lambda d : viz.plot_heatmap_p_values_career_season_jumps(d['p_vals_career'], True, output_dir = d['output_dir'], show = False), None),
+    ('viz', 'render_all', lambda d : viz.render_all(d['league'], alternative = 'two-sided', output_dir = d['output_dir'], max_workers = 1, **d['league_filters']), 10000),
+]
+
+
+def uncovered_functions():
+    """
+    Get the public analysis.py functions and viz.py renderers that have no suite case
+    Returns:
+        uncovered: list, 'module.function' names without a case
+    """
+    covered = {(module, name) for module, name, _, _ in SUITE_CASES}
+    public = [(module.__name__, name) for module in (analysis, viz) for name, fn in inspect.getmembers(module, inspect.isfunction)
+              if fn.__module__ == module.__name__ and not name.startswith('_') and (module is analysis or name.startswith('plot_') or name == 'render_all')]
+    return ['{m}.{n}'.format(m = m, n = n) for m, n in public if (m, n) not in covered]
+
+
+def measure_case(fn, data, *, repeat = 1, trace_memory = True):
+    """
+    Time a suite case with a cold normalization cache, then run it once more under tracemalloc for its peak memory
+    Arguments:
+        fn: function, suite case taking the suite inputs
+        data: dictionary, suite inputs
+        keyword:
+            repeat: int, default 1, number of timed calls to take the best of
+            trace_memory: boolean, default true, whether to measure peak memory
+    Returns:
+        seconds: float, best wall time
+        peak_bytes: int, peak memory allocated during the call, None if not traced
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        analysis.clear_normalization_cache()
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    peak_bytes = None
+    if trace_memory:
+        analysis.clear_normalization_cache()
+        tracemalloc.start()
+        try:
+            fn(data)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak_bytes
+
+
+def git_commit():
+    """
+    Get the commit the working tree is on
+    Returns:
+        commit: string, commit hash, None outside of a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = package_directory, capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes = SUITE_SIZES, *, repeat = 1, trace_memory = True, cases = None):
+    """
+    Time every suite case on synthetic data of each size
+    Arguments:
+        sizes: iterable of int, default (100, 10000, 1000000), numbers of synthetic players
+        keyword:
+            repeat: int, default 1, number of timed calls to take the best of
+            trace_memory: boolean, default true, whether to measure peak memory
+            cases: list of string, default None, function names to run, every case if None
+    Returns:
+        report: dictionary, with the commit, environment and a result per case and size, ready for json.dump
+    """
+    uncovered = uncovered_functions()
+    if uncovered:
+        raise ValueError('No benchmark case for {u}, add them to SUITE_CASES'.format(u = uncovered))
+    viz.plt.switch_backend('Agg')
+    render_cache_dir, viz.RENDER_CACHE_DIR = viz.RENDER_CACHE_DIR, None
+    results = []
+    try:
+        for n_players in sizes:
+            data = suite_inputs(n_players)
+            with tempfile.TemporaryDirectory() as output_dir:
+                data['output_dir'] = output_dir
+                for module, name, fn, max_players in SUITE_CASES:
+                    if cases is not None and name not in cases:
+                        continue
+                    result = {'module' : module, 'function' : name, 'players' : n_players, 'seconds' : None, 'peak_bytes' : None, 'status' : 'ok'}
+                    if max_players is not None and n_players > max_players:
+                        result['status'] = 'skipped'
+                    else:
+                        try:
+                            result['seconds'], result['peak_bytes'] = measure_case(fn, data, repeat = repeat, trace_memory = trace_memory)
+                        except Exception as e:
+                            result['status'] = 'error: {e!r}'.format(e = e)
+                    results.append(result)
+                    print('{m}.{n}, {p} players: {s}'.format(m = module, n = name, p = n_players, s = result['status'] if result['seconds'] is None else '{t:.4f}s'.format(t = result['seconds'])), file = sys.stderr)
+            del data
+    finally:
+        viz.RENDER_CACHE_DIR = render_cache_dir
+        analysis.clear_normalization_cache()
+    return {'commit' : git_commit(), 'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'), 'python' : platform.python_version(), 'numpy' : np.__version__,
+            'pandas' : pd.__version__, 'machine' : platform.platform(), 'cpus' : os.cpu_count(), 'results' : results}
+
+
+def compare_suites(baseline, current, *, tolerance = .25):
+    """
+    Compare two suite reports, flagging cases that got slower by more than the tolerance or that ran in the baseline
+      and fail now
+    Arguments:
+        baseline: dictionary or string, suite report or path of its .json file
+        current: dictionary or string, suite report or path of its .json file
+        keyword:
+            tolerance: float, default .25, allowed relative slowdown
+    Returns:
+        comparison: pd.DataFrame, baseline and current seconds, peak memory and status of every case in either report,
+          with their ratio, the change ('slower', 'broke', 'fixed', 'only in baseline', 'only in current' or '') and
+          whether it is a regression
+    """
+    reports = []
+    for report in (baseline, current):
+        if isinstance(report, str):
+            with open(report) as fh:
+                report = json.load(fh)
+        reports.append(pd.DataFrame(report['results']).set_index(['module', 'function', 'players'])[['seconds', 'peak_bytes', 'status']])
+    comparison = reports[0].join(reports[1], how = 'outer', lsuffix = ' baseline', rsuffix = ' current')
+    comparison['ratio'] = comparison['seconds current'] / comparison['seconds baseline']
+    was_ok = comparison['status baseline'] == 'ok'
+    is_ok = comparison['status current'] == 'ok'
+    slower = comparison['ratio'] > 1 + tolerance
+    broke = was_ok & comparison['status current'].notnull() & ~is_ok
+    comparison['change'] = np.select([comparison['status current'].isnull(), comparison['status baseline'].isnull(), broke, slower, ~was_ok & is_ok],
+                                     ['only in baseline', 'only in current', 'broke', 'slower', 'fixed'], default = '')
+    comparison['regression'] = slower | broke
+    return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmark the ETL, analysis and visualizations')
+    parser.add_argument('--suite', action = 'store_true', help = 'run the full suite on synthetic data instead of the implementation comparisons')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(SUITE_SIZES), help = 'numbers of synthetic players for the suite')
+    parser.add_argument('--output', default = None, help = 'file to write the suite report to, printed if not given')
+    parser.add_argument('--compare', default = None, help = 'suite report .json to compare against')
+    parser.add_argument('--no-memory', action = 'store_true', help = 'skip the peak memory measurements')
+    args = parser.parse_args()
+    if args.suite:
+        report = run_suite(args.sizes, trace_memory = not args.no_memory)
+        if args.output:
+            with open(args.output, 'w') as fh:
+                json.dump(report, fh, indent = 4)
+        else:
+            print(json.dumps(report, indent = 4))
+        if args.compare:
+            comparison = compare_suites(args.compare, report)
+            print(comparison.to_string(), file = sys.stderr)
+            if comparison['regression'].any():
+                sys.exit(1)
+        sys.exit(0)
+    for result in check_fast_start():
+        print('Fast start, {s}: {t:.3f}s'.format(s = result['statement'], t = result['seconds']))
+    for result in benchmark_etl_assembly():
+        if result['merge'] is None:
+            merge = 'skipped'
+        else:
+            merge = '{e}{m:.2f}s'.format(e = '~' if result['merge_estimated'] else '', m = result['merge'])
+            merge += ' ({x:.0f}x slower{e})'.format(x = result['speedup'], e = ', extrapolated' if result['merge_estimated'] else '')
+        growth = '' if result['bulk_exponent'] is None else ', bulk grows as n^{g:.2f}'.format(g = result['bulk_exponent'])
+        print('ETL assembly, {n} players: merge {m}, bulk {b:.3f}s{g}'.format(n = result['players'], m = merge, b = result['bulk'], g = growth))
+    for result in benchmark_career_season_views():
+        print('Career season views, {n} players: pivot {p:.3f}s, shift {s:.3f}s'.format(n = result['players'], p = result['pivot'], s = result['shift']))
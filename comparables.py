@@ -0,0 +1,143 @@
+import numpy as np
+import os
+import pandas as pd
+import sys
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+
+
+class ComparablesIndex:
+    """
+    Index of normalized career curves for finding the historical players who aged most like a given (partial) curve.
+      Curves are held as one zero-filled float32 matrix plus a mask of the seasons played, so the NaN-aware distance
+      to every player is a handful of matrix products over the seasons the query has
+    Arguments:
+        curves: pd.DataFrame, normalized fantasy points, with rows as players, columns as ages or career seasons
+        positions: np.ndarray, default None, position of each player, for indexes spanning several positions
+    """
+    def __init__(self, curves, positions = None):
+        self.players = np.asarray(curves.index)
+        self.labels = np.asarray(curves.columns)
+        self.positions = np.asarray(positions) if positions is not None else np.full(len(curves), '', dtype = object)
+        values = curves.to_numpy(dtype = np.float32)
+        played = ~np.isnan(values)
+        self.mask = played.astype(np.float32)
+        self.values = np.where(played, values, 0).astype(np.float32)
+        self.squared_values = self.values ** 2
+
+    def __len__(self):
+        return len(self.players)
+
+    @classmethod
+    def from_age_dfs(cls, age_dfs, *, by = 'career_season', min_years_dict = {}, fp_cutoff_flat_dict = {}):
+        """
+        Build an index over several positions from their fantasy points by age tables, normalized as
+          analysis.normalized_fantasy_points_by_age and analysis.normalized_fantasy_points_by_career_season do
+        Arguments:
+            age_dfs: dictionary, position to fantasy points by age dataframe
+            keyword:
+                by: string, default 'career_season', either 'age' or 'career_season' (curves aligned at the rookie year)
+                min_years_dict: dictionary, minimum number of years played by position. Default is 0 for all positions
+                fp_cutoff_flat_dict: dictionary, minimum fantasy points to have hit in a year by position. Default is 0 for all positions
+        Returns:
+            index: ComparablesIndex, curves of every player that passes the filters
+        """
+        curves = {position : analysis.cached_normalized_fantasy_points(age_df, by = by, min_years = min_years_dict.get(position, 0), fp_cutoff_flat = fp_cutoff_flat_dict.get(position, 0)) for position, age_df in age_dfs.items()}
+        labels = sorted(set().union(*[c.columns for c in curves.values()]))
+        return cls(pd.concat([c.reindex(columns = labels) for c in curves.values()]), np.repeat(list(curves.keys()), [len(c) for c in curves.values()]))
+
+    def curve(self, player, *, position = None):
+        """
+        Get a player's curve from the index
+        Arguments:
+            player: string, player name
+            keyword:
+                position: string, default None, position of the player, needed if the name is in several positions
+        Returns:
+            curve: pd.Series, normalized fantasy points by age or career season, NaN for seasons not played
+        """
+        rows = np.flatnonzero((self.players == player) & ((self.positions == position) if position is not None else True))
+        if len(rows) != 1:
+            raise KeyError('{n} players named {p} in the index{pos}'.format(n = len(rows), p = player, pos = '' if position is None else ' at ' + position))
+        return pd.Series(np.where(self.mask[rows[0]] > 0, self.values[rows[0]], np.nan), index = self.labels, name = player)
+
+    def distances(self, curves, *, min_overlap = None):
+        """
+        Get the mean squared difference between query curves and every indexed curve over the seasons both have, as
+          sum(mask * q_mask * (x - q) ** 2) = x ** 2 @ q_mask - 2 * x @ q + mask @ q ** 2 over shared seasons
+        Arguments:
+            curves: pd.DataFrame, query curves, with rows as queries, columns as labels of the index (missing labels
+              and NaN are seasons the query has no value for)
+            keyword:
+                min_overlap: int, default None, minimum number of shared seasons for a distance, every season of the
+                  query if None. Pairs with fewer are given an infinite distance
+        Returns:
+            distances: np.ndarray, queries x players mean squared differences
+            overlap: np.ndarray, queries x players number of shared seasons
+        """
+        query = curves.reindex(columns = self.labels).to_numpy(dtype = np.float32)
+        query_mask = (~np.isnan(query)).astype(np.float32)
+        query = np.where(query_mask > 0, query, 0).astype(np.float32)
+        #Every term is a batched float32 product over the columns, only combined in float64. On curves normalized to [0, 1]
+        #the cancellation leaves errors around 1e-7 against the direct sum
+        overlap = query_mask @ self.mask.T
+        squared_error = (query_mask @ self.squared_values.T).astype(float) - 2 * (query @ self.values.T) + (query ** 2) @ self.mask.T
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            distances = np.clip(squared_error, 0, None) / overlap
+        needed = query_mask.sum(axis = 1, keepdims = True) if min_overlap is None else np.full((len(query), 1), min_overlap)
+        distances[(overlap < needed) | (overlap == 0)] = np.inf
+        return distances, overlap.astype(np.int64)
+
+    def query(self, curves, *, k = 10, positions = None, min_overlap = None, exclude = None):
+        """
+        Find the k most similar indexed players for each query curve
+        Arguments:
+            curves: pd.Series or pd.DataFrame, one query curve or several as rows, on the index's labels, NaN for
+              seasons the query has no value for
+            keyword:
+                k: int, default 10, number of comparables per query
+                positions: list, default None, positions to search, all of them if None
+                min_overlap: int, default None, minimum number of shared seasons, every season of the query if None
+                exclude: list, default None, player names to leave out (e.g. the queried player)
+        Returns:
+            comparables: pd.DataFrame, with columns Query, Player Name, Position, Distance and Overlap, the k closest
+              players of each query sorted by distance
+        """
+        if isinstance(curves, pd.Series):
+            curves = curves.to_frame().T
+        distances, overlap = self.distances(curves, min_overlap = min_overlap)
+        if positions is not None:
+            distances[:, ~np.isin(self.positions, positions)] = np.inf
+        if exclude is not None:
+            distances[:, np.isin(self.players, exclude)] = np.inf
+        k = min(k, len(self))
+        #Partition out the k closest of each query, then only sort those
+        closest = np.argpartition(distances, k - 1, axis = 1)[:, :k] if k < len(self) else np.tile(np.arange(len(self)), (len(distances), 1))
+        closest = np.take_along_axis(closest, np.argsort(np.take_along_axis(distances, closest, axis = 1), axis = 1, kind = 'stable'), axis = 1)
+        query_rows = np.repeat(np.arange(len(distances)), closest.shape[1])
+        closest = closest.ravel()
+        comparables = pd.DataFrame({'Query' : np.asarray(curves.index)[query_rows], 'Player Name' : self.players[closest], 'Position' : self.positions[closest], 'Distance' : distances[query_rows, closest], 'Overlap' : overlap[query_rows, closest]})
+        return comparables[np.isfinite(comparables['Distance'])].reset_index(drop = True)
+
+    def query_player(self, player, *, seasons = None, position = None, k = 10, positions = None):
+        """
+        Find the players whose curves are most similar to an indexed player's first seasons
+        Arguments:
+            player: string, player name
+            keyword:
+                seasons: int, default None, number of leading columns of the player's curve to match on, every
+                  season if None
+                position: string, default None, position of the player, needed if the name is in several positions
+                k: int, default 10, number of comparables
+                positions: list, default None, positions to search, the player's own if None
+        Returns:
+            comparables: pd.DataFrame, with columns Query, Player Name, Position, Distance and Overlap, sorted by distance
+        """
+        curve = self.curve(player, position = position)
+        if seasons is not None:
+            first = np.flatnonzero(curve.notna().to_numpy())[:1]
+            curve.iloc[(first[0] if len(first) else 0) + seasons:] = np.nan
+        if positions is None:
+            positions = [self.positions[(self.players == player) & ((self.positions == position) if position is not None else True)][0]]
+        return self.query(curve, k = k, positions = positions, exclude = [player])
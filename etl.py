@@ -1,56 +1,488 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import http_cache
+from instrumentation import instrumented
 import json
+import jump_stats
 import pandas as pd
 import numpy as np
 import os
 import sys
+import threading
 import time
-sys.path.append('/Users/tevans-barton/AAASideProjects/')
-from pfr_scraping import pfr_scraping
 package_directory = os.path.dirname(os.path.abspath(__file__))
+#pfr_scraping lives outside the repo and is only looked for the first time something has to be scraped
+PFR_SCRAPING_PATH = os.environ.get('PFR_SCRAPING_PATH', '/Users/tevans-barton/AAASideProjects/')
+pfr_scraping = None
 
 import logging
-logging.basicConfig(filename='../logger.log', format='%(asctime)s %(levelname)s:%(name)s :: %(message)s', datefmt='%m/%d/%Y %H:%M:%S', encoding='utf-8', level=logging.DEBUG)
+import logging_config
+logging_config.configure_logging()
 Logger = logging.getLogger(__name__)
 
-def get_fantasy_points_by_age(position):
+
+def load_pfr_scraping():
     """
-    Get fantasy points by age for a given position
+    Import pfr_scraping from PFR_SCRAPING_PATH (overridable with the PFR_SCRAPING_PATH environment variable)
+    Returns:
+        pfr_scraping: module, the scraper, or None if it is not installed
+    """
+    global pfr_scraping
+    if pfr_scraping is None:
+        if PFR_SCRAPING_PATH not in sys.path:
+            sys.path.append(PFR_SCRAPING_PATH)
+        try:
+            from pfr_scraping import pfr_scraping as module
+        except ImportError:
+            #Allow running offline, a scraper (e.g. pfr_scraping_stub) then has to be passed in
+            return None
+        pfr_scraping = module
+    return pfr_scraping
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by the scraping workers to stay inside the site's request budget
     Arguments:
-        position: string, two letter position abbreviation to get fantasy points by age for
+        rate: float, number of requests allowed per second on average, None for no limit
+        capacity: int, default 1, number of requests that can be made back to back after idling
+    """
+    def __init__(self, rate, capacity = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available and take it
+        Returns:
+            None
+        """
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def call_with_retries(fn, *args, limiter, retries = 3, backoff = 2):
+    """
+    Call a scraping function once a rate limit token is available, retrying with exponential backoff on failure
+    Arguments:
+        fn: function, scraping function to call
+        *args: arguments to pass to fn
+        keyword:
+            limiter: TokenBucket, rate limiter shared by every request to the site
+            retries: int, default 3, number of times to retry after the first failure
+            backoff: float, default 2, seconds to wait before the first retry, doubled on every retry after
     Returns:
-        df: pandas dataframe, fantasy points by age for a given position
+        result: the return value of fn
+    """
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            wait = backoff * 2 ** attempt
+            Logger.debug('Attempt {a} of {f}{args} failed ({e}), retrying in {w} seconds'.format(a = attempt + 1, f = fn.__name__, args = args, e = e, w = wait))
+            time.sleep(wait)
+
+
+@instrumented
+def get_player_career_stats(player_slugs, *, scraper = None, limiter = None, max_workers = 4, retries = 3, backoff = 2, method = 'get_player_career_stats_from_slug'):
+    """
+    Get the career stats for every player concurrently, with all workers sharing one rate limiter
+    Arguments:
+        player_slugs: dictionary, player name to player slug
+        keyword:
+            scraper: module, default pfr_scraping, module exposing get_player_career_stats_from_slug
+            limiter: TokenBucket, default one request every 6 seconds, rate limiter shared by all workers
+            max_workers: int, default 4, number of requests allowed in flight at once
+            retries: int, default 3, number of times to retry a player after the first failure
+            backoff: float, default 2, seconds to wait before the first retry, doubled on every retry after
+            method: string, default 'get_player_career_stats_from_slug', scraper function to call with each slug
+              (e.g. 'get_player_game_logs_from_slug' for weekly points)
+    Returns:
+        career_stats: dictionary, player name to career stats dataframe, in the same order as player_slugs. Players
+          whose retries ran out are logged and left out, so one bad page does not throw away every page fetched
+    """
+    scraper = scraper or load_pfr_scraping()
+    limiter = limiter or TokenBucket(1 / 6)
+    fetch = getattr(scraper, method)
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {player : executor.submit(call_with_retries, fetch, slug, limiter = limiter, retries = retries, backoff = backoff) for player, slug in player_slugs.items()}
+        career_stats = {}
+        failures = {}
+        for player, future in futures.items():
+            Logger.debug('READING IN {p}'.format(p = player))
+            try:
+                career_stats[player] = future.result()
+            except Exception as e:
+                failures[player] = e
+                Logger.error('Giving up on {p} ({s}) after {r} retries: {e!r}'.format(p = player, s = player_slugs[player], r = retries, e = e))
+    if failures:
+        Logger.warning('Failed to fetch {n} of {t} players: {ps}'.format(n = len(failures), t = len(player_slugs), ps = list(failures)))
+    return career_stats
+
+
+def scatter_by_age(players, rows, ages, points):
+    """
+    Scatter flat per-season fantasy points into a player x age table
+    Arguments:
+        players: list, player names
+        rows: np.ndarray, index into players of every season
+        ages: np.ndarray, age of every season
+        points: np.ndarray, fantasy points of every season
+    Returns:
+        df: pandas dataframe, fantasy points by age, with rows as players, columns as ages
+    """
+    if not len(players) or not len(ages):
+        return pd.DataFrame(index = players)
+    #Scatter into a preallocated player x age matrix, with the ages in sorted order as columns
+    age_labels, age_cols = np.unique(ages, return_inverse = True)
+    matrix = np.full((len(players), len(age_labels)), np.nan)
+    matrix[rows, age_cols] = points
+    return pd.DataFrame(matrix, index = players, columns = pd.Index(age_labels, name = 'Age'))
+
+
+def fantasy_points_by_age_from_stats(career_stats):
+    """
+    Build the fantasy points by age table from each player's career stats in a single pass
+    Arguments:
+        career_stats: dictionary, player name to career stats dataframe
+    Returns:
+        df: pandas dataframe, fantasy points by age, with rows as players, columns as ages
+    """
+    players = list(career_stats.keys())
+    #Flatten every player's seasons into three aligned arrays instead of merging player by player
+    ages = [np.asarray(stats['Age']) for stats in career_stats.values()]
+    points = [np.asarray(stats['*Fantasy Points*'], dtype = float) for stats in career_stats.values()]
+    if not players or not sum(len(a) for a in ages):
+        return pd.DataFrame(index = players)
+    rows = np.repeat(np.arange(len(players)), [len(a) for a in ages])
+    return scatter_by_age(players, rows, np.concatenate(ages), np.concatenate(points))
+
+
+def component_stats_from_stats(career_stats):
+    """
+    Build the columnar store of every numeric column of each player's career stats, one row per season, so other
+      scoring systems can be applied later without scraping again
+    Arguments:
+        career_stats: dictionary, player name to career stats dataframe
+    Returns:
+        store: dictionary, with 'players' as the player names, 'rows' as the index into players of every season,
+          'ages' as the age of every season, 'components' as the stat names and 'values' as a float32 season x
+          component matrix, NaN where a player's table has no such stat
+    """
+    players = list(career_stats.keys())
+    tables = [stats.drop(columns = 'Age').apply(pd.to_numeric, errors = 'coerce') for stats in career_stats.values()]
+    #Keep the columns that hold numbers for someone, in order of first appearance
+    components = list(dict.fromkeys(c for table in tables for c in table.columns if table[c].notna().any()))
+    lengths = [len(stats) for stats in career_stats.values()]
+    values = np.full((sum(lengths), len(components)), np.nan, dtype = np.float32)
+    column_of = {c : i for i, c in enumerate(components)}
+    start = 0
+    for table, length in zip(tables, lengths):
+        present = [c for c in table.columns if c in column_of]
+        values[start:start + length, [column_of[c] for c in present]] = table[present].to_numpy(dtype = np.float32)
+        start += length
+    return {'players' : np.asarray(players, dtype = str),
+            'rows' : np.repeat(np.arange(len(players)), lengths),
+            'ages' : np.concatenate([np.asarray(stats['Age'], dtype = np.int64) for stats in career_stats.values()]) if players else np.zeros(0, dtype = np.int64),
+            'components' : np.asarray(components, dtype = str),
+            'values' : values}
+
+
+def merge_component_stats(existing, new, players):
+    """
+    Merge newly scraped component stats into an existing store, refetched players replacing their old seasons
+    Arguments:
+        existing: dictionary, component stats store as returned by component_stats_from_stats
+        new: dictionary, component stats store of the players just scraped
+        players: list, player names in the order of the merged store
+    Returns:
+        store: dictionary, merged component stats store
+    """
+    components = list(dict.fromkeys(list(existing['components']) + list(new['components'])))
+    keep = ~np.isin(existing['players'][existing['rows']], new['players'])
+    names, ages, blocks = [], [], []
+    for store, mask in ((existing, keep), (new, np.ones(len(new['rows']), dtype = bool))):
+        block = np.full((mask.sum(), len(components)), np.nan, dtype = np.float32)
+        block[:, [components.index(c) for c in store['components']]] = store['values'][mask]
+        names.append(store['players'][store['rows'][mask]])
+        ages.append(store['ages'][mask])
+        blocks.append(block)
+    names, ages, values = np.concatenate(names), np.concatenate(ages), np.concatenate(blocks)
+    players = np.asarray(players, dtype = str)
+    #Seasons are grouped by player in the merged player order
+    rows = pd.Index(players).get_indexer(names)
+    order = np.argsort(rows, kind = 'stable')
+    return {'players' : players, 'rows' : rows[order], 'ages' : ages[order], 'components' : np.asarray(components, dtype = str), 'values' : values[order]}
+
+
+def write_component_stats(store, position):
+    """
+    Write the component stats store for a given position
+    Arguments:
+        store: dictionary, component stats store as returned by component_stats_from_stats
+        position: string, two letter position abbreviation
+    Returns:
+        None
+    """
+    Logger.debug('Writing {pos}_component_stats.npz'.format(pos = position))
+    with open(os.path.abspath('../data/raw/{pos}_component_stats.npz'.format(pos = position)), 'wb') as fh:
+        np.savez_compressed(fh, **store)
+
+
+def read_component_stats(position):
+    """
+    Read the component stats store for a given position
+    Arguments:
+        position: string, two letter position abbreviation
+    Returns:
+        store: dictionary, component stats store, or None if it has not been written
+    """
+    store_path = os.path.abspath('../data/raw/{pos}_component_stats.npz'.format(pos = position))
+    if not os.path.exists(store_path):
+        return None
+    Logger.debug('Reading in {pos}_component_stats.npz'.format(pos = position))
+    with np.load(store_path) as store:
+        return {key : store[key] for key in store.files}
+
+
+def fantasy_points_by_age_from_components(store, scoring):
+    """
+    Build the fantasy points by age table for any scoring system with one matrix-vector product over the
+      component stats
+    Arguments:
+        store: dictionary, component stats store as returned by component_stats_from_stats
+        scoring: dictionary, component name to points per unit (e.g. {'Receptions' : 1, 'Receiving Yds' : .1})
+    Returns:
+        df: pandas dataframe, fantasy points by age, with rows as players, columns as ages
+    """
+    components = list(store['components'])
+    #Scoring systems cover every position, stats a position never records (e.g. a WR's passing yards) score zero
+    missing = [c for c in scoring if c not in components]
+    if missing:
+        Logger.debug('No stored {m} stats, scoring them as zero'.format(m = missing))
+    weights = np.zeros(len(components))
+    weights[[components.index(c) for c in scoring if c in components]] = [w for c, w in scoring.items() if c in components]
+    scored = weights != 0
+    values = store['values'][:, scored].astype(float)
+    #Blank stats count as zero, a season is only missing when every scored stat is blank
+    points = np.nan_to_num(values) @ weights[scored]
+    points[np.isnan(values).all(axis = 1)] = np.nan
+    return scatter_by_age(list(store['players']), store['rows'], store['ages'], points)
+
+
+@instrumented
+def get_fantasy_points_by_age_for_scoring(position, scoring):
+    """
+    Get fantasy points by age for a given position under another scoring system, from the stored component stats
+    Arguments:
+        position: string, two letter position abbreviation
+        scoring: string or dictionary, name of a scoring system in data-params.json (e.g. 'half_ppr') or
+          component name to points per unit
+    Returns:
+        df: pandas dataframe, fantasy points by age for a given position, with a row for every player in the component
+          stats store. That is every player in the .csv, unless the store was first written by an incremental run, which
+          only stores the players it refetched until the rest are scraped again
+    """
+    if isinstance(scoring, str):
+        with open(package_directory + '/data-params.json') as fh:
+            scoring = json.load(fh)['scoring'][scoring]
+    store = read_component_stats(position)
+    if store is None:
+        raise FileNotFoundError('No component stats for {pos}, rescrape with get_fantasy_points_by_age to store them'.format(pos = position))
+    return fantasy_points_by_age_from_components(store, scoring)
+
+
+def write_raw_cache(age_df, position):
+    """
+    Write the binary cache of the fantasy points by age table next to its .csv, with ages stored as
+      integers and fantasy points at full float64 precision, so the cutoff filters see the same values as the .csv
+    Arguments:
+        age_df: pandas dataframe, fantasy points by age, with rows as players, columns as ages
+        position: string, two letter position abbreviation
+    Returns:
+        None
+    """
+    cache_path = os.path.abspath('../data/raw/{pos}_age_fantasy_points.npz'.format(pos = position))
+    Logger.debug('Writing {pos}_age_fantasy_points.npz'.format(pos = position))
+    with open(cache_path, 'wb') as fh:
+        np.savez(fh, values = age_df.to_numpy(dtype = float), ages = age_df.columns.astype(int).to_numpy(), players = age_df.index.astype(str).to_numpy(dtype = str))
+
+
+@instrumented
+def read_raw_data(position, *, use_cache = True):
+    """
+    Read the fantasy points by age table for a given position, from the binary cache when it is newer than the .csv
+      (or the .csv is missing)
+    Arguments:
+        position: string, two letter position abbreviation
+        keyword:
+            use_cache: boolean, default true, whether to read and refresh the .npz cache next to the .csv
+    Returns:
+        df: pandas dataframe, fantasy points by age, with rows as players, integer ages as columns
+    """
+    csv_path = os.path.abspath('../data/raw/{pos}_age_fantasy_points.csv'.format(pos = position))
+    cache_path = os.path.abspath('../data/raw/{pos}_age_fantasy_points.npz'.format(pos = position))
+    if use_cache and os.path.exists(cache_path) and (not os.path.exists(csv_path) or os.path.getmtime(cache_path) >= os.path.getmtime(csv_path)):
+        with np.load(cache_path) as cache:
+            #Caches written at float32 lose the exact cutoff comparisons, so they are rebuilt from the .csv
+            if cache['values'].dtype == np.float64 or not os.path.exists(csv_path):
+                Logger.debug('Reading in {pos}_age_fantasy_points.npz'.format(pos = position))
+                return pd.DataFrame(cache['values'], index = cache['players'], columns = cache['ages'])
+    Logger.debug('Reading in {pos}_age_fantasy_points.csv'.format(pos = position))
+    df = pd.read_csv(csv_path, index_col = 0)
+    df.columns = df.columns.astype(int)
+    if use_cache:
+        write_raw_cache(df, position)
+    return df
+
+
+def read_manifest(position):
+    """
+    Read the manifest of players and seasons already scraped into the raw .csv for a given position
+    Arguments:
+        position: string, two letter position abbreviation
+    Returns:
+        manifest: dictionary, with 'years' as the list of seasons scraped and 'players' as player name to slug,
+          or None if no manifest has been written
+    """
+    manifest_path = os.path.abspath('../data/raw/{pos}_manifest.json'.format(pos = position))
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as fh:
+        return json.load(fh)
+
+
+@instrumented
+def write_raw_data(age_df, position, manifest, component_stats = None):
+    """
+    Write the fantasy points by age .csv and its manifest for a given position
+    Arguments:
+        age_df: pandas dataframe, fantasy points by age, with rows as players, columns as ages
+        position: string, two letter position abbreviation
+        manifest: dictionary, with 'years' as the list of seasons scraped and 'players' as player name to slug
+        component_stats: dictionary, default None, component stats store to write alongside, left as is if None
+    Returns:
+        None
     """
-    Logger.debug('Running get_fantasy_points_by_age for {p}'.format(p = position))
-    #Open the .csv file if it already exists
-    if os.path.exists(os.path.abspath('../data/raw/{pos}_age_fantasy_points.csv'.format(pos = position))):
-        Logger.debug('Reading in {pos}_age_fantasy_points.csv'.format(pos = position))
-        df = pd.read_csv(os.path.abspath('../data/raw/{pos}_age_fantasy_points.csv'.format(pos = position)), index_col = 0)
-        return df
-    with open(package_directory + '/data-params.json') as fh:
-        data_cfg = json.load(fh)
-    years = data_cfg['years']
-    player_slugs = {}
-    for y in years:
-        player_slugs.update(pfr_scraping.get_all_players_slugs(y, position))
-        time.sleep(10)
-    #Get the players names from the keys of the slug dictionary
-    players = list(player_slugs.keys())
-    #Sort the players by last name
-    players.sort(key = lambda x : x.split()[1])
-    age_df = pd.DataFrame()
-    for player in players:
-        time.sleep(6)
-        Logger.debug('READING IN {p}'.format(p = player))
-        stats = pfr_scraping.get_player_career_stats_from_slug(player_slugs[player])
-        fantasy_points = stats.set_index('Age')['*Fantasy Points*']
-        fantasy_points.name = player
-        age_df = pd.merge(age_df, fantasy_points, how = 'outer', left_index = True, right_index = True)
     if not os.path.exists(os.path.abspath('../data/')):
         Logger.debug('Making data folder')
         os.mkdir(os.path.abspath('../data'))
     if not os.path.exists(os.path.abspath('../data/raw/')):
         Logger.debug('Making raw data folder')
         os.mkdir(os.path.abspath('../data/raw'))
-    age_df.T.to_csv(os.path.abspath('../data/raw/{pos}_age_fantasy_points.csv'.format(pos = position)))
-    return age_df.T
+    age_df.to_csv(os.path.abspath('../data/raw/{pos}_age_fantasy_points.csv'.format(pos = position)))
+    write_raw_cache(age_df, position)
+    with open(os.path.abspath('../data/raw/{pos}_manifest.json'.format(pos = position)), 'w') as fh:
+        json.dump(manifest, fh, indent = 4)
+    if component_stats is not None:
+        write_component_stats(component_stats, position)
+
 
+@instrumented
+def get_fantasy_points_by_age(position, *, scraper = None, incremental = False, use_cache = True):
+    """
+    Get fantasy points by age for a given position
+    Arguments:
+        position: string, two letter position abbreviation to get fantasy points by age for
+        keyword:
+            scraper: module, default pfr_scraping, module exposing get_all_players_slugs and
+              get_player_career_stats_from_slug (pfr_scraping_stub can be used offline)
+            incremental: boolean, default false, whether to update an existing .csv with the years in
+              data-params.json that it is missing, only fetching players who are new or have a newer season
+            use_cache: boolean, default true, whether to read the raw data from the binary .npz cache next
+              to the .csv when it is newer or the .csv is missing, writing the cache if it is missing
+    Returns:
+        df: pandas dataframe, fantasy points by age for a given position
+    """
+    Logger.debug('Running get_fantasy_points_by_age for {p}'.format(p = position))
+    csv_path = os.path.abspath('../data/raw/{pos}_age_fantasy_points.csv'.format(pos = position))
+    cache_path = os.path.abspath('../data/raw/{pos}_age_fantasy_points.npz'.format(pos = position))
+    #Open the .csv file if it already exists, or its binary cache if only that was kept
+    if not incremental and (os.path.exists(csv_path) or (use_cache and os.path.exists(cache_path))):
+        return read_raw_data(position, use_cache = use_cache)
+    scraper = scraper or load_pfr_scraping()
+    if scraper is None:
+        raise ImportError('pfr_scraping is not available, pass a scraper to get_fantasy_points_by_age')
+    with open(package_directory + '/data-params.json') as fh:
+        data_cfg = json.load(fh)
+    years = data_cfg['years']
+    scraping_cfg = data_cfg.get('scraping', {})
+    #One limiter for every request so the politeness budget holds across years and players
+    limiter = TokenBucket(1 / scraping_cfg.get('seconds_per_request', 6))
+    cache_cfg = scraping_cfg.get('http_cache')
+    response_cache = nullcontext()
+    if cache_cfg is not None and hasattr(scraper, 'requests'):
+        #Pages come from the on-disk cache, so only requests that go over the network are rate limited
+        cache = http_cache.HTTPCache(cache_cfg.get('cache_dir', '../data/http_cache'), ttl = cache_cfg.get('ttl_days', 7) * 24 * 3600, limiter = limiter)
+        response_cache = http_cache.cached_requests(scraper, cache)
+        limiter = TokenBucket(None)
+    retries = scraping_cfg.get('retries', 3)
+    backoff = scraping_cfg.get('backoff', 2)
+    existing_df = None
+    manifest = {'years' : [], 'players' : {}}
+    if os.path.exists(csv_path):
+        #Merge into the .csv values rather than the cache
+        existing_df = read_raw_data(position, use_cache = False)
+        manifest = read_manifest(position)
+        if manifest is None:
+            #Without a manifest assume the .csv was built from the years currently configured
+            Logger.debug('No manifest for {pos}, assuming {pos}_age_fantasy_points.csv covers {y}'.format(pos = position, y = years))
+            manifest = {'years' : list(years), 'players' : {player : None for player in existing_df.index}}
+            write_raw_data(existing_df, position, manifest)
+    new_years = [y for y in years if y not in manifest['years']]
+    if existing_df is not None and not new_years:
+        Logger.debug('{pos}_age_fantasy_points.csv is up to date'.format(pos = position))
+        return existing_df
+    newest_year = max(manifest['years'], default = None)
+    with response_cache:
+        player_slugs = {}
+        for y in new_years:
+            year_slugs = call_with_retries(scraper.get_all_players_slugs, y, position, limiter = limiter, retries = retries, backoff = backoff)
+            #Players already scraped only have a season to add if the year is newer than anything scraped before
+            player_slugs.update({player : slug for player, slug in year_slugs.items() if player not in manifest['players'] or newest_year is None or y > newest_year})
+        Logger.debug('Fetching {n} new or updated {pos} players'.format(n = len(player_slugs), pos = position))
+        #Get the players names from the keys of the slug dictionary
+        players = list(player_slugs.keys())
+        #Sort the players by last name
+        players.sort(key = lambda x : x.split()[1])
+        career_stats = get_player_career_stats({player : player_slugs[player] for player in players}, scraper = scraper, limiter = limiter, max_workers = scraping_cfg.get('max_workers', 4), retries = retries, backoff = backoff)
+    failed = [player for player in players if player not in career_stats]
+    age_df = fantasy_points_by_age_from_stats(career_stats)
+    component_stats = component_stats_from_stats(career_stats)
+    fetched_df = age_df
+    if existing_df is not None:
+        #Refetched players replace their old rows, then everyone is put back in last name order
+        age_df = pd.concat([existing_df.drop(index = age_df.index, errors = 'ignore'), age_df])
+        age_df = age_df[sorted(age_df.columns)]
+        age_df = age_df.loc[sorted(age_df.index, key = lambda x : x.split()[1])]
+        existing_components = read_component_stats(position)
+        if existing_components is not None:
+            component_stats = merge_component_stats(existing_components, component_stats, list(age_df.index))
+        else:
+            #Players scraped before components were stored can only be rescored once refetched
+            Logger.debug('No component stats for {pos}, storing only the players just fetched'.format(pos = position))
+    if failed:
+        #Keep what was fetched, but leave the new years out of the manifest so the next incremental run retries them
+        Logger.warning('{n} {pos} players failed to fetch, run with incremental=True to retry {y}'.format(n = len(failed), pos = position, y = new_years))
+    else:
+        manifest['years'] = sorted(set(manifest['years']) | set(new_years), reverse = True)
+    manifest['players'].update({player : slug for player, slug in player_slugs.items() if player in career_stats})
+    write_raw_data(age_df, position, manifest, component_stats)
+    #Saved paired t-test statistics only need the players just fetched folded in
+    jump_stats.fold_into_saved_stores(position, fetched_df)
+    return age_df
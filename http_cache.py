@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+import gzip
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import logging
+import logging_config
+logging_config.configure_logging()
+Logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for a requests.Response, built from a fetched or cached page
+    Arguments:
+        url: string, url of the page
+        status_code: int, HTTP status code
+        headers: dictionary, response headers
+        content: bytes, response body
+        from_cache: boolean, whether the body was served from the cache
+    """
+    def __init__(self, url, status_code, headers, content, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors = 'replace')
+
+    def raise_for_status(self):
+        """
+        Raise an HTTPError for error status codes, as requests does
+        Returns:
+            None
+        """
+        if not self.ok:
+            raise urllib.error.HTTPError(self.url, self.status_code, 'HTTP {c} for {u}'.format(c = self.status_code, u = self.url), self.headers, None)
+
+
+class HTTPCache:
+    """
+    Persistent gzip compressed cache of HTTP GET responses keyed by url. Entries younger than the ttl are served from
+      disk, older ones are revalidated with If-None-Match / If-Modified-Since and refreshed or kept on a 304
+    Arguments:
+        cache_dir: string, default '../data/http_cache', folder to store the responses in
+        ttl: float, default one week, seconds an entry is served without revalidating
+        timeout: float, default 30, seconds to wait for the server
+        limiter: object with an acquire method (e.g. etl.TokenBucket), default None, rate limiter taken before every
+          request that goes over the network, so cache hits are not throttled
+    """
+    def __init__(self, cache_dir = '../data/http_cache', *, ttl = 7 * 24 * 3600, timeout = 30, limiter = None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.limiter = limiter
+
+    def entry_path(self, url):
+        """
+        Get the file a url is cached in
+        Arguments:
+            url: string, url of the page
+        Returns:
+            path: string, path of the cache entry
+        """
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + '.gz')
+
+    def read_entry(self, url):
+        """
+        Read the cache entry of a url
+        Arguments:
+            url: string, url of the page
+        Returns:
+            meta: dictionary, with the url, status code, headers and fetch time, or None if the url is not cached
+            content: bytes, cached response body, or None if the url is not cached
+        """
+        path = self.entry_path(url)
+        if not os.path.exists(path):
+            return None, None
+        #Entries are a line of json metadata followed by the body, compressed together
+        with gzip.open(path, 'rb') as fh:
+            meta = json.loads(fh.readline())
+            content = fh.read()
+        return meta, content
+
+    def write_entry(self, meta, content):
+        """
+        Write the cache entry of a url, replacing any previous one atomically
+        Arguments:
+            meta: dictionary, with the url, status code, headers and fetch time
+            content: bytes, response body
+        Returns:
+            None
+        """
+        path = self.entry_path(meta['url'])
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp_path = '{p}.{pid}.tmp'.format(p = path, pid = os.getpid())
+        with gzip.open(tmp_path, 'wb') as fh:
+            fh.write(json.dumps(meta).encode() + b'\n')
+            fh.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, url, params = None, headers = None, timeout = None, **kwargs):
+        """
+        Get a page, from the cache when it is fresh, otherwise from the server
+        Arguments:
+            url: string, url of the page
+            params: dictionary or list of pairs, default None, query string parameters, added to the url (and so to
+              the cache key) as requests.get does
+            headers: dictionary, default None, extra request headers
+            timeout: float, default None, seconds to wait for the server, the cache's timeout if None
+            **kwargs: other requests.get arguments, which the cache cannot honour and raises a TypeError for
+        Returns:
+            response: CachedResponse, the page
+        """
+        if kwargs:
+            raise TypeError('HTTPCache.get does not support {k}'.format(k = ', '.join(sorted(kwargs))))
+        if params:
+            url = url + ('&' if urllib.parse.urlsplit(url).query else '?') + urllib.parse.urlencode(params, doseq = True)
+        meta, content = self.read_entry(url)
+        if meta is not None and time.time() - meta['fetched'] < self.ttl:
+            Logger.debug('HTTP cache hit for {u}'.format(u = url))
+            return CachedResponse(url, meta['status_code'], meta['headers'], content, True)
+        request_headers = dict(headers or {})
+        #Ask the server to only send the page if it changed since it was cached
+        if meta is not None:
+            cached_headers = {k.lower() : v for k, v in meta['headers'].items()}
+            if 'etag' in cached_headers:
+                request_headers['If-None-Match'] = cached_headers['etag']
+            if 'last-modified' in cached_headers:
+                request_headers['If-Modified-Since'] = cached_headers['last-modified']
+        if self.limiter is not None:
+            self.limiter.acquire()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers = request_headers), timeout = self.timeout if timeout is None else timeout) as response:
+                status_code, response_headers, body = response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and meta is not None:
+                Logger.debug('HTTP cache revalidated {u}'.format(u = url))
+                meta['fetched'] = time.time()
+                self.write_entry(meta, content)
+                return CachedResponse(url, meta['status_code'], meta['headers'], content, True)
+            #Errors are returned to the caller but never cached
+            return CachedResponse(url, e.code, dict(e.headers or {}), e.read() or b'', False)
+        except urllib.error.URLError as e:
+            if meta is None:
+                raise
+            Logger.debug('Serving stale cache entry for {u} ({e})'.format(u = url, e = e))
+            return CachedResponse(url, meta['status_code'], meta['headers'], content, True)
+        self.write_entry({'url' : url, 'status_code' : status_code, 'headers' : response_headers, 'fetched' : time.time()}, body)
+        return CachedResponse(url, status_code, response_headers, body, False)
+
+
+class CachedRequestsModule:
+    """
+    Proxy for the requests module that serves get through an HTTP cache and passes everything else through
+    Arguments:
+        requests_module: module, the requests module being replaced
+        cache: HTTPCache, cache to serve the pages from
+    """
+    def __init__(self, requests_module, cache):
+        self.requests_module = requests_module
+        self.cache = cache
+
+    def get(self, url, **kwargs):
+        return self.cache.get(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.requests_module, name)
+
+
+@contextmanager
+def cached_requests(module, cache):
+    """
+    Route a scraping module's requests.get calls through an HTTP cache for the duration of the block
+    Arguments:
+        module: module, scraping module that fetches pages with requests.get (e.g. pfr_scraping)
+        cache: HTTPCache, cache to serve the pages from
+    Returns:
+        None
+    """
+    if not hasattr(module, 'requests'):
+        #Nothing to route, e.g. pfr_scraping_stub never goes over the network
+        yield
+        return
+    original = module.requests
+    module.requests = CachedRequestsModule(original, cache)
+    try:
+        yield
+    finally:
+        module.requests = original
@@ -0,0 +1,212 @@
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+def count_rows(value):
+    """
+    Get the number of rows of a stage's input or output
+    Arguments:
+        value: object, a dataframe, series or array, a tuple or list whose first element is one, or a dictionary of them
+    Returns:
+        rows: int, number of rows, None if the value has none (e.g. a position string or a figure)
+    """
+    if isinstance(value, dict):
+        counts = [count_rows(v) for v in value.values()]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    if isinstance(value, (tuple, list)):
+        return count_rows(value[0]) if value else None
+    shape = getattr(value, 'shape', None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+class MetricsRegistry:
+    """
+    In-process registry of per-stage metrics. Each stage keeps running totals rather than every call, so the registry
+      stays small however often a stage runs
+    Arguments:
+        trace_memory: boolean, default false, whether to record peak memory, which runs tracemalloc and slows every
+          allocation down while on
+    """
+    def __init__(self, trace_memory = False):
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.trace_memory = False
+        self.set_trace_memory(trace_memory)
+
+    def set_trace_memory(self, trace_memory):
+        """
+        Turn peak memory recording on or off
+        Arguments:
+            trace_memory: boolean, whether to record peak memory
+        Returns:
+            None
+        """
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not trace_memory and self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = trace_memory
+
+    def reset(self):
+        """
+        Forget every recorded metric
+        Returns:
+            None
+        """
+        with self.lock:
+            self.stages = {}
+
+    def record(self, name, seconds, *, rows_in = None, rows_out = None, peak_bytes = None):
+        """
+        Add a call of a stage to its totals
+        Arguments:
+            name: string, name of the stage
+            seconds: float, wall time of the call
+            keyword:
+                rows_in: int, default None, number of rows the call took
+                rows_out: int, default None, number of rows the call returned
+                peak_bytes: int, default None, peak memory allocated during the call, above what was allocated before it
+        Returns:
+            None
+        """
+        with self.lock:
+            stage = self.stages.setdefault(name, {'calls' : 0, 'total_seconds' : 0.0, 'max_seconds' : 0.0, 'rows_in' : 0, 'rows_out' : 0, 'peak_bytes' : None})
+            stage['calls'] += 1
+            stage['total_seconds'] += seconds
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+            stage['rows_in'] += rows_in or 0
+            stage['rows_out'] += rows_out or 0
+            if peak_bytes is not None:
+                stage['peak_bytes'] = max(stage['peak_bytes'] or 0, peak_bytes)
+
+    def merge(self, metrics):
+        """
+        Add the metrics recorded by another registry, e.g. one in a worker process, to the totals
+        Arguments:
+            metrics: dictionary, output of another registry's snapshot
+        Returns:
+            None
+        """
+        with self.lock:
+            for name, other in metrics.items():
+                stage = self.stages.setdefault(name, {'calls' : 0, 'total_seconds' : 0.0, 'max_seconds' : 0.0, 'rows_in' : 0, 'rows_out' : 0, 'peak_bytes' : None})
+                for key in ('calls', 'total_seconds', 'rows_in', 'rows_out'):
+                    stage[key] += other[key]
+                stage['max_seconds'] = max(stage['max_seconds'], other['max_seconds'])
+                if other['peak_bytes'] is not None:
+                    stage['peak_bytes'] = max(stage['peak_bytes'] or 0, other['peak_bytes'])
+
+    def snapshot(self):
+        """
+        Get the recorded metrics
+        Returns:
+            metrics: dictionary, stage name to calls, total_seconds, mean_seconds, max_seconds, rows_in, rows_out and
+              peak_bytes
+        """
+        with self.lock:
+            return {name : dict(stage, mean_seconds = stage['total_seconds'] / stage['calls']) for name, stage in sorted(self.stages.items())}
+
+    def to_json(self, path = None):
+        """
+        Export the recorded metrics as JSON
+        Arguments:
+            path: string, default None, file to write the metrics to
+        Returns:
+            metrics: string, the metrics as a JSON document
+        """
+        document = json.dumps({'pid' : os.getpid(), 'stages' : self.snapshot()}, indent = 4)
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+            with open(path, 'w') as fh:
+                fh.write(document)
+        return document
+
+    @contextmanager
+    def measure(self, name, *, rows_in = None):
+        """
+        Record the wall time and peak memory of a block as a call of a stage
+        Arguments:
+            name: string, name of the stage
+            keyword:
+                rows_in: int, default None, number of rows the block takes
+        Returns:
+            call: dictionary, set its 'rows_out' to record the number of rows the block produced
+        """
+        call = {'rows_out' : None}
+        frames = self.local.__dict__.setdefault('frames', [])
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            #tracemalloc has one peak, so the enclosing stage keeps the peak seen so far before it is reset for this one
+            current, peak = tracemalloc.get_traced_memory()
+            if frames:
+                frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame = {'start' : current, 'peak' : current}
+            frames.append(frame)
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = None
+            if tracing:
+                frames.pop()
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                if frames:
+                    frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+                peak_bytes = peak - frame['start']
+            self.record(name, seconds, rows_in = rows_in, rows_out = call['rows_out'], peak_bytes = peak_bytes)
+
+
+#Registry the etl, analysis and viz entry points record into
+METRICS = MetricsRegistry(trace_memory = os.environ.get('FANTASY_TRACE_MEMORY', '') not in ('', '0'))
+
+
+def instrumented(fn = None, *, name = None, registry = None):
+    """
+    Decorate a function so every call records its wall time, rows in (of its first argument), rows out and peak memory
+    Arguments:
+        fn: function, function to instrument
+        keyword:
+            name: string, default None, stage name to record under, module.function if None
+            registry: MetricsRegistry, default None, registry to record into, METRICS if None
+    Returns:
+        wrapper: function, the instrumented function
+    """
+    if fn is None:
+        return functools.partial(instrumented, name = name, registry = registry)
+    stage_name = name or '{m}.{f}'.format(m = fn.__module__, f = fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with (registry or METRICS).measure(stage_name, rows_in = count_rows(args[0]) if args else None) as call:
+            output = fn(*args, **kwargs)
+            call['rows_out'] = count_rows(output)
+        return output
+    return wrapper
+
+
+def call_in_worker(fn, *args):
+    """
+    Call a function in a worker process, sending back the metrics it recorded with its output so the parent can merge
+      them into its own registry
+    Arguments:
+        fn: function, function to call
+        *args: arguments to pass to fn
+    Returns:
+        output: the return value of fn
+        metrics: dictionary, metrics recorded during the call, the output of METRICS.snapshot
+    """
+    #Forked workers start with a copy of the parent's totals and pool workers run many calls, so only send this one's
+    METRICS.reset()
+    output = fn(*args)
+    return output, METRICS.snapshot()
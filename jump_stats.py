@@ -0,0 +1,332 @@
+import numpy as np
+import os
+import pandas as pd
+import sys
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+
+import logging
+import logging_config
+logging_config.configure_logging()
+Logger = logging.getLogger(__name__)
+
+
+class JumpStatsStore:
+    """
+    Running sufficient statistics of the paired t-tests and medians of one position, so a new season only has to fold
+      in the players it touches instead of recomputing every jump from the full table. Each jump keeps the number of
+      pairs and the sum and sum of squares of the earlier minus later normalized season, and each age or career
+      season keeps its normalized values in sorted order for the medians
+    Arguments:
+        by: string, default 'age', either 'age' or 'career_season'
+        min_years: int, default 0, minimum number of years played
+        fp_cutoff_flat: float, default 0, minimum fantasy points to have hit in a year
+    """
+    def __init__(self, by = 'age', min_years = 0, fp_cutoff_flat = 0):
+        if by not in ('age', 'career_season'):
+            raise ValueError("by must be 'age' or 'career_season', got {b}".format(b = by))
+        self.by = by
+        self.min_years = min_years
+        self.fp_cutoff_flat = fp_cutoff_flat
+        #Raw fantasy points of every player, as ages and points of the seasons played
+        self.rows = {}
+        self.age_range = None
+        #Jump k compares label k to label k + 1, labels being ages or career seasons
+        self.n = np.zeros(0, dtype = np.int64)
+        self.sum_diffs = np.zeros(0)
+        self.sum_squared_diffs = np.zeros(0)
+        self.sorted_values = {}
+
+    @classmethod
+    def from_frame(cls, age_df, *, by = 'age', min_years = 0, fp_cutoff_flat = 0):
+        """
+        Build a store from a full fantasy points by age table
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age, with rows as players, ages as columns
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                min_years: int, minimum number of years played
+                fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+        Returns:
+            store: JumpStatsStore, statistics of every player in age_df
+        """
+        store = cls(by, min_years, fp_cutoff_flat)
+        store.fold_in(age_df)
+        return store
+
+    def to_frame(self):
+        """
+        Get the raw fantasy points by age table the store was built from
+        Returns:
+            df: pd.DataFrame, fantasy points by age, with rows as players, consecutive ages as columns
+        """
+        if self.age_range is None:
+            return pd.DataFrame(index = list(self.rows))
+        ages = np.arange(self.age_range[0], self.age_range[1] + 1)
+        matrix = np.full((len(self.rows), len(ages)), np.nan)
+        for i, (player_ages, points) in enumerate(self.rows.values()):
+            matrix[i, player_ages - ages[0]] = points
+        return pd.DataFrame(matrix, index = list(self.rows), columns = ages)
+
+    def entries(self, age_df):
+        """
+        Get what a set of players contributes to the statistics, after filtering and normalizing them as
+          analysis.normalized_fantasy_points_by_age does
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age of the players
+        Returns:
+            labels: np.ndarray, age or career season of every normalized season
+            values: np.ndarray, normalized fantasy points of every season
+            jumps: np.ndarray, earlier label of every pair of consecutive seasons
+            diffs: np.ndarray, earlier minus later normalized fantasy points of every pair
+        """
+        ages = np.asarray(age_df.columns.astype(int))
+        if not len(ages) or not len(age_df):
+            return np.zeros(0, dtype = np.int64), np.zeros(0), np.zeros(0, dtype = np.int64), np.zeros(0)
+        #Spread the columns over consecutive ages so neighbouring columns are one season apart
+        full_ages = np.arange(ages.min(), ages.max() + 1)
+        matrix = np.full((len(age_df), len(full_ages)), np.nan)
+        matrix[:, ages - full_ages[0]] = age_df.to_numpy(dtype = float)
+        present = ~np.isnan(matrix)
+        best = np.fmax.reduce(matrix, axis = 1, initial = np.nan)
+        keep = (present.sum(axis = 1) >= self.min_years) & (best > self.fp_cutoff_flat)
+        matrix, present = matrix[keep] / best[keep, None], present[keep]
+        labels = np.broadcast_to(full_ages, matrix.shape)
+        if self.by == 'career_season':
+            labels = labels - full_ages[present.argmax(axis = 1)][:, None] + 1
+        rows, cols = np.nonzero(present)
+        pairs = present[:, :-1] & present[:, 1:]
+        return labels[rows, cols], matrix[rows, cols], labels[:, :-1][pairs], (matrix[:, :-1] - matrix[:, 1:])[pairs]
+
+    def accumulate(self, age_df, sign):
+        """
+        Add a set of players to the statistics, or take them back out
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age of the players
+            sign: int, 1 to add the players, -1 to remove them
+        Returns:
+            None
+        """
+        labels, values, jumps, diffs = self.entries(age_df)
+        if len(jumps):
+            size = max(len(self.n), jumps.max() + 1)
+            if size > len(self.n):
+                self.n = np.pad(self.n, (0, size - len(self.n)))
+                self.sum_diffs = np.pad(self.sum_diffs, (0, size - len(self.sum_diffs)))
+                self.sum_squared_diffs = np.pad(self.sum_squared_diffs, (0, size - len(self.sum_squared_diffs)))
+            self.n += sign * np.bincount(jumps, minlength = size)
+            self.sum_diffs += sign * np.bincount(jumps, weights = diffs, minlength = size)
+            self.sum_squared_diffs += sign * np.bincount(jumps, weights = diffs ** 2, minlength = size)
+        order = np.lexsort((values, labels))
+        labels, values = labels[order], values[order]
+        present, starts = np.unique(labels, return_index = True)
+        for label, label_values in zip(present, np.split(values, starts[1:])):
+            column = self.sorted_values.get(label, np.zeros(0))
+            if sign > 0:
+                self.sorted_values[label] = np.insert(column, np.searchsorted(column, label_values), label_values)
+                continue
+            #Removed values are recomputed from the same raw points, so they match the stored ones exactly.
+            #Repeated values step past the copies already matched
+            first = np.unique(label_values, return_index = True, return_inverse = True)
+            repeat = np.arange(len(label_values)) - first[1][first[2]]
+            column = np.delete(column, np.searchsorted(column, label_values) + repeat)
+            if len(column):
+                self.sorted_values[label] = column
+            else:
+                del self.sorted_values[label]
+
+    def fold_in(self, age_df):
+        """
+        Fold new or updated players into the statistics, in time proportional to the number of players given. Players
+          already in the store have their old seasons taken out first, since a new best season renormalizes them
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age of the new or updated players, with their full careers
+        Returns:
+            None
+        """
+        updated = [player for player in age_df.index if player in self.rows]
+        if updated:
+            self.accumulate(pd.DataFrame.from_dict({player : pd.Series(self.rows[player][1], index = self.rows[player][0]) for player in updated}, orient = 'index'), -1)
+        self.accumulate(age_df, 1)
+        ages = np.asarray(age_df.columns.astype(int))
+        values = age_df.to_numpy(dtype = float)
+        for player, row in zip(age_df.index, values):
+            played = ~np.isnan(row)
+            self.rows[player] = (ages[played], row[played])
+        if len(ages):
+            low, high = ages.min(), ages.max()
+            self.age_range = (low, high) if self.age_range is None else (min(self.age_range[0], low), max(self.age_range[1], high))
+        Logger.debug('Folded {n} players into the {by} jump statistics ({u} updated)'.format(n = len(age_df), by = self.by, u = len(updated)))
+
+    def paired_t_test_table(self, *, alternative = 'greater'):
+        """
+        Get the paired t-test statistics of every jump from the running sums, as analysis.paired_t_test_table does
+        Arguments:
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+        Returns:
+            t_tests: pd.DataFrame, with a row per jump (e.g. 23-24) and columns n, Mean Difference, Std Difference,
+              T-statistic and P-value. Jumps with fewer than two players are left out
+        """
+        tested = np.flatnonzero(self.n > 1)
+        n = self.n[tested]
+        mean = self.sum_diffs[tested] / n
+        #Clip the rounding left over from folding players in and out
+        std = np.sqrt(np.clip(self.sum_squared_diffs[tested] - n * mean ** 2, 0, None) / (n - 1))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            t = mean / (std / np.sqrt(n))
+        p = analysis.t_test_p_values(t, n - 1, alternative = alternative)
+        return pd.DataFrame({'n' : n, 'Mean Difference' : mean, 'Std Difference' : std, 'T-statistic' : t, 'P-value' : p}, index = [str(k) + '-' + str(k + 1) for k in tested])
+
+    def medians(self):
+        """
+        Get the median normalized fantasy points of every age or career season
+        Returns:
+            medians: pd.Series, median by age (every age of the table) or by career season (every season someone has
+              an entry for)
+        """
+        if self.by == 'age':
+            labels = np.arange(self.age_range[0], self.age_range[1] + 1) if self.age_range is not None else np.zeros(0, dtype = np.int64)
+        else:
+            labels = np.array(sorted(self.sorted_values), dtype = np.int64)
+        medians = pd.Series(np.nan, index = labels)
+        for label in labels:
+            column = self.sorted_values.get(label)
+            if column is not None:
+                medians[label] = (column[(len(column) - 1) // 2] + column[len(column) // 2]) / 2
+        return medians
+
+    def median_differences(self):
+        """
+        Get the change in median between consecutive ages or career seasons
+        Returns:
+            med_diffs: pd.Series, difference in median by jump (e.g. 23-24)
+        """
+        medians = self.medians()
+        labels = [str(c) for c in medians.index]
+        return pd.Series(medians.to_numpy()[1:] - medians.to_numpy()[:-1], index = [labels[i] + '-' + labels[i + 1] for i in range(len(labels) - 1)], dtype = float)
+
+    def median_and_p_vals(self, *, alternative = 'greater'):
+        """
+        Get a table of changes in median and paired t-test p-values by jump, as analysis.median_and_p_vals_by_age and
+          analysis.median_and_p_vals_by_career_season do
+        Arguments:
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+        Returns:
+            med_diffs: pd.DataFrame, difference in median and p-value by jump
+        """
+        medians_and_p_vals = pd.concat([self.median_differences(), self.paired_t_test_table(alternative = alternative)['P-value']], axis = 1)
+        medians_and_p_vals.columns = ['Change in Median', 'P-value']
+        return medians_and_p_vals
+
+    def check_consistency(self, *, alternative = 'greater', rtol = 1e-9, atol = 1e-12):
+        """
+        Check the statistics against a full recompute from the raw table with analysis.py
+        Arguments:
+            keyword:
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+                rtol: float, default 1e-9, relative tolerance
+                atol: float, default 1e-12, absolute tolerance
+        Returns:
+            consistent: boolean, whether every change in median and p-value matches the full recompute
+        """
+        age_df = self.to_frame()
+        if self.by == 'age':
+            full = analysis.median_and_p_vals_by_age(age_df, alternative = alternative, min_years = self.min_years, fp_cutoff_flat = self.fp_cutoff_flat)
+        else:
+            full = analysis.median_and_p_vals_by_career_season(age_df, alternative = alternative, min_years = self.min_years, fp_cutoff_flat = self.fp_cutoff_flat)
+        incremental = self.median_and_p_vals(alternative = alternative)
+        if list(full.index) != list(incremental.index):
+            Logger.debug('Jump statistics cover {i}, full recompute covers {f}'.format(i = list(incremental.index), f = list(full.index)))
+            return False
+        matches = np.isclose(incremental.to_numpy(dtype = float), full.to_numpy(dtype = float), rtol = rtol, atol = atol, equal_nan = True)
+        if not matches.all():
+            Logger.debug('Jump statistics differ from the full recompute at {j}'.format(j = list(full.index[~matches.all(axis = 1)])))
+        return bool(matches.all())
+
+    def save(self, path):
+        """
+        Write the store to disk
+        Arguments:
+            path: string, path of the .npz file
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        players = list(self.rows)
+        lengths = [len(self.rows[p][0]) for p in players]
+        labels = np.array(sorted(self.sorted_values), dtype = np.int64)
+        with open(path, 'wb') as fh:
+            np.savez(fh, by = self.by, min_years = self.min_years, fp_cutoff_flat = self.fp_cutoff_flat,
+                     players = np.asarray(players, dtype = str), row_offsets = np.concatenate([[0], np.cumsum(lengths, dtype = np.int64)]),
+                     row_ages = np.concatenate([self.rows[p][0] for p in players] + [np.zeros(0, dtype = np.int64)]),
+                     row_points = np.concatenate([self.rows[p][1] for p in players] + [np.zeros(0)]),
+                     n = self.n, sum_diffs = self.sum_diffs, sum_squared_diffs = self.sum_squared_diffs,
+                     labels = labels, value_offsets = np.concatenate([[0], np.cumsum([len(self.sorted_values[k]) for k in labels], dtype = np.int64)]),
+                     values = np.concatenate([self.sorted_values[k] for k in labels] + [np.zeros(0)]))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a store written by save
+        Arguments:
+            path: string, path of the .npz file
+        Returns:
+            store: JumpStatsStore, the store
+        """
+        with np.load(path) as saved:
+            store = cls(str(saved['by']), int(saved['min_years']), float(saved['fp_cutoff_flat']))
+            offsets, ages, points = saved['row_offsets'], saved['row_ages'], saved['row_points']
+            store.rows = {player : (ages[offsets[i]:offsets[i + 1]], points[offsets[i]:offsets[i + 1]]) for i, player in enumerate(saved['players'])}
+            if len(ages):
+                store.age_range = (int(ages.min()), int(ages.max()))
+            store.n, store.sum_diffs, store.sum_squared_diffs = saved['n'], saved['sum_diffs'], saved['sum_squared_diffs']
+            value_offsets, values = saved['value_offsets'], saved['values']
+            store.sorted_values = {label : values[value_offsets[i]:value_offsets[i + 1]] for i, label in enumerate(saved['labels'])}
+        return store
+
+
+def store_path(position, by):
+    """
+    Get the path the jump statistics of a position are saved to
+    Arguments:
+        position: string, two letter position abbreviation
+        by: string, either 'age' or 'career_season'
+    Returns:
+        path: string, path of the .npz file
+    """
+    return os.path.abspath('../data/processed/{pos}_{by}_jump_stats.npz'.format(pos = position, by = by))
+
+
+def fold_into_saved_stores(position, age_df):
+    """
+    Fold new or updated players into every saved jump statistics store of a position
+    Arguments:
+        position: string, two letter position abbreviation
+        age_df: pd.DataFrame, fantasy points by age of the new or updated players, with their full careers
+    Returns:
+        None
+    """
+    for by in ('age', 'career_season'):
+        path = store_path(position, by)
+        if os.path.exists(path):
+            store = JumpStatsStore.load(path)
+            store.fold_in(age_df)
+            store.save(path)
+
+
+def paired_t_test_by_position(stores, *, alternative = 'greater'):
+    """
+    Get a table of paired t-test p-values by jump, where each row is a position, straight from the jump statistics,
+      as analysis.paired_t_test_by_age_and_position and analysis.paired_t_test_by_career_season_and_position do
+    Arguments:
+        stores: dictionary, position to JumpStatsStore
+        keyword:
+            alternative: string, default 'greater', alternative hypothesis for paired t-test
+    Returns:
+        p_values: pd.DataFrame, paired t-test p-values by jump, with each row as a position
+    """
+    p_values = pd.concat([store.paired_t_test_table(alternative = alternative)['P-value'].rename(position) for position, store in stores.items()], axis = 1)
+    return p_values.T.dropna(axis = 1, how = 'all')
@@ -0,0 +1,35 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported the first time one of its attributes is used, so heavy dependencies
+      (scipy.stats, matplotlib, seaborn) stay out of the import time of code paths that never touch them
+    Arguments:
+        name: string, full name of the module (e.g. 'matplotlib.pyplot')
+        on_load: function, default None, called with the module right after it is imported, must be safe to call twice
+    """
+    def __init__(self, name, on_load = None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+
+    def _load(self):
+        """
+        Import the module if it has not been yet
+        Returns:
+            module: module, the imported module
+        """
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._on_load is not None:
+                self._on_load(module)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        #Only called for attributes the stand-in itself does not have
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return "<lazy module '{n}' ({s})>".format(n = self._name, s = 'loaded' if self._module is not None else 'not loaded')
@@ -0,0 +1,78 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+#FANTASY_LOG_FILE moves the log, e.g. out of the repo for test runs, including any subprocesses they start
+LOG_FILE = os.environ.get('FANTASY_LOG_FILE', '../logger.log')
+LOG_FORMAT = '%(asctime)s %(levelname)s:%(name)s :: %(message)s'
+LOG_DATEFMT = '%m/%d/%Y %H:%M:%S'
+
+#Records are put on a queue by the logging call and written to the file by a listener thread
+_queue_handler = None
+_listener = None
+
+
+def start_listener():
+    """
+    Start the thread that writes queued records to the log file, on a fresh queue
+    Returns:
+        None
+    """
+    global _listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_listener.handlers)
+    _listener.start()
+
+
+def stop_listener():
+    """
+    Write out every queued record and stop the listener thread
+    Returns:
+        None
+    """
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def restart_listener_in_child():
+    """
+    Give a forked process its own listener, since threads do not survive a fork, and write out its queue when it exits
+      (pool workers leave through multiprocessing, which skips atexit)
+    Returns:
+        None
+    """
+    start_listener()
+    util = sys.modules.get('multiprocessing.util')
+    if util is not None:
+        util.Finalize(None, stop_listener, exitpriority = 10)
+
+
+def configure_logging(filename = LOG_FILE, *, level = logging.DEBUG):
+    """
+    Send log records to the project log file through a queue, so logging never waits on the disk. The file is only
+      opened when the first record is written, so importing a module does not touch the disk, and nothing changes if
+      logging has already been configured
+    Arguments:
+        filename: string, default LOG_FILE ('../logger.log' unless FANTASY_LOG_FILE is set), path of the log file,
+          relative to the working directory
+        keyword:
+            level: int, default logging.DEBUG, level of the root logger
+    Returns:
+        None
+    """
+    global _queue_handler, _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    file_handler = logging.FileHandler(filename, encoding = 'utf-8', delay = True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt = LOG_DATEFMT))
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, file_handler)
+    start_listener()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    atexit.register(stop_listener)
+    os.register_at_fork(after_in_child = restart_listener_in_child)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import threading
+import time
+
+#Offline stand-in for pfr_scraping, exposing the same two calls used by etl.py so the
+#scraping engine can be exercised without touching pro-football-reference.com
+LATENCY = 0.0
+FAIL_EVERY = 0
+_calls = {'n' : 0}
+_calls_lock = threading.Lock()
+
+
+def get_all_players_slugs(year, position, *, n_players = 50):
+    """
+    Get a deterministic dictionary of fake player names to slugs for a given year and position
+    Arguments:
+        year: int, season to get the players for
+        position: string, two letter position abbreviation
+        keyword:
+            n_players: int, default 50, number of players active in the season
+    Returns:
+        slugs: dictionary, player name to player slug
+    """
+    time.sleep(LATENCY)
+    #Players overlap between years so the union of slugs behaves like the real site
+    offset = (year % 100) * (n_players // 5)
+    return {'{pos} Player{i:05d}'.format(pos = position, i = i) : '{pos}/P{i:05d}'.format(pos = position, i = i) for i in range(offset, offset + n_players)}
+
+
+def get_player_career_stats_from_slug(slug):
+    """
+    Get a deterministic fake career stats table for a given player slug
+    Arguments:
+        slug: string, player slug as returned by get_all_players_slugs
+    Returns:
+        stats: pd.DataFrame, one row per season with 'Age', '*Fantasy Points*' and the component stats the points
+          were scored from under the ppr scoring in data-params.json
+    """
+    time.sleep(LATENCY)
+    #The scraping engine calls this from a thread pool
+    with _calls_lock:
+        _calls['n'] += 1
+        n_calls = _calls['n']
+    #Fail every FAIL_EVERY-th call to exercise retry and backoff
+    if FAIL_EVERY and n_calls % FAIL_EVERY == 0:
+        raise ConnectionError('Simulated failure fetching {s}'.format(s = slug))
+    seed = int(slug.split('P')[-1])
+    rng = np.random.default_rng(seed)
+    start_age = int(rng.integers(21, 25))
+    n_seasons = int(rng.integers(1, 12))
+    ages = np.arange(start_age, min(start_age + n_seasons, 46))
+    #Rise to a peak a few seasons in and then fall off
+    peak = rng.uniform(50, 350)
+    curve = peak * np.exp(-((ages - (start_age + rng.integers(1, 6))) / 4.0) ** 2)
+    points = np.round(np.clip(curve + rng.normal(0, 20, len(ages)), 0, None), 2)
+    return pd.DataFrame({'Age' : ages, '*Fantasy Points*' : points, **component_stats(slug.split('/')[0], points)})
+
+
+def component_stats(position, points):
+    """
+    Split fantasy points into the position's component stats, so they add back up to the points under ppr scoring
+    Arguments:
+        position: string, two letter position abbreviation
+        points: np.ndarray, ppr fantasy points of every season
+    Returns:
+        components: dictionary, stat name to the value of every season
+    """
+    if position == 'QB':
+        rushing_yds = np.floor(points * .1)
+        passing_td = np.floor(points * .3 / 6)
+        return {'Passing Yds' : (points - 6 * passing_td - .1 * rushing_yds) / .04, 'Passing TD' : passing_td, 'Rushing Yds' : rushing_yds}
+    receptions = np.floor(points * .15)
+    receiving_td = np.floor(points * .2 / 6)
+    if position == 'RB':
+        receiving_yds = np.floor(points * .2)
+        return {'Rushing Yds' : (points - receptions - 6 * receiving_td - .1 * receiving_yds) / .1, 'Receptions' : receptions, 'Receiving Yds' : receiving_yds, 'Receiving TD' : receiving_td}
+    return {'Receptions' : receptions, 'Receiving Yds' : (points - receptions - 6 * receiving_td) / .1, 'Receiving TD' : receiving_td}
+
+
+def get_player_game_logs_from_slug(slug, *, n_weeks = 18):
+    """
+    Get a deterministic fake game log for a given player slug, splitting each season of
+      get_player_career_stats_from_slug over the weeks the player played so the weeks add back up to the season
+    Arguments:
+        slug: string, player slug as returned by get_all_players_slugs
+        keyword:
+            n_weeks: int, default 18, number of weeks in a season
+    Returns:
+        game_logs: pd.DataFrame, one row per game with 'Age', 'Week' and '*Fantasy Points*'
+    """
+    career_stats = get_player_career_stats_from_slug(slug)
+    rng = np.random.default_rng(int(slug.split('P')[-1]) + 1)
+    ages, weeks, points = [], [], []
+    for age, season_points in zip(career_stats['Age'], career_stats['*Fantasy Points*']):
+        #Every player misses a few games, including a bye week
+        played = np.sort(rng.choice(np.arange(1, n_weeks + 1), size = int(rng.integers(n_weeks - 6, n_weeks)), replace = False))
+        share = rng.dirichlet(np.ones(len(played)))
+        ages.append(np.full(len(played), age))
+        weeks.append(played)
+        points.append(season_points * share)
+    if not ages:
+        return pd.DataFrame({'Age' : [], 'Week' : [], '*Fantasy Points*' : []})
+    return pd.DataFrame({'Age' : np.concatenate(ages), 'Week' : np.concatenate(weeks), '*Fantasy Points*' : np.concatenate(points)})
@@ -0,0 +1,439 @@
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pandas as pd
+import sys
+import time
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+import etl
+import http_cache
+from instrumentation import METRICS, count_rows
+import jump_stats
+import viz
+
+import logging
+import logging_config
+logging_config.configure_logging()
+Logger = logging.getLogger(__name__)
+
+PIPELINE_CACHE_DIR = '../data/pipeline'
+#Modules each stage function calls into, whose code is part of that stage's cache key, so editing a module only reruns
+#the stages that use it
+STAGE_MODULES = {'load_raw' : (etl, http_cache),
+                 'normalize' : (analysis, jump_stats),
+                 'test' : (analysis, jump_stats),
+                 'summarize' : (analysis, jump_stats),
+                 'compare' : (),
+                 'render' : (viz,),
+                 'render_heatmap' : (viz,)}
+
+
+def load_raw(inputs, *, position, years, incremental):
+    """
+    Pipeline stage: read (or scrape) the fantasy points by age table of a position
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on (none)
+        keyword:
+            position: string, two letter position abbreviation
+            years: list of int, seasons scraped, passed so a change of years reruns the stage
+            incremental: boolean, whether to fetch the years in data-params.json the .csv is missing
+    Returns:
+        age_df: pd.DataFrame, fantasy points by age
+    """
+    return etl.get_fantasy_points_by_age(position, incremental = incremental)
+
+
+def normalize(inputs, *, raw, by, min_years, fp_cutoff_flat):
+    """
+    Pipeline stage: filter, normalize and unstack the fantasy points of a position
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on
+        keyword:
+            raw: string, id of the load_raw stage
+            by: string, either 'age' or 'career_season'
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+    Returns:
+        unstacked: pd.DataFrame, normalized fantasy points, one row per player season
+    """
+    if by == 'age':
+        return analysis.unstack_and_normalize_fantasy_points_and_age(inputs[raw], min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    return analysis.unstack_and_normalize_fantasy_points_and_career_season(inputs[raw], min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+
+
+def test(inputs, *, raw, by, alternative, min_years, fp_cutoff_flat):
+    """
+    Pipeline stage: changes in median and paired t-test p-values by jump of a position
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on
+        keyword:
+            raw: string, id of the load_raw stage
+            by: string, either 'age' or 'career_season'
+            alternative: string, alternative hypothesis for paired t-test
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+    Returns:
+        med_p_vals: pd.DataFrame, difference in median and p-value by jump
+    """
+    if by == 'age':
+        return analysis.median_and_p_vals_by_age(inputs[raw], alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    return analysis.median_and_p_vals_by_career_season(inputs[raw], alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+
+
+def summarize(inputs, *, raw, by, min_years, fp_cutoff_flat):
+    """
+    Pipeline stage: median normalized fantasy points of a position
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on
+        keyword:
+            raw: string, id of the load_raw stage
+            by: string, either 'age' or 'career_season'
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+    Returns:
+        medians: pd.Series, median fantasy points by age or career season
+    """
+    if by == 'age':
+        return analysis.median_fantasy_points_by_age(inputs[raw], min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+    return analysis.median_fantasy_points_by_career_season(inputs[raw], min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+
+
+def render(inputs, *, normalized, tested, summarized, position, by, output_dir):
+    """
+    Pipeline stage: draw the box and whiskers plot with its table and the median bar chart of a position
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on
+        keyword:
+            normalized: string, id of the normalize stage
+            tested: string, id of the test stage
+            summarized: string, id of the summarize stage
+            position: string, two letter position abbreviation
+            by: string, either 'age' or 'career_season'
+            output_dir: string, folder to save the figures to
+    Returns:
+        files: list, paths of the figures saved
+    """
+    name = viz.POSITION_NAMES.get(position, position)
+    with viz.agg_backend():
+        if by == 'age':
+            viz.plot_box_and_whiskers_age_with_table(inputs[normalized], inputs[tested], name, True, output_dir = output_dir, show = False)
+            viz.plot_median_fantasy_points_age(inputs[summarized], name, True, output_dir = output_dir, show = False)
+        else:
+            viz.plot_box_and_whiskers_career_season_with_table(inputs[normalized], inputs[tested], name, True, output_dir = output_dir, show = False)
+            viz.plot_median_fantasy_points_career_season(inputs[summarized], name, True, output_dir = output_dir, show = False)
+    prefix = os.path.join(os.path.abspath(output_dir), name.replace(' ', '_'))
+    return [prefix + '_box_and_whiskers_{by}_with_table.png'.format(by = by), prefix + '_median_fantasy_points_{by}.png'.format(by = by)]
+
+
+def compare(inputs, *, tested):
+    """
+    Pipeline stage: paired t-test p-values of every position side by side, as
+      analysis.paired_t_test_by_age_and_position and analysis.paired_t_test_by_career_season_and_position build them
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on
+        keyword:
+            tested: dictionary, position to id of its test stage
+    Returns:
+        p_values: pd.DataFrame, paired t-test p-values by jump, with each row as a position
+    """
+    p_values = pd.concat([inputs[stage_id]['P-value'].rename(position) for position, stage_id in tested.items()], axis = 1)
+    return p_values.T.dropna(axis = 1, how = 'all')
+
+
+def render_heatmap(inputs, *, compared, by, output_dir):
+    """
+    Pipeline stage: draw the heatmap of p-values by jump and position
+    Arguments:
+        inputs: dictionary, outputs of the stages this one depends on
+        keyword:
+            compared: string, id of the compare stage
+            by: string, either 'age' or 'career_season'
+            output_dir: string, folder to save the figure to
+    Returns:
+        files: list, paths of the figures saved
+    """
+    with viz.agg_backend():
+        if by == 'age':
+            viz.plot_heatmap_p_values_age_jumps(inputs[compared], True, output_dir = output_dir, show = False)
+            return [os.path.join(os.path.abspath(output_dir), 'heatmap_p_values_age_jumps.png')]
+        viz.plot_heatmap_p_values_career_season_jumps(inputs[compared], True, output_dir = output_dir, show = False)
+    return [os.path.join(os.path.abspath(output_dir), 'heatmap_p_values_career_szn_jumps.png')]
+
+
+@functools.lru_cache(maxsize = None)
+def modules_fingerprint(modules):
+    """
+    Get a fingerprint of the source of the modules a stage calls into, so editing any of them reruns the stage
+    Arguments:
+        modules: tuple, modules from STAGE_MODULES
+    Returns:
+        fingerprint: string, hex digest of the modules' source files
+    """
+    h = hashlib.sha1()
+    for module in modules:
+        with open(module.__file__, 'rb') as fh:
+            h.update(fh.read())
+    return h.hexdigest()
+
+
+class Stage:
+    """
+    One step of the pipeline
+    Arguments:
+        stage_id: string, unique name of the stage (e.g. 'test/QB/age')
+        fn: function, module level stage function taking the outputs of its dependencies and params, listed in STAGE_MODULES
+        params: dictionary, keyword arguments of fn, part of the cache key
+        deps: list, ids of the stages whose outputs fn takes
+        volatile: boolean, default false, whether the stage always runs and is keyed on its output instead (used for
+          reading the raw data, which is cheap and changes outside the pipeline)
+    """
+    def __init__(self, stage_id, fn, params, deps, volatile = False):
+        self.stage_id = stage_id
+        self.fn = fn
+        self.params = params
+        self.deps = deps
+        self.volatile = volatile
+
+    def key(self, dep_keys):
+        """
+        Get the cache key of the stage, which changes with its code, the code of the modules it calls, its parameters
+          or any input
+        Arguments:
+            dep_keys: dictionary, stage id to cache key of every dependency
+        Returns:
+            key: string, hex digest
+        """
+        h = hashlib.sha1()
+        h.update(inspect.getsource(self.fn).encode())
+        h.update(modules_fingerprint(STAGE_MODULES[self.fn.__name__]).encode())
+        h.update(json.dumps(self.params, sort_keys = True, default = str).encode())
+        for dep in self.deps:
+            h.update(dep_keys[dep].encode())
+        return h.hexdigest()
+
+
+def build_stages(data_cfg, *, alternative = 'greater', output_dir = '../visualizations', incremental = False):
+    """
+    Build the stages of the pipeline from data-params.json
+    Arguments:
+        data_cfg: dictionary, contents of data-params.json
+        keyword:
+            alternative: string, default 'greater', alternative hypothesis for paired t-test
+            output_dir: string, default '../visualizations', folder to save the figures to
+            incremental: boolean, default false, whether load_raw fetches the years the .csv files are missing
+    Returns:
+        stages: list of Stage, every stage after all of its dependencies
+    """
+    stages = []
+    positions = data_cfg['positions']
+    for by in ('age', 'career_season'):
+        tested = {}
+        for position in positions:
+            raw = 'load_raw/{pos}'.format(pos = position)
+            if by == 'age':
+                stages.append(Stage(raw, load_raw, {'position' : position, 'years' : data_cfg['years'], 'incremental' : incremental}, [], volatile = True))
+            filters = {'min_years' : data_cfg.get('min_years', {}).get(position, 0), 'fp_cutoff_flat' : data_cfg.get('fp_cutoff_flat', {}).get(position, 0)}
+            ids = {stage : '{s}/{pos}/{by}'.format(s = stage, pos = position, by = by) for stage in ('normalize', 'test', 'summarize', 'render')}
+            stages.append(Stage(ids['normalize'], normalize, {'raw' : raw, 'by' : by, **filters}, [raw]))
+            stages.append(Stage(ids['test'], test, {'raw' : raw, 'by' : by, 'alternative' : alternative, **filters}, [raw]))
+            stages.append(Stage(ids['summarize'], summarize, {'raw' : raw, 'by' : by, **filters}, [raw]))
+            stages.append(Stage(ids['render'], render, {'normalized' : ids['normalize'], 'tested' : ids['test'], 'summarized' : ids['summarize'], 'position' : position, 'by' : by, 'output_dir' : output_dir},
+                                [ids['normalize'], ids['test'], ids['summarize']]))
+            tested[position] = ids['test']
+        compared = 'compare/{by}'.format(by = by)
+        stages.append(Stage(compared, compare, {'tested' : tested}, list(tested.values())))
+        stages.append(Stage('render_heatmap/{by}'.format(by = by), render_heatmap, {'compared' : compared, 'by' : by, 'output_dir' : output_dir}, [compared]))
+    return stages
+
+
+def run_stage(fn, inputs, params, *, in_worker = False):
+    """
+    Run a stage function, in a worker process when the pipeline runs in parallel
+    Arguments:
+        fn: function, stage function
+        inputs: dictionary, outputs of the stage's dependencies
+        params: dictionary, keyword arguments of fn
+        keyword:
+            in_worker: boolean, default false, whether this is a worker process, whose metrics are sent back
+    Returns:
+        output: the stage's output
+        seconds: float, wall time of the stage
+        metrics: dictionary, metrics the stage recorded in the worker, None outside of a worker
+    """
+    if in_worker:
+        METRICS.reset()
+    start = time.perf_counter()
+    with METRICS.measure('pipeline.' + fn.__name__, rows_in = count_rows(inputs)) as call:
+        output = fn(inputs, **params)
+        call['rows_out'] = count_rows(output)
+    return output, time.perf_counter() - start, METRICS.snapshot() if in_worker else None
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order, in parallel across a process pool, skipping every stage whose code, parameters
+      and inputs are unchanged since its output was cached
+    Arguments:
+        stages: list of Stage, every stage after all of its dependencies
+        cache_dir: string, default PIPELINE_CACHE_DIR, folder the stage outputs and their keys are cached in
+    """
+    def __init__(self, stages, cache_dir = PIPELINE_CACHE_DIR):
+        self.stages = {stage.stage_id : stage for stage in stages}
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.manifest_path = os.path.join(self.cache_dir, 'manifest.json')
+        self.keys = {}
+        self.outputs = {}
+
+    def output_path(self, stage_id):
+        """
+        Get the file a stage's output is cached in
+        Arguments:
+            stage_id: string, id of the stage
+        Returns:
+            path: string, path of the pickle
+        """
+        return os.path.join(self.cache_dir, stage_id.replace('/', '__') + '.pkl')
+
+    def read_manifest(self):
+        """
+        Read the cache keys of the outputs cached by the last run
+        Returns:
+            manifest: dictionary, stage id to cache key
+        """
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as fh:
+            return json.load(fh)
+
+    def write_manifest(self, manifest):
+        """
+        Write the cache keys of the cached outputs
+        Arguments:
+            manifest: dictionary, stage id to cache key
+        Returns:
+            None
+        """
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(manifest, fh, indent = 4, sort_keys = True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_cached(self, stage, key, manifest):
+        """
+        Check whether a stage's cached output is still valid
+        Arguments:
+            stage: Stage, the stage
+            key: string, the stage's current cache key
+            manifest: dictionary, stage id to cache key of the cached outputs
+        Returns:
+            cached: boolean, whether the stage can be skipped
+        """
+        if manifest.get(stage.stage_id) != key or not os.path.exists(self.output_path(stage.stage_id)):
+            return False
+        if stage.fn in (render, render_heatmap):
+            #Figures can be deleted from outside the pipeline
+            return all(os.path.exists(path) for path in pd.read_pickle(self.output_path(stage.stage_id)))
+        return True
+
+    def output(self, stage_id):
+        """
+        Get a stage's output, reading it from the cache if it was skipped
+        Arguments:
+            stage_id: string, id of the stage
+        Returns:
+            output: the stage's output
+        """
+        if stage_id not in self.outputs:
+            self.outputs[stage_id] = pd.read_pickle(self.output_path(stage_id))
+        return self.outputs[stage_id]
+
+    def run(self, *, max_workers = None, force = False):
+        """
+        Run the pipeline
+        Arguments:
+            keyword:
+                max_workers: int, default None (one per CPU), number of worker processes, 1 runs in this process
+                force: boolean, default false, whether to rerun every stage even if it is cached
+        Returns:
+            report: pd.DataFrame, with a row per stage and columns Status ('ran' or 'cached') and Seconds
+        """
+        os.makedirs(self.cache_dir, exist_ok = True)
+        manifest = {} if force else self.read_manifest()
+        report = {}
+        pending = dict(self.stages)
+        executor = ProcessPoolExecutor(max_workers = max_workers) if max_workers != 1 else None
+        running = {}
+        try:
+            while pending or running:
+                #Every stage whose dependencies are done is either skipped now or submitted
+                for stage_id, stage in list(pending.items()):
+                    if not all(dep in self.keys for dep in stage.deps):
+                        continue
+                    del pending[stage_id]
+                    if not stage.volatile:
+                        key = stage.key(self.keys)
+                        if self.is_cached(stage, key, manifest):
+                            self.keys[stage_id] = key
+                            report[stage_id] = {'Status' : 'cached', 'Seconds' : 0.0}
+                            Logger.debug('Pipeline stage {s} is up to date'.format(s = stage_id))
+                            continue
+                    inputs = {dep : self.output(dep) for dep in stage.deps}
+                    if executor is None:
+                        running[stage_id] = run_stage(stage.fn, inputs, stage.params)
+                    else:
+                        running[stage_id] = executor.submit(run_stage, stage.fn, inputs, stage.params, in_worker = True)
+                if executor is None:
+                    done = list(running)
+                else:
+                    finished = wait(running.values(), return_when = FIRST_COMPLETED).done
+                    done = [stage_id for stage_id, future in running.items() if future in finished]
+                for stage_id in done:
+                    result = running.pop(stage_id)
+                    output, seconds, metrics = result if executor is None else result.result()
+                    if metrics is not None:
+                        METRICS.merge(metrics)
+                    stage = self.stages[stage_id]
+                    if stage.volatile:
+                        #Keyed on what it read, so downstream stages only rerun when the data actually changed
+                        key = hashlib.sha1((stage.key({}) + analysis.frame_fingerprint(output)).encode()).hexdigest()
+                    else:
+                        key = stage.key(self.keys)
+                    self.keys[stage_id] = key
+                    self.outputs[stage_id] = output
+                    pd.to_pickle(output, self.output_path(stage_id))
+                    manifest[stage_id] = key
+                    report[stage_id] = {'Status' : 'ran', 'Seconds' : seconds}
+                    Logger.debug('Pipeline stage {s} ran in {t:.3f}s'.format(s = stage_id, t = seconds))
+                if not done and not running and pending:
+                    raise ValueError('Pipeline stages with missing dependencies: {p}'.format(p = list(pending)))
+                self.write_manifest(manifest)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return pd.DataFrame.from_dict(report, orient = 'index')
+
+
+if __name__ == '__main__':
+    #Run from the notebooks folder, like the notebook, so the ../data and ../visualizations paths resolve
+    parser = argparse.ArgumentParser(description = 'Run the etl, analysis and visualizations, skipping stages whose inputs are unchanged')
+    parser.add_argument('--output-dir', default = '../visualizations', help = 'folder to save the figures to')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes, 1 runs everything in this process')
+    parser.add_argument('--alternative', default = 'greater', help = 'alternative hypothesis for the paired t-tests')
+    parser.add_argument('--incremental', action = 'store_true', help = 'fetch the years in data-params.json the raw data is missing')
+    parser.add_argument('--force', action = 'store_true', help = 'rerun every stage')
+    parser.add_argument('--metrics', default = None, help = 'file to export the per-stage metrics to as JSON')
+    cli_args = parser.parse_args()
+    with open(package_directory + '/data-params.json') as fh:
+        data_cfg = json.load(fh)
+    pipeline = Pipeline(build_stages(data_cfg, alternative = cli_args.alternative, output_dir = cli_args.output_dir, incremental = cli_args.incremental))
+    report = pipeline.run(max_workers = cli_args.workers, force = cli_args.force)
+    print(report.to_string())
+    if cli_args.metrics is not None:
+        METRICS.to_json(cli_args.metrics)
+    print('{r} stages ran, {c} cached'.format(r = int((report['Status'] == 'ran').sum()), c = int((report['Status'] == 'cached').sum())))
@@ -0,0 +1,182 @@
+import numpy as np
+import os
+import pandas as pd
+import sys
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+from lazy_imports import LazyModule
+stats = LazyModule('scipy.stats')
+
+import logging
+import logging_config
+logging_config.configure_logging()
+Logger = logging.getLogger(__name__)
+
+
+def pooled_ratio_estimates(fp_df, *, min_pairs = 5):
+    """
+    Estimate the multiplier from each column to the next as the pooled ratio sum(next season) / sum(this season) over
+      the players with both seasons, with its delta method standard error, for every jump at once
+    Arguments:
+        fp_df: pd.DataFrame, normalized fantasy points, with rows as players, consecutive ages or career seasons as columns
+        keyword:
+            min_pairs: int, default 5, minimum number of players with both seasons for an estimate
+    Returns:
+        estimates: pd.DataFrame, indexed by the earlier column of each jump, with columns Multiplier, Std Error and n.
+          Jumps with fewer than min_pairs players are NaN
+    """
+    values = fp_df.to_numpy(dtype = float)
+    current, following = values[:, :-1], values[:, 1:]
+    paired = ~np.isnan(current) & ~np.isnan(following)
+    n = paired.sum(axis = 0)
+    current, following = np.where(paired, current, 0), np.where(paired, following, 0)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        ratio = following.sum(axis = 0) / current.sum(axis = 0)
+        #Var(R) ~ sum((y - R x) ** 2) / (n - 1) / (n * mean(x) ** 2)
+        residuals = np.where(paired, following - ratio * current, 0)
+        std_error = np.sqrt((residuals ** 2).sum(axis = 0) / (n - 1) / n) / (current.sum(axis = 0) / n)
+    enough = n >= min_pairs
+    return pd.DataFrame({'Multiplier' : np.where(enough, ratio, np.nan), 'Std Error' : np.where(enough, std_error, np.nan), 'n' : n}, index = fp_df.columns[:-1])
+
+
+class AgingCurveTable:
+    """
+    Lookup table of next season multipliers by position and age (or career season), so projecting any number of
+      players is one indexed gather
+    Arguments:
+        by: string, either 'age' or 'career_season'
+        positions: list, positions of the table rows
+        first_label: int, age or career season of the first column, columns run one season apart
+        multipliers: np.ndarray, positions x labels expected ratio of next season to this season's fantasy points
+        std_errors: np.ndarray, positions x labels standard error of each multiplier
+        n: np.ndarray, positions x labels number of players each multiplier was estimated from, 0 where it was
+          filled in from the nearest estimated season
+    """
+    def __init__(self, by, positions, first_label, multipliers, std_errors, n):
+        self.by = by
+        self.positions = list(positions)
+        self.first_label = int(first_label)
+        self.multipliers = np.asarray(multipliers, dtype = float)
+        self.std_errors = np.asarray(std_errors, dtype = float)
+        self.n = np.asarray(n, dtype = np.int64)
+
+    @classmethod
+    def fit(cls, age_dfs, *, by = 'age', min_years_dict = {}, fp_cutoff_flat_dict = {}, min_pairs = 5):
+        """
+        Fit the multipliers of every position from the normalized fantasy points of analysis.py
+        Arguments:
+            age_dfs: dictionary, position to fantasy points by age dataframe
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                min_years_dict: dictionary, minimum number of years played by position. Default is 0 for all positions
+                fp_cutoff_flat_dict: dictionary, minimum fantasy points to have hit in a year by position. Default is 0 for all positions
+                min_pairs: int, default 5, minimum number of players for an estimate, seasons with fewer take the
+                  multiplier of the nearest season with enough
+        Returns:
+            table: AgingCurveTable, fitted multipliers
+        """
+        estimates = {}
+        for position, age_df in age_dfs.items():
+            fp_df = analysis.cached_normalized_fantasy_points(age_df, by = by, min_years = min_years_dict.get(position, 0), fp_cutoff_flat = fp_cutoff_flat_dict.get(position, 0))
+            labels = fp_df.columns.astype(int)
+            #Jumps are between consecutive seasons, so fill in any season nobody has
+            fp_df = fp_df.set_axis(labels, axis = 1).reindex(columns = range(labels.min(), labels.max() + 1))
+            estimates[position] = pooled_ratio_estimates(fp_df, min_pairs = min_pairs)
+        first_label = min(e.index.min() for e in estimates.values())
+        last_label = max(e.index.max() for e in estimates.values())
+        labels = range(first_label, last_label + 1)
+        shape = (len(estimates), len(labels))
+        multipliers, std_errors, n = np.full(shape, np.nan), np.full(shape, np.nan), np.zeros(shape, dtype = np.int64)
+        for i, (position, estimate) in enumerate(estimates.items()):
+            estimate = estimate.reindex(labels)
+            if estimate['Multiplier'].isna().all():
+                raise ValueError('No season of {pos} has {m} players to estimate from'.format(pos = position, m = min_pairs))
+            n[i] = np.where(estimate['Multiplier'].notna(), estimate['n'].fillna(0), 0)
+            #Seasons past either end of the data take the nearest estimate, interior gaps the earlier one
+            multipliers[i] = estimate['Multiplier'].ffill().bfill()
+            std_errors[i] = estimate['Std Error'].ffill().bfill()
+            Logger.debug('Fitted {pos} multipliers by {by} on {n} jumps'.format(pos = position, by = by, n = int((n[i] > 0).sum())))
+        return cls(by, list(estimates), first_label, multipliers, std_errors, n)
+
+    def to_frame(self):
+        """
+        Get the table as a dataframe
+        Returns:
+            table: pd.DataFrame, with a row per position and label, and columns Multiplier, Std Error and n
+        """
+        labels = np.arange(self.first_label, self.first_label + self.multipliers.shape[1])
+        index = pd.MultiIndex.from_product([self.positions, labels], names = ['Position', 'Age' if self.by == 'age' else 'Career Season'])
+        return pd.DataFrame({'Multiplier' : self.multipliers.ravel(), 'Std Error' : self.std_errors.ravel(), 'n' : self.n.ravel()}, index = index)
+
+    def save(self, path):
+        """
+        Write the table to disk
+        Arguments:
+            path: string, path of the .npz file
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        with open(path, 'wb') as fh:
+            np.savez(fh, by = self.by, positions = np.asarray(self.positions, dtype = str), first_label = self.first_label, multipliers = self.multipliers, std_errors = self.std_errors, n = self.n)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a table written by save
+        Arguments:
+            path: string, path of the .npz file
+        Returns:
+            table: AgingCurveTable, the table
+        """
+        with np.load(path) as saved:
+            return cls(str(saved['by']), list(saved['positions']), int(saved['first_label']), saved['multipliers'], saved['std_errors'], saved['n'])
+
+    def project(self, positions, labels, points, *, confidence = .9):
+        """
+        Project next season's fantasy points for any number of players at once. Ages or career seasons outside the
+          table use its first or last column
+        Arguments:
+            positions: array-like, position of each player
+            labels: array-like, current age or career season of each player
+            points: array-like, current fantasy points of each player
+            keyword:
+                confidence: float, default .9, coverage of the interval around the multiplier
+        Returns:
+            projections: pd.DataFrame, with columns Projected Fantasy Points, Low and High
+        """
+        rows = pd.Index(self.positions).get_indexer(np.asarray(positions))
+        if (rows < 0).any():
+            raise KeyError('No multipliers for positions {p}'.format(p = sorted(set(np.asarray(positions)[rows < 0]))))
+        cols = np.clip(np.asarray(labels, dtype = np.int64) - self.first_label, 0, self.multipliers.shape[1] - 1)
+        points = np.asarray(points, dtype = float)
+        multipliers = self.multipliers[rows, cols]
+        half_width = stats.norm.ppf(.5 + confidence / 2) * self.std_errors[rows, cols]
+        return pd.DataFrame({'Projected Fantasy Points' : points * multipliers, 'Low' : points * (multipliers - half_width), 'High' : points * (multipliers + half_width)})
+
+    def project_roster(self, roster, *, confidence = .9):
+        """
+        Project next season's fantasy points for a roster
+        Arguments:
+            roster: pd.DataFrame, with Position, Age (or Career Season) and Fantasy Points columns
+            keyword:
+                confidence: float, default .9, coverage of the interval around the multiplier
+        Returns:
+            roster: pd.DataFrame, the roster with Projected Fantasy Points, Low and High columns added
+        """
+        label_col = 'Age' if self.by == 'age' else 'Career Season'
+        projections = self.project(roster['Position'], roster[label_col], roster['Fantasy Points'], confidence = confidence)
+        projections.index = roster.index
+        return pd.concat([roster, projections], axis = 1)
+
+
+def table_path(by):
+    """
+    Get the path the aging curve table is saved to
+    Arguments:
+        by: string, either 'age' or 'career_season'
+    Returns:
+        path: string, path of the .npz file
+    """
+    return os.path.abspath('../data/processed/aging_curve_by_{by}.npz'.format(by = by))
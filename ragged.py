@@ -0,0 +1,256 @@
+import numpy as np
+import os
+import pandas as pd
+import sys
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+
+
+class RaggedAgeMatrix:
+    """
+    Compact fantasy points by age table, storing each player's career span (first to last season played) back to
+      back in one float32 buffer instead of a mostly empty player x age matrix
+    Arguments:
+        players: np.ndarray, player names
+        start_ages: np.ndarray, age of each player's first season
+        offsets: np.ndarray, length len(players) + 1, player i's seasons are values[offsets[i]:offsets[i + 1]]
+        values: np.ndarray, float32 fantasy points of every player's span, NaN for seasons missed inside a career
+        ages: np.ndarray, consecutive ages of the full table, used to convert back to a dataframe
+        best_seasons: np.ndarray, default the best season in values, each player's best season at full precision so
+          the fp_cutoff_flat filter is not moved by float32 rounding
+    """
+    def __init__(self, players, start_ages, offsets, values, ages, best_seasons = None):
+        self.players = np.asarray(players)
+        self.start_ages = np.asarray(start_ages, dtype = np.int64)
+        self.offsets = np.asarray(offsets, dtype = np.int64)
+        self.values = np.asarray(values, dtype = np.float32)
+        self.ages = np.asarray(ages, dtype = np.int64)
+        if best_seasons is None:
+            #Spans start and end on a season played, so only empty spans have no best season
+            best_seasons = np.full(len(self.players), np.nan)
+            has_seasons = self.lengths > 0
+            if has_seasons.any():
+                best_seasons[has_seasons] = np.fmax.reduceat(self.values, self.offsets[:-1][has_seasons])
+        self.best_seasons = np.asarray(best_seasons, dtype = float)
+
+    def __len__(self):
+        return len(self.players)
+
+    @property
+    def lengths(self):
+        """
+        Number of seasons in each player's span
+        """
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the arrays of the table
+        """
+        return self.players.nbytes + self.start_ages.nbytes + self.offsets.nbytes + self.values.nbytes + self.ages.nbytes + self.best_seasons.nbytes
+
+    @classmethod
+    def from_frame(cls, age_df):
+        """
+        Build a ragged table from a fantasy points by age dataframe
+        Arguments:
+            age_df: pd.DataFrame, fantasy points by age, with rows as players, consecutive ages as columns
+        Returns:
+            ragged: RaggedAgeMatrix, the same table in ragged form
+        """
+        ages = np.asarray(age_df.columns.astype(int))
+        if len(ages) > 1 and not (np.diff(ages) == 1).all():
+            raise ValueError('RaggedAgeMatrix needs consecutive ages as columns, got {a}'.format(a = list(ages)))
+        matrix = age_df.to_numpy(dtype = float)
+        present = ~np.isnan(matrix)
+        has_seasons = present.any(axis = 1)
+        #Each player's span runs from their first to their last season, players without seasons get an empty span
+        first = present.argmax(axis = 1)
+        last = matrix.shape[1] - 1 - present[:, ::-1].argmax(axis = 1)
+        lengths = np.where(has_seasons, last - first + 1, 0)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        rows = np.repeat(np.arange(len(matrix)), lengths)
+        cols = np.repeat(first, lengths) + np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        return cls(np.asarray(age_df.index), ages[0] + first if len(ages) else first, offsets, matrix[rows, cols], ages, np.fmax.reduce(matrix, axis = 1, initial = np.nan) if matrix.shape[1] else np.full(len(matrix), np.nan))
+
+    def element_positions(self):
+        """
+        Get the owning player and the position within that player's span of every element of the values buffer
+        Returns:
+            rows: np.ndarray, player index of each element
+            positions: np.ndarray, 0 for the first season of the span, 1 for the next, and so on
+        """
+        lengths = self.lengths
+        rows = np.repeat(np.arange(len(self)), lengths)
+        return rows, np.arange(self.offsets[-1]) - np.repeat(self.offsets[:-1], lengths)
+
+    def column_keys(self, by):
+        """
+        Get the column each element of the values buffer belongs to
+        Arguments:
+            by: string, either 'age' (index into ages) or 'career_season' (0 for the rookie season)
+        Returns:
+            keys: np.ndarray, column index of each element
+        """
+        rows, positions = self.element_positions()
+        if by == 'age':
+            return self.start_ages[rows] - self.ages[0] + positions
+        elif by == 'career_season':
+            return positions
+        raise ValueError("by must be 'age' or 'career_season', got {b}".format(b = by))
+
+    def column_labels(self, by):
+        """
+        Get the column labels of the dataframe view
+        Arguments:
+            by: string, either 'age' or 'career_season'
+        Returns:
+            labels: np.ndarray, every age of the table, or every career season someone has an entry for
+        """
+        if by == 'age':
+            return self.ages
+        keys = self.column_keys(by)[~np.isnan(self.values)]
+        return np.unique(keys) + 1
+
+    def to_frame(self, *, by = 'age'):
+        """
+        Convert back to a dataframe
+        Arguments:
+            keyword:
+                by: string, default 'age', either 'age' for the fantasy points by age table or 'career_season' for
+                  fantasy points by season in career, sorted by player name as the pivot in analysis.py does
+        Returns:
+            df: pd.DataFrame, fantasy points with rows as players, columns as ages or career seasons
+        """
+        rows, _ = self.element_positions()
+        keys = self.column_keys(by)
+        if by == 'age':
+            matrix = np.full((len(self), len(self.ages)), np.nan, dtype = np.float32)
+            matrix[rows, keys] = self.values
+            return pd.DataFrame(matrix, index = self.players, columns = self.ages)
+        labels = self.column_labels(by)
+        keep = self.lengths > 0
+        order = np.argsort(self.players[keep].astype(str), kind = 'stable')
+        #Map each kept player to their row in name order
+        row_of = np.full(len(self), -1)
+        row_of[np.flatnonzero(keep)[order]] = np.arange(keep.sum())
+        matrix = np.full((keep.sum(), len(labels)), np.nan, dtype = np.float32)
+        valid = ~np.isnan(self.values)
+        matrix[row_of[rows[valid]], np.searchsorted(labels, keys[valid] + 1)] = self.values[valid]
+        return pd.DataFrame(matrix, index = pd.Index(self.players[keep][order], name = 'Player Name'), columns = pd.Index(labels, name = 'Career Year'))
+
+    def select(self, keep):
+        """
+        Get the ragged table of a subset of players
+        Arguments:
+            keep: np.ndarray, boolean mask of the players to keep
+        Returns:
+            ragged: RaggedAgeMatrix, the kept players
+        """
+        lengths = self.lengths[keep]
+        return RaggedAgeMatrix(self.players[keep], self.start_ages[keep], np.concatenate([[0], np.cumsum(lengths)]), self.values[np.repeat(keep, self.lengths)], self.ages, self.best_seasons[keep])
+
+    def normalized(self, *, min_years = 0, fp_cutoff_flat = 0):
+        """
+        Filter and normalize the fantasy points, as analysis.normalized_fantasy_points_by_age does
+        Arguments:
+            keyword:
+                min_years: int, minimum number of years played
+                fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+        Returns:
+            ragged: RaggedAgeMatrix, fantasy points of the remaining players scaled to their best season
+        """
+        rows, _ = self.element_positions()
+        seasons_played = np.bincount(rows[~np.isnan(self.values)], minlength = len(self))
+        keep = (seasons_played >= min_years) & (self.best_seasons > fp_cutoff_flat)
+        ragged = self.select(keep)
+        ragged.values = (ragged.values / np.repeat(ragged.best_seasons, ragged.lengths)).astype(np.float32)
+        ragged.best_seasons = np.ones(len(ragged))
+        return ragged
+
+    def medians(self, *, by = 'age'):
+        """
+        Get the median fantasy points of every column
+        Arguments:
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+        Returns:
+            medians: pd.Series, median fantasy points by age or by season in career
+        """
+        valid = ~np.isnan(self.values)
+        keys = self.column_keys(by)[valid]
+        values = self.values[valid].astype(float)
+        #Sort by column then value so each column's entries are a contiguous sorted run
+        order = np.lexsort((values, keys))
+        keys, values = keys[order], values[order]
+        present, starts, counts = np.unique(keys, return_index = True, return_counts = True)
+        labels = self.column_labels(by)
+        medians = pd.Series(np.nan, index = labels)
+        column_of = present if by == 'age' else np.searchsorted(labels, present + 1)
+        medians.iloc[column_of] = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+        return medians
+
+    def median_differences(self, *, by = 'age'):
+        """
+        Get the change in median between consecutive columns
+        Arguments:
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+        Returns:
+            med_diffs: pd.Series, difference in median between consecutive ages or career seasons (e.g. 23-24)
+        """
+        medians = self.medians(by = by)
+        labels = [str(c) for c in medians.index]
+        return pd.Series(medians.to_numpy()[1:] - medians.to_numpy()[:-1], index = [labels[i] + '-' + labels[i + 1] for i in range(len(labels) - 1)])
+
+    def paired_t_test(self, *, by = 'age', alternative = 'greater'):
+        """
+        Get paired t-test p-values between consecutive seasons straight from the spans, pairing each season with the
+          next one of the same player
+        Arguments:
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+        Returns:
+            p_values: pd.Series, paired t-test p-values by jump (e.g. 23-24), for jumps with at least two players
+        """
+        rows, _ = self.element_positions()
+        keys = self.column_keys(by)
+        values = self.values.astype(float)
+        #Pairs are an element and the next one in the buffer, when both belong to the same player and were played
+        pairs = np.flatnonzero((rows[:-1] == rows[1:]) & ~np.isnan(values[:-1]) & ~np.isnan(values[1:]))
+        diffs = values[pairs] - values[pairs + 1]
+        pair_keys = keys[pairs]
+        n_columns = (len(self.ages) if by == 'age' else int(self.lengths.max(initial = 0))) + 1
+        n = np.bincount(pair_keys, minlength = n_columns)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            mean = np.bincount(pair_keys, weights = diffs, minlength = n_columns) / n
+            std = np.sqrt(np.bincount(pair_keys, weights = (diffs - mean[pair_keys]) ** 2, minlength = n_columns) / (n - 1))
+            t = mean / (std / np.sqrt(n))
+        p = analysis.t_test_p_values(t, n - 1, alternative = alternative)
+        tested = np.flatnonzero(n > 1)
+        if by == 'age':
+            names = [str(self.ages[k]) + '-' + str(self.ages[k + 1]) for k in tested]
+        else:
+            names = [str(k + 1) + '-' + str(k + 2) for k in tested]
+        return pd.Series(p[tested], index = names, dtype = float)
+
+    def median_and_p_vals(self, *, by = 'age', alternative = 'greater', min_years = 0, fp_cutoff_flat = 0):
+        """
+        Get a table of changes in median and paired t-test p-values by jump, as analysis.median_and_p_vals_by_age
+          and analysis.median_and_p_vals_by_career_season do
+        Arguments:
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                alternative: string, default 'greater', alternative hypothesis for paired t-test
+                min_years: int, minimum number of years played
+                fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+        Returns:
+            med_diffs: pd.DataFrame, difference in median and p-value by jump
+        """
+        normalized = self.normalized(min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+        medians_and_p_vals = pd.concat([normalized.median_differences(by = by), normalized.paired_t_test(by = by, alternative = alternative)], axis = 1)
+        medians_and_p_vals.columns = ['Change in Median', 'P-value']
+        return medians_and_p_vals
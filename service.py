@@ -0,0 +1,250 @@
+import argparse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import sys
+import threading
+from urllib.parse import parse_qs, urlparse
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+import etl
+
+import logging
+import logging_config
+logging_config.configure_logging()
+Logger = logging.getLogger(__name__)
+
+METRICS = ('p_values', 'median_changes', 'medians', 'table')
+RESPONSE_CACHE_SIZE = 1024
+
+
+class QueryError(ValueError):
+    """
+    Raised for a query the service cannot answer, sent back to the client as a 400
+    """
+
+
+def to_json_value(value):
+    """
+    Get a number as a JSON value, with NaN as null
+    Arguments:
+        value: float, number to convert
+    Returns:
+        value: float, the number, None if it is NaN
+    """
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class QueryService:
+    """
+    Answers queries on the fantasy points by age of every position from matrices held in memory. Each distinct query
+      is computed once and its encoded response cached, so repeated queries are a dictionary lookup, and concurrent
+      clients asking for the same uncached query wait on the one computing it instead of recomputing
+    Arguments:
+        age_dfs: dictionary, position to fantasy points by age dataframe
+        keyword:
+            min_years_dict: dictionary, default minimum number of years played by position
+            fp_cutoff_flat_dict: dictionary, default minimum fantasy points to have hit in a year by position
+            alternative: string, default 'greater', default alternative hypothesis for the paired t-tests
+            cache_size: int, default RESPONSE_CACHE_SIZE, number of responses to keep
+    """
+    def __init__(self, age_dfs, *, min_years_dict = {}, fp_cutoff_flat_dict = {}, alternative = 'greater', cache_size = RESPONSE_CACHE_SIZE):
+        self.age_dfs = age_dfs
+        self.min_years_dict = min_years_dict
+        self.fp_cutoff_flat_dict = fp_cutoff_flat_dict
+        self.alternative = alternative
+        self.cache_size = cache_size
+        self.responses = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def params(self, position, *, min_years = None, fp_cutoff_flat = None, alternative = None):
+        """
+        Fill in the parameters a query leaves out with the position's defaults
+        Arguments:
+            position: string, two letter position abbreviation
+            keyword:
+                min_years: int, default None, minimum number of years played, the position's default if None
+                fp_cutoff_flat: float, default None, minimum fantasy points to have hit in a year, the position's default if None
+                alternative: string, default None, alternative hypothesis for the paired t-tests, the service's default if None
+        Returns:
+            params: dictionary, min_years, fp_cutoff_flat and alternative
+        """
+        return {'min_years' : int(self.min_years_dict.get(position, 0) if min_years is None else min_years),
+                'fp_cutoff_flat' : float(self.fp_cutoff_flat_dict.get(position, 0) if fp_cutoff_flat is None else fp_cutoff_flat),
+                'alternative' : alternative or self.alternative}
+
+    def compute(self, position, by, metric, params):
+        """
+        Compute the answer to a query
+        Arguments:
+            position: string, two letter position abbreviation
+            by: string, either 'age' or 'career_season'
+            metric: string, one of METRICS
+            params: dictionary, min_years, fp_cutoff_flat and alternative
+        Returns:
+            values: dictionary, label (age, career season or jump) to value, or to a dictionary of values for 'table'
+        """
+        age_df = self.age_dfs[position]
+        filters = {'min_years' : params['min_years'], 'fp_cutoff_flat' : params['fp_cutoff_flat']}
+        if metric == 'medians':
+            medians = analysis.median_fantasy_points_by_age(age_df, **filters) if by == 'age' else analysis.median_fantasy_points_by_career_season(age_df, **filters)
+            return {str(label) : to_json_value(value) for label, value in medians.items()}
+        if by == 'age':
+            table = analysis.median_and_p_vals_by_age(age_df, alternative = params['alternative'], **filters)
+        else:
+            table = analysis.median_and_p_vals_by_career_season(age_df, alternative = params['alternative'], **filters)
+        if metric == 'p_values':
+            return {str(label) : to_json_value(value) for label, value in table['P-value'].items()}
+        if metric == 'median_changes':
+            return {str(label) : to_json_value(value) for label, value in table['Change in Median'].items()}
+        return {str(label) : {col : to_json_value(value) for col, value in row.items()} for label, row in table.iterrows()}
+
+    def query(self, position, *, by = 'age', metric = 'table', min_years = None, fp_cutoff_flat = None, alternative = None):
+        """
+        Answer a query, from the response cache when it was asked before
+        Arguments:
+            position: string, two letter position abbreviation
+            keyword:
+                by: string, default 'age', either 'age' or 'career_season'
+                metric: string, default 'table', one of METRICS: 'p_values' and 'median_changes' by jump, 'medians' by
+                  age or career season, 'table' for both by jump
+                min_years: int, default None, minimum number of years played, the position's default if None
+                fp_cutoff_flat: float, default None, minimum fantasy points to have hit in a year, the position's default if None
+                alternative: string, default None, alternative hypothesis for the paired t-tests, the service's default if None
+        Returns:
+            response: bytes, the answer encoded as JSON
+        """
+        if position not in self.age_dfs:
+            raise QueryError('Unknown position {p}, expected one of {ps}'.format(p = position, ps = sorted(self.age_dfs)))
+        if by not in ('age', 'career_season'):
+            raise QueryError("by must be 'age' or 'career_season', not {b}".format(b = by))
+        if metric not in METRICS:
+            raise QueryError('Unknown metric {m}, expected one of {ms}'.format(m = metric, ms = list(METRICS)))
+        try:
+            params = self.params(position, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat, alternative = alternative)
+        except ValueError as e:
+            raise QueryError(str(e))
+        if not math.isfinite(params['fp_cutoff_flat']):
+            raise QueryError('fp_cutoff_flat must be a finite number, not {f}'.format(f = params['fp_cutoff_flat']))
+        if params['alternative'] not in ('two-sided', 'less', 'greater'):
+            raise QueryError("alternative must be 'two-sided', 'less' or 'greater', not {a}".format(a = params['alternative']))
+        key = (position, by, metric, params['min_years'], params['fp_cutoff_flat'], params['alternative'])
+        with self.lock:
+            if key in self.responses:
+                self.responses.move_to_end(key)
+                return self.responses[key]
+            event = self.in_flight.get(key)
+            owner = event is None
+            if owner:
+                event = self.in_flight[key] = threading.Event()
+        if not owner:
+            event.wait()
+            with self.lock:
+                if key in self.responses:
+                    return self.responses[key]
+            #The computing thread failed, so this one tries for itself
+            return self.query(position, by = by, metric = metric, **params)
+        try:
+            values = self.compute(position, by, metric, params)
+            response = json.dumps({'position' : position, 'by' : by, 'metric' : metric, 'params' : params, 'values' : values}).encode()
+            with self.lock:
+                self.responses[key] = response
+                while len(self.responses) > self.cache_size:
+                    self.responses.popitem(last = False)
+            Logger.debug('Computed query {k}'.format(k = key))
+            return response
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            event.set()
+
+    def warm(self):
+        """
+        Precompute every metric of every position by age and career season with the default parameters
+        Returns:
+            None
+        """
+        for position in self.age_dfs:
+            for by in ('age', 'career_season'):
+                for metric in METRICS:
+                    self.query(position, by = by, metric = metric)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /positions and GET /query?position=QB&by=age&metric=p_values&min_years=4&fp_cutoff_flat=95.19&alternative=greater
+      from the server's QueryService
+    """
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == '/positions':
+            self.send_json(200, json.dumps({'positions' : sorted(service.age_dfs), 'metrics' : list(METRICS)}).encode())
+            return
+        if url.path != '/query':
+            self.send_json(404, json.dumps({'error' : 'Unknown path {p}'.format(p = url.path)}).encode())
+            return
+        args = {k : v[-1] for k, v in parse_qs(url.query).items()}
+        unknown = set(args) - {'position', 'by', 'metric', 'min_years', 'fp_cutoff_flat', 'alternative'}
+        try:
+            if unknown or 'position' not in args:
+                raise QueryError('Queries take a position and optionally by, metric, min_years, fp_cutoff_flat and alternative')
+            self.send_json(200, service.query(args.pop('position'), **args))
+        except QueryError as e:
+            self.send_json(400, json.dumps({'error' : str(e)}).encode())
+        except Exception as e:
+            #Answer rather than drop the connection when the analysis fails on the data
+            Logger.exception('Failed to answer {p}'.format(p = self.path))
+            self.send_json(500, json.dumps({'error' : 'Internal error: {e!r}'.format(e = e)}).encode())
+
+    def log_message(self, format, *args):
+        Logger.debug('{c} {m}'.format(c = self.address_string(), m = format % args))
+
+
+def make_server(service, *, host = '127.0.0.1', port = 8000):
+    """
+    Make an HTTP server that answers queries from a QueryService, with a thread per client
+    Arguments:
+        service: QueryService, service answering the queries
+        keyword:
+            host: string, default '127.0.0.1', address to listen on
+            port: int, default 8000, port to listen on, 0 for any free port
+    Returns:
+        server: ThreadingHTTPServer, the server, call serve_forever to start it
+    """
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+if __name__ == '__main__':
+    #Run from the notebooks folder, like the notebook, so the ../data paths resolve
+    parser = argparse.ArgumentParser(description = 'Serve fantasy points by age queries over HTTP/JSON from matrices held in memory')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'address to listen on')
+    parser.add_argument('--port', type = int, default = 8000, help = 'port to listen on')
+    parser.add_argument('--alternative', default = 'greater', help = 'default alternative hypothesis for the paired t-tests')
+    cli_args = parser.parse_args()
+    with open(package_directory + '/data-params.json') as fh:
+        data_cfg = json.load(fh)
+    service = QueryService({position : etl.get_fantasy_points_by_age(position) for position in data_cfg['positions']},
+                           min_years_dict = data_cfg['min_years'], fp_cutoff_flat_dict = data_cfg['fp_cutoff_flat'], alternative = cli_args.alternative)
+    service.warm()
+    server = make_server(service, host = cli_args.host, port = cli_args.port)
+    print('Serving on http://{h}:{p}'.format(h = cli_args.host, p = server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(package_directory)
+#The modules read and write ../data relative to the notebooks folder, as the notebook runs them
+os.chdir(os.path.join(package_directory, 'notebooks'))
+#Log to a scratch file rather than ../logger.log in the repo, here and in the subprocesses the tests start
+os.environ['FANTASY_LOG_FILE'] = os.path.join(tempfile.mkdtemp(prefix = 'fantasy-tests-'), 'logger.log')
@@ -0,0 +1,13 @@
+import pandas as pd
+import pytest
+import analysis
+import benchmark
+
+
+@pytest.mark.parametrize('lags', [0, -1, [1, 0], 1.5, True])
+def test_lags_must_be_positive_integers(lags):
+    fp_df = pd.DataFrame({22 : [1.0, 2.0, 3.0], 23 : [2.0, 1.0, 4.0], 24 : [3.0, 3.0, 1.0]})
+    with pytest.raises(ValueError, match = 'lags must be positive integers'):
+        analysis.paired_t_test_table(fp_df, lags = lags)
+    with pytest.raises(ValueError, match = 'lags must be positive integers'):
+        analysis.paired_t_test_by_cohort(benchmark.synthetic_league(100, seed = 1), lags = lags)
@@ -0,0 +1,24 @@
+import benchmark
+
+
+def report(*results):
+    return {'results' : [{'module' : 'analysis', 'function' : function, 'players' : 500, 'seconds' : seconds, 'peak_bytes' : None, 'status' : status}
+                         for function, seconds, status in results]}
+
+
+def test_compare_suites_flags_slowdowns_and_crashes():
+    baseline = report(('steady', 1.0, 'ok'), ('slower', 1.0, 'ok'), ('crashing', 1.0, 'ok'), ('dropped', 1.0, 'ok'))
+    current = report(('steady', 1.1, 'ok'), ('slower', 2.0, 'ok'), ('crashing', None, "error: Exception('boom')"), ('added', 1.0, 'ok'))
+    comparison = benchmark.compare_suites(baseline, current).droplevel(['module', 'players'])
+    assert comparison['change'].to_dict() == {'added' : 'only in current', 'crashing' : 'broke', 'dropped' : 'only in baseline', 'slower' : 'slower', 'steady' : ''}
+    assert sorted(comparison.index[comparison['regression']]) == ['crashing', 'slower']
+
+
+def test_compare_suites_does_not_flag_a_case_failing_in_both():
+    baseline = report(('failing', None, 'skipped'))
+    current = report(('failing', None, "error: Exception('boom')"))
+    assert not benchmark.compare_suites(baseline, current)['regression'].any()
+
+
+def test_every_function_has_a_suite_case():
+    assert benchmark.uncovered_functions() == []
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analysis
+import benchmark
+
+
+def per_position_p_values(age_dfs, *, by, alternative, lags = 1):
+    """
+    The per-position concat paired_t_test_by_age_and_position used before the batched pass, as the baseline
+    """
+    test = analysis.paired_t_test_by_age if by == 'age' else analysis.paired_t_test_by_career_season
+    p_values = pd.concat([test(age_df, alternative = alternative, lags = lags).rename(cohort) for cohort, age_df in age_dfs.items()], axis = 1)
+    return p_values.T.dropna(axis = 1, how = 'all')
+
+
+@pytest.fixture
+def league():
+    return benchmark.synthetic_league(2000, seed = 3)
+
+
+@pytest.mark.parametrize('by', ['age', 'career_season'])
+@pytest.mark.parametrize('lags', [1, [1, 2]])
+def test_matches_per_position_baseline(league, by, lags):
+    expected = per_position_p_values(league, by = by, alternative = 'two-sided', lags = lags)
+    pd.testing.assert_frame_equal(analysis.paired_t_test_by_cohort(league, by = by, alternative = 'two-sided', lags = lags), expected)
+
+
+def test_jumps_span_a_cohort_gap(league):
+    #Nobody in this cohort played at 25, so its jump is 24-26 while the other cohorts have 24-25 and 25-26
+    league['QB'] = league['QB'].drop(columns = 25)
+    expected = per_position_p_values(league, by = 'age', alternative = 'greater')
+    result = analysis.paired_t_test_by_cohort(league, by = 'age', alternative = 'greater')
+    assert not np.isnan(result.loc['QB', '24-26'])
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_keeps_nan_p_values():
+    #Every player scores the same at 22 and 23, so that jump has no variance and a NaN p-value
+    age_df = pd.DataFrame({21 : [10.0, 20.0, 30.0], 22 : [20.0, 40.0, 60.0], 23 : [20.0, 40.0, 60.0]}, index = ['a', 'b', 'c'])
+    other = pd.DataFrame({21 : [10.0, 30.0, 20.0], 22 : [40.0, 20.0, 30.0], 23 : [30.0, 10.0, 20.0]}, index = ['d', 'e', 'f'])
+    age_dfs = {'first' : age_df, 'second' : other}
+    expected = per_position_p_values(age_dfs, by = 'age', alternative = 'two-sided')
+    assert np.isnan(expected.loc['first', '22-23'])
+    pd.testing.assert_frame_equal(analysis.paired_t_test_by_cohort(age_dfs, by = 'age', alternative = 'two-sided'), expected)
+
+
+def test_and_position_wrappers_match_baseline(league):
+    filters = {'min_years_dict' : {p : 4 for p in league}, 'fp_cutoff_flat_dict' : {p : 50 for p in league}}
+    for by, wrapper in [('age', analysis.paired_t_test_by_age_and_position), ('career_season', analysis.paired_t_test_by_career_season_and_position)]:
+        test = analysis.paired_t_test_by_age if by == 'age' else analysis.paired_t_test_by_career_season
+        expected = pd.concat([test(df, alternative = 'greater', min_years = 4, fp_cutoff_flat = 50).rename(p) for p, df in league.items()], axis = 1).T.dropna(axis = 1, how = 'all')
+        pd.testing.assert_frame_equal(wrapper(*league.values(), **filters), expected)
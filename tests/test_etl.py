@@ -0,0 +1,126 @@
+import json
+import os
+import types
+import pandas as pd
+import pytest
+import etl
+import pfr_scraping_stub
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    Run the ETL in an empty data folder with the stub's call counter reset, returning a function that writes the
+      data-params.json it reads
+    """
+    package = tmp_path / 'package'
+    package.mkdir()
+    (tmp_path / 'notebooks').mkdir()
+    (tmp_path / 'data' / 'raw').mkdir(parents = True)
+    monkeypatch.chdir(tmp_path / 'notebooks')
+    monkeypatch.setattr(etl, 'package_directory', str(package))
+    monkeypatch.setitem(pfr_scraping_stub._calls, 'n', 0)
+
+    def write_params(years, *, retries = 3):
+        with open(package / 'data-params.json', 'w') as fh:
+            json.dump({'years' : years, 'scraping' : {'seconds_per_request' : 1e-6, 'max_workers' : 4, 'retries' : retries, 'backoff' : 0}}, fh)
+    return write_params
+
+
+def recording_scraper(fetched):
+    """
+    The stub, recording the slug of every career stats request
+    """
+    def get_player_career_stats_from_slug(slug):
+        fetched.append(slug)
+        return pfr_scraping_stub.get_player_career_stats_from_slug(slug)
+    return types.SimpleNamespace(get_all_players_slugs = pfr_scraping_stub.get_all_players_slugs, get_player_career_stats_from_slug = get_player_career_stats_from_slug)
+
+
+def slugs(position, first, last):
+    return {'{pos} Player{i:05d}'.format(pos = position, i = i) : '{pos}/P{i:05d}'.format(pos = position, i = i) for i in range(first, last)}
+
+
+def test_retries_recover_from_failures(monkeypatch):
+    monkeypatch.setitem(pfr_scraping_stub._calls, 'n', 0)
+    expected = etl.get_player_career_stats(slugs('WR', 0, 20), scraper = pfr_scraping_stub, limiter = etl.TokenBucket(None), max_workers = 1, backoff = 0)
+    monkeypatch.setattr(pfr_scraping_stub, 'FAIL_EVERY', 3)
+    monkeypatch.setitem(pfr_scraping_stub._calls, 'n', 0)
+    career_stats = etl.get_player_career_stats(slugs('WR', 0, 20), scraper = pfr_scraping_stub, limiter = etl.TokenBucket(None), max_workers = 1, backoff = 0)
+    #Every third call fails and is retried, so 9 of the 29 calls are retries
+    assert pfr_scraping_stub._calls['n'] == 29
+    assert list(career_stats) == list(expected)
+    for player in expected:
+        pd.testing.assert_frame_equal(career_stats[player], expected[player])
+
+
+def test_failed_players_are_left_out(monkeypatch):
+    monkeypatch.setitem(pfr_scraping_stub._calls, 'n', 0)
+    monkeypatch.setattr(pfr_scraping_stub, 'FAIL_EVERY', 2)
+    career_stats = etl.get_player_career_stats(slugs('WR', 0, 40), scraper = pfr_scraping_stub, limiter = etl.TokenBucket(None), max_workers = 4, retries = 0, backoff = 0)
+    #Every other call fails, whichever thread makes it
+    assert pfr_scraping_stub._calls['n'] == 40
+    assert len(career_stats) == 20
+    assert list(career_stats) == [player for player in slugs('WR', 0, 40) if player in career_stats]
+
+
+def test_failed_scrape_keeps_progress_and_is_retried(workspace, monkeypatch):
+    workspace([2022], retries = 0)
+    monkeypatch.setattr(pfr_scraping_stub, 'FAIL_EVERY', 2)
+    partial = etl.get_fantasy_points_by_age('WR', scraper = pfr_scraping_stub)
+    assert len(partial) == 25
+    assert etl.read_manifest('WR')['years'] == []
+    monkeypatch.setattr(pfr_scraping_stub, 'FAIL_EVERY', 0)
+    fetched = []
+    age_df = etl.get_fantasy_points_by_age('WR', scraper = recording_scraper(fetched), incremental = True)
+    assert len(age_df) == 50 and len(fetched) == 50
+    assert etl.read_manifest('WR')['years'] == [2022]
+
+
+@pytest.mark.parametrize('position', ['QB', 'RB', 'WR', 'TE'])
+def test_ppr_components_reproduce_stored_points(position):
+    with open(os.path.join(etl.package_directory, 'data-params.json')) as fh:
+        ppr = json.load(fh)['scoring']['ppr']
+    career_stats = {player : pfr_scraping_stub.get_player_career_stats_from_slug(slug) for player, slug in slugs(position, 0, 40).items()}
+    expected = etl.fantasy_points_by_age_from_stats(career_stats)
+    rescored = etl.fantasy_points_by_age_from_components(etl.component_stats_from_stats(career_stats), ppr)
+    #The components are stored as float32
+    pd.testing.assert_frame_equal(rescored, expected, check_exact = False, rtol = 1e-5, atol = 1e-3)
+
+
+def test_scoring_reads_the_stored_components(workspace):
+    workspace([2022])
+    age_df = etl.get_fantasy_points_by_age('TE', scraper = pfr_scraping_stub)
+    with open(os.path.join(os.path.dirname(etl.__file__), 'data-params.json')) as fh:
+        ppr = json.load(fh)['scoring']['ppr']
+    pd.testing.assert_frame_equal(etl.get_fantasy_points_by_age_for_scoring('TE', ppr), age_df, check_exact = False, rtol = 1e-5, atol = 1e-3)
+
+
+def test_incremental_update_only_fetches_new_and_updated_players(workspace, tmp_path):
+    workspace([2022])
+    etl.get_fantasy_points_by_age('RB', scraper = pfr_scraping_stub)
+    workspace([2023, 2022, 2021])
+    fetched = []
+    age_df = etl.get_fantasy_points_by_age('RB', scraper = recording_scraper(fetched), incremental = True)
+    #Everyone active in 2023 may have a newer season, while 2021 only adds players not scraped for 2022
+    expected = set(slugs('RB', 230, 280).values()) | set(slugs('RB', 210, 220).values())
+    assert sorted(fetched) == sorted(expected)
+    manifest = etl.read_manifest('RB')
+    assert manifest['years'] == [2023, 2022, 2021]
+    assert set(manifest['players']) == set(slugs('RB', 210, 280))
+    for path in (tmp_path / 'data' / 'raw').iterdir():
+        path.unlink()
+    rebuilt = etl.get_fantasy_points_by_age('RB', scraper = pfr_scraping_stub)
+    #Only a fresh scrape names the columns 'Age', the .csv does not keep it
+    pd.testing.assert_frame_equal(age_df, rebuilt, check_names = False)
+    pd.testing.assert_frame_equal(etl.read_raw_data('RB'), rebuilt, check_names = False)
+
+
+def test_cache_only_position_loads_without_scraping(workspace, tmp_path):
+    workspace([2022])
+    etl.get_fantasy_points_by_age('QB', scraper = pfr_scraping_stub)
+    #The first read from the .csv writes the binary cache
+    expected = etl.get_fantasy_points_by_age('QB')
+    (tmp_path / 'data' / 'raw' / 'QB_age_fantasy_points.csv').unlink()
+    scraper = types.SimpleNamespace(get_all_players_slugs = None, get_player_career_stats_from_slug = None)
+    pd.testing.assert_frame_equal(etl.get_fantasy_points_by_age('QB', scraper = scraper), expected)
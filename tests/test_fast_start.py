@@ -0,0 +1,10 @@
+import pytest
+import benchmark
+
+
+@pytest.mark.parametrize('statement', benchmark.FAST_START_PATHS)
+def test_fast_start_path(statement):
+    #Each path runs in fresh interpreters, so modules this test process already imported do not hide the cost
+    seconds, heavy = benchmark.measure_fast_start(statement)
+    assert heavy == [], '{s} imported {h}'.format(s = statement, h = heavy)
+    assert seconds <= benchmark.IMPORT_TIME_BUDGET, '{s} took {t:.2f}s, over the {b}s budget'.format(s = statement, t = seconds, b = benchmark.IMPORT_TIME_BUDGET)
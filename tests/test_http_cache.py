@@ -0,0 +1,73 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import pytest
+import http_cache
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for pro-football-reference.com: echoes the request path, tags it with an ETag and answers a matching
+      If-None-Match with a 304
+    """
+    def do_GET(self):
+        self.server.hits.append((self.path, self.headers.get('If-None-Match')))
+        etag = '"{n}"'.format(n = len(self.path))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    server.hits = []
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fresh_entries_are_served_from_disk(server, tmp_path):
+    cache = http_cache.HTTPCache(str(tmp_path), ttl = 3600)
+    url = 'http://127.0.0.1:{p}/players/A/AbbeJa00.htm'.format(p = server.server_address[1])
+    first, second = cache.get(url), cache.get(url)
+    assert (first.from_cache, second.from_cache) == (False, True)
+    assert second.text == first.text == '/players/A/AbbeJa00.htm'
+    assert len(server.hits) == 1
+
+
+def test_stale_entries_are_revalidated_with_etag(server, tmp_path):
+    cache = http_cache.HTTPCache(str(tmp_path), ttl = 0)
+    url = 'http://127.0.0.1:{p}/years/2022/passing.htm'.format(p = server.server_address[1])
+    first = cache.get(url)
+    revalidated = cache.get(url)
+    assert server.hits[1] == ('/years/2022/passing.htm', '"{n}"'.format(n = len('/years/2022/passing.htm')))
+    assert revalidated.from_cache and revalidated.status_code == 200
+    assert revalidated.content == first.content
+
+
+def test_params_are_part_of_the_url_and_cache_key(server, tmp_path):
+    cache = http_cache.HTTPCache(str(tmp_path), ttl = 3600)
+    url = 'http://127.0.0.1:{p}/play-index/search.cgi'.format(p = server.server_address[1])
+    qb = cache.get(url, params = {'pos' : 'QB', 'year' : 2022})
+    rb = cache.get(url, params = {'pos' : 'RB', 'year' : 2022})
+    assert qb.text == '/play-index/search.cgi?pos=QB&year=2022'
+    assert rb.text == '/play-index/search.cgi?pos=RB&year=2022'
+    assert cache.get(url, params = {'pos' : 'QB', 'year' : 2022}).from_cache
+    assert [path for path, _ in server.hits] == ['/play-index/search.cgi?pos=QB&year=2022', '/play-index/search.cgi?pos=RB&year=2022']
+
+
+def test_unsupported_arguments_raise(tmp_path):
+    cache = http_cache.HTTPCache(str(tmp_path))
+    with pytest.raises(TypeError):
+        cache.get('http://127.0.0.1:1/', stream = True)
@@ -0,0 +1,40 @@
+import pytest
+import analysis
+import benchmark
+from instrumentation import METRICS
+import viz
+
+
+@pytest.fixture
+def league():
+    return benchmark.synthetic_league(300, seed = 4)
+
+
+@pytest.fixture
+def metrics():
+    METRICS.reset()
+    yield METRICS
+    METRICS.reset()
+
+
+def stage_calls(registry):
+    return {name : stage['calls'] for name, stage in registry.snapshot().items()}
+
+
+def test_sweep_merges_worker_metrics(league, metrics):
+    analysis.sweep_parameters(league, [3, 4], [50, 70], max_workers = 1)
+    in_process = stage_calls(metrics)
+    metrics.reset()
+    analysis.sweep_parameters(league, [3, 4], [50, 70], max_workers = 2)
+    assert in_process['analysis.sweep_grid_point_task'] == 2 * len(league)
+    assert stage_calls(metrics) == in_process
+
+
+def test_render_all_merges_worker_metrics(league, metrics, tmp_path, monkeypatch):
+    monkeypatch.setattr(viz, 'RENDER_CACHE_DIR', None)
+    viz.render_all(league, output_dir = str(tmp_path), max_workers = 2)
+    calls = stage_calls(metrics)
+    #Box plots by age and career season for every position, and the two heatmaps
+    assert calls['viz.render_figure_task'] == 2 * len(league) + 2
+    assert calls['viz.plot_box_and_whiskers_age_with_table'] == len(league)
+    assert calls['viz.plot_heatmap_p_values_age_jumps'] == 1
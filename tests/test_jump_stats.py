@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+import benchmark
+import jump_stats
+
+
+@pytest.mark.parametrize('by', ['age', 'career_season'])
+def test_folding_into_a_saved_store_stays_consistent(tmp_path, by):
+    age_df = benchmark.synthetic_league(600, seed = 6)['WR']
+    earlier, new = age_df.iloc[:400], age_df.iloc[400:]
+    path = str(tmp_path / 'WR_{by}_jump_stats.npz'.format(by = by))
+    jump_stats.JumpStatsStore.from_frame(earlier, by = by, min_years = 3, fp_cutoff_flat = 50).save(path)
+    #Returning players gain a season after their last one, a new best for some of them
+    updated = earlier.iloc[::10].copy()
+    for i, (player, row) in enumerate(updated.iterrows()):
+        next_age = row.last_valid_index() + 1
+        if next_age in updated.columns:
+            updated.loc[player, next_age] = np.nanmax(row.to_numpy()) * (1.5 if i % 2 else .5)
+    assert updated.notnull().sum().sum() > earlier.iloc[::10].notnull().sum().sum()
+    store = jump_stats.JumpStatsStore.load(path)
+    store.fold_in(new)
+    store.fold_in(updated)
+    store.save(path)
+    store = jump_stats.JumpStatsStore.load(path)
+    assert store.check_consistency()
+    assert len(store.to_frame()) == len(age_df)
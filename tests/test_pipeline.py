@@ -0,0 +1,30 @@
+import json
+import os
+import pytest
+import pipeline
+
+
+@pytest.fixture
+def stages():
+    with open(os.path.join(pipeline.package_directory, 'data-params.json')) as fh:
+        return {stage.stage_id : stage for stage in pipeline.build_stages(json.load(fh))}
+
+
+def stage_keys(stages):
+    #Dependencies keyed the same throughout, so only the stages' own code and modules move their keys
+    return {stage_id : stage.key({dep : 'dep' for dep in stage.deps}) for stage_id, stage in stages.items()}
+
+
+@pytest.mark.parametrize('module, rerun', [('http_cache', {'load_raw'}), ('etl', {'load_raw'}), ('analysis', {'normalize', 'test', 'summarize'}),
+                                           ('jump_stats', {'normalize', 'test', 'summarize'}), ('viz', {'render', 'render_heatmap'})])
+def test_editing_a_module_only_reruns_the_stages_that_call_it(stages, monkeypatch, module, rerun):
+    before = stage_keys(stages)
+    read = pipeline.modules_fingerprint.__wrapped__
+
+    def fingerprint(modules):
+        #As if the module's source had been edited
+        return read(modules) + ('edited' if any(m.__name__ == module for m in modules) else '')
+    monkeypatch.setattr(pipeline, 'modules_fingerprint', fingerprint)
+    after = stage_keys(stages)
+    changed = {stage_id.split('/')[0] for stage_id in stages if before[stage_id] != after[stage_id]}
+    assert changed == rerun
@@ -0,0 +1,66 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+import analysis
+import benchmark
+import service
+
+
+@pytest.fixture
+def query_service():
+    league = benchmark.synthetic_league(400, seed = 5)
+    return service.QueryService(league, min_years_dict = {p : 3 for p in league}, fp_cutoff_flat_dict = {p : 50 for p in league})
+
+
+@pytest.fixture
+def server(query_service):
+    server = service.make_server(query_service, port = 0)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, query):
+    try:
+        with urllib.request.urlopen('http://127.0.0.1:{p}{q}'.format(p = server.server_address[1], q = query)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_query_matches_analysis(query_service):
+    response = json.loads(query_service.query('RB', by = 'career_season', metric = 'p_values'))
+    expected = analysis.median_and_p_vals_by_career_season(query_service.age_dfs['RB'], min_years = 3, fp_cutoff_flat = 50)['P-value']
+    assert list(response['values']) == list(expected.index)
+    assert response['values']['1-2'] == pytest.approx(expected['1-2'])
+
+
+def test_repeated_queries_are_cached(query_service):
+    assert query_service.query('QB', metric = 'medians') is query_service.query('QB', metric = 'medians')
+
+
+@pytest.mark.parametrize('query', ['/query?position=XX', '/query?position=QB&by=week', '/query?position=QB&min_years=abc',
+                                   '/query?position=QB&alternative=sideways', '/query?position=QB&foo=1',
+                                   '/query?position=QB&fp_cutoff_flat=nan', '/query?position=QB&fp_cutoff_flat=inf'])
+def test_bad_queries_are_rejected(server, query):
+    status, body = get(server, query)
+    assert status == 400 and 'error' in body
+
+
+def test_non_finite_cutoffs_are_not_cached(server):
+    for _ in range(3):
+        get(server, '/query?position=QB&fp_cutoff_flat=nan')
+    assert len(server.service.responses) == 0
+
+
+def test_unexpected_errors_are_a_500(server, monkeypatch):
+    def compute(position, by, metric, params):
+        raise KeyError('odd data')
+    monkeypatch.setattr(server.service, 'compute', compute)
+    status, body = get(server, '/query?position=QB')
+    assert status == 500 and 'odd data' in body['error']
+    #The server keeps answering after the failure
+    assert get(server, '/positions')[0] == 200
@@ -0,0 +1,52 @@
+import os
+import pytest
+import analysis
+import benchmark
+import viz
+
+
+def test_eviction_skips_entries_already_evicted(tmp_path, monkeypatch):
+    for i, name in enumerate(['a.png', 'b.png', 'c.png']):
+        (tmp_path / name).write_bytes(b'x' * 100)
+        os.utime(tmp_path / name, (i, i))
+    #Another worker evicts gone.png after this one listed the cache
+    listed = [str(tmp_path / name) for name in ['gone.png', 'a.png', 'b.png', 'c.png']]
+    monkeypatch.setattr(viz.glob, 'glob', lambda pattern : listed)
+    viz.evict_render_cache(str(tmp_path), 150)
+    assert sorted(os.listdir(tmp_path)) == ['c.png']
+
+
+def test_eviction_tolerates_a_concurrent_removal(tmp_path, monkeypatch):
+    for i, name in enumerate(['a.png', 'b.png']):
+        (tmp_path / name).write_bytes(b'x' * 100)
+        os.utime(tmp_path / name, (i, i))
+    remove = os.remove
+
+    def remove_twice(path):
+        #Another worker removes the file first
+        remove(path)
+        remove(path)
+    monkeypatch.setattr(viz.os, 'remove', remove_twice)
+    viz.evict_render_cache(str(tmp_path), 150)
+    assert os.listdir(tmp_path) == ['b.png']
+
+
+@pytest.mark.parametrize('by', ['age', 'career_season'])
+def test_everyone_filtered_out_draws_an_empty_plot(tmp_path, monkeypatch, by):
+    monkeypatch.setattr(viz, 'RENDER_CACHE_DIR', None)
+    viz.plt.switch_backend('Agg')
+    age_df = benchmark.synthetic_league(300, seed = 2)['QB']
+    if by == 'age':
+        unstacked = analysis.unstack_and_normalize_fantasy_points_and_age(age_df, min_years = 99)
+        med_p_val = analysis.median_and_p_vals_by_age(age_df, min_years = 99)
+        plot = viz.plot_box_and_whiskers_age_with_table
+    else:
+        unstacked = analysis.unstack_and_normalize_fantasy_points_and_career_season(age_df, min_years = 99)
+        med_p_val = analysis.median_and_p_vals_by_career_season(age_df, min_years = 99)
+        plot = viz.plot_box_and_whiskers_career_season_with_table
+    assert unstacked.empty
+    group_col = 'Age' if by == 'age' else 'Career Season'
+    box_stats = viz.box_plot_stats(unstacked, group_col)
+    assert box_stats.empty and box_stats.index.name == group_col
+    plot(unstacked, med_p_val, 'QB', True, output_dir = str(tmp_path), show = False)
+    assert len(os.listdir(tmp_path)) == 1
@@ -1,26 +1,274 @@
-import matplotlib.pyplot as plt
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import functools
+import glob
+import hashlib
+import importlib.metadata
+import inspect
+import json
 import numpy as np
 import os
 import pandas as pd
-import seaborn as sns
+import shutil
 import sys
-sys.path.append('/Users/tevans-barton/AAASideProjects/')
+import threading
 package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+from instrumentation import METRICS, call_in_worker, instrumented
+from lazy_imports import LazyModule
 
 import logging
-logging.basicConfig(filename='../logger.log', format='%(asctime)s %(levelname)s:%(name)s :: %(message)s', datefmt='%m/%d/%Y %H:%M:%S', encoding='utf-8', level=logging.DEBUG)
+import logging_config
+logging_config.configure_logging()
 Logger = logging.getLogger(__name__)
 
-plt.style.use('ggplot')
+#matplotlib and seaborn are only imported once something is drawn, render cache hits never import them
+PLOT_STYLE = 'ggplot'
+plt = LazyModule('matplotlib.pyplot', on_load = lambda pyplot : pyplot.style.use(PLOT_STYLE))
+sns = LazyModule('seaborn', on_load = lambda seaborn : plt._load())
 
+#Content addressed cache of saved figures, keyed on the plot function, its inputs and its parameters
+RENDER_CACHE_DIR = '../data/render_cache'
+RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+#Bump when a figure changes for a reason the render key cannot see (e.g. a new rcParam set outside viz.py)
+RENDER_VERSION = 1
+#Helpers every plot function draws through, hashed into the render key along with the plot function itself
+RENDER_HELPERS = ('box_plot_stats', 'draw_box_plot', 'save_figure', 'finish_figure')
+_render_state = threading.local()
 
-def plot_median_fantasy_points_age(age_median_series, position, download = False):
+
+@functools.lru_cache(maxsize = None)
+def render_environment():
+    """
+    Get what every figure depends on besides its plot function and inputs: the helpers' code, the style, the render
+      version and the matplotlib and seaborn versions
+    Returns:
+        environment: string, text to hash into every render key
+    """
+    versions = []
+    for package in ('matplotlib', 'seaborn'):
+        try:
+            versions.append(importlib.metadata.version(package))
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(None)
+    helpers = ''.join(inspect.getsource(globals()[name]) for name in RENDER_HELPERS)
+    return helpers + repr((PLOT_STYLE, RENDER_VERSION, versions))
+
+
+def render_key(source, bound_args):
+    """
+    Get the cache key of a plot, hashing the plot function's code, the helpers and style it draws with and every
+      argument except where and whether to show it
+    Arguments:
+        source: string, source code of the plot function
+        bound_args: inspect.BoundArguments, the arguments the plot function was called with
+    Returns:
+        key: string, hex digest identifying the figure
+    """
+    h = hashlib.sha1(source.encode())
+    h.update(render_environment().encode())
+    for name, value in bound_args.arguments.items():
+        if name in ('output_dir', 'show'):
+            continue
+        if isinstance(value, pd.Series):
+            value = value.to_frame()
+        h.update(name.encode())
+        h.update((analysis.frame_fingerprint(value) if isinstance(value, pd.DataFrame) else repr(value)).encode())
+    return h.hexdigest()
+
+
+def evict_render_cache(cache_dir, max_bytes):
+    """
+    Delete the least recently used figures from the render cache until it fits in max_bytes
+    Arguments:
+        cache_dir: string, folder of the render cache
+        max_bytes: int, most bytes the cache may hold
+    Returns:
+        None
+    """
+    #render_all workers share the cache, so another process may evict an entry between the glob and its stat or removal
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, '*.png')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        Logger.debug('Evicting {p} from the render cache'.format(p = os.path.basename(path)))
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def render_cached(fn):
+    """
+    Decorate a plot function so that when it is only saving (download true, show false) a figure drawn before from
+      identical inputs is copied out of the render cache instead of being redrawn
+    Arguments:
+        fn: function, plot function taking download, output_dir and show arguments
+    Returns:
+        wrapper: function, the plot function backed by the render cache
+    """
+    signature = inspect.signature(fn)
+    source = inspect.getsource(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound_args = signature.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        if not bound_args.arguments['download'] or bound_args.arguments['show'] or RENDER_CACHE_DIR is None:
+            return fn(*args, **kwargs)
+        cache_dir = os.path.abspath(RENDER_CACHE_DIR)
+        key = render_key(source, bound_args)
+        hits = glob.glob(os.path.join(cache_dir, key + '-*.png'))
+        if hits:
+            Logger.debug('Render cache hit for {f}'.format(f = fn.__name__))
+            output_dir = os.path.abspath(bound_args.arguments['output_dir'] or '../visualizations')
+            if not os.path.exists(output_dir):
+                Logger.debug('Making visualizations folder')
+                os.makedirs(output_dir, exist_ok = True)
+            try:
+                #Mark the entry as recently used
+                os.utime(hits[0])
+                shutil.copyfile(hits[0], os.path.join(output_dir, os.path.basename(hits[0])[len(key) + 1:]))
+                return None
+            except FileNotFoundError:
+                #Evicted by another process since the glob, so draw it again
+                Logger.debug('Render cache entry for {f} was evicted, redrawing'.format(f = fn.__name__))
+        #save_figure stores whatever the plot function saves under this key
+        _render_state.key = key
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _render_state.key = None
+    return wrapper
+
+
+def save_figure(filename, *, output_dir = None, **kwargs):
+    """
+    Save the current figure, making the output folder if needed
+    Arguments:
+        filename: string, name of the file to save the figure as
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the figure to
+            **kwargs: keyword arguments to pass to plt.savefig
+    Returns:
+        None
+    """
+    output_dir = os.path.abspath(output_dir or '../visualizations')
+    if not os.path.exists(output_dir):
+        Logger.debug('Making visualizations folder')
+        os.makedirs(output_dir)
+    plt.savefig(os.path.join(output_dir, filename), **kwargs)
+    key = getattr(_render_state, 'key', None)
+    if key is not None:
+        cache_dir = os.path.abspath(RENDER_CACHE_DIR)
+        if not os.path.exists(cache_dir):
+            Logger.debug('Making render cache folder')
+            os.makedirs(cache_dir)
+        shutil.copyfile(os.path.join(output_dir, filename), os.path.join(cache_dir, key + '-' + filename))
+        evict_render_cache(cache_dir, RENDER_CACHE_MAX_BYTES)
+
+
+def finish_figure(show):
+    """
+    Show the current figure, or close it when it was only drawn to be saved
+    Arguments:
+        show: boolean, whether to show the figure
+    Returns:
+        None
+    """
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+
+def box_plot_stats(unstacked_fp, group_col, *, whis = 1.5):
+    """
+    Get the box plot statistics of fantasy points for every group in one vectorized pass over the sorted points,
+      matching matplotlib's boxplot_stats
+    Arguments:
+        unstacked_fp: pd.DataFrame, unstacked fantasy points, with a group_col column and a Fantasy Points column
+        group_col: string, column to group by, e.g. 'Age' or 'Career Season'
+        keyword:
+            whis: float, default 1.5, whisker reach as a multiple of the interquartile range
+    Returns:
+        box_stats: pd.DataFrame, indexed by group, with columns q1, med, q3, whislo, whishi, mean and fliers
+    """
+    if unstacked_fp.empty:
+        #Every player was filtered out, so there are no boxes to draw
+        return pd.DataFrame(columns = ['q1', 'med', 'q3', 'whislo', 'whishi', 'mean', 'fliers'], index = pd.Index([], name = group_col))
+    groups = unstacked_fp[group_col].to_numpy()
+    values = unstacked_fp['Fantasy Points'].to_numpy(dtype = float)
+    #Sort by group then value so every group is a contiguous, sorted run
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    labels, starts, counts = np.unique(groups, return_index = True, return_counts = True)
+
+    def quantile(q):
+        #Linear interpolation between the closest ranks, as np.percentile does
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    q1, med, q3 = quantile(.25), quantile(.5), quantile(.75)
+    iqr = q3 - q1
+    inside = (values >= np.repeat(q1 - whis * iqr, counts)) & (values <= np.repeat(q3 + whis * iqr, counts))
+    #Whiskers reach the furthest points inside the fences, but never fall inside the box
+    whislo = np.minimum(np.minimum.reduceat(np.where(inside, values, np.inf), starts), q1)
+    whishi = np.maximum(np.maximum.reduceat(np.where(inside, values, -np.inf), starts), q3)
+    flier_groups = np.repeat(np.arange(len(labels)), counts)[~inside]
+    fliers = np.split(values[~inside], np.searchsorted(flier_groups, np.arange(1, len(labels))))
+    return pd.DataFrame({'q1' : q1, 'med' : med, 'q3' : q3, 'whislo' : whislo, 'whishi' : whishi, 'mean' : np.add.reduceat(values, starts) / counts, 'fliers' : fliers}, index = pd.Index(labels, name = group_col))
+
+
+def draw_box_plot(unstacked_fp, group_col, cmap):
+    """
+    Draw box plots of fantasy points for every group from precomputed statistics, coloring each box by its median
+      relative to the overall median
+    Arguments:
+        unstacked_fp: pd.DataFrame, unstacked fantasy points, with a group_col column and a Fantasy Points column
+        group_col: string, column to group by, e.g. 'Age' or 'Career Season'
+        cmap: matplotlib colormap, colormap for the boxes
+    Returns:
+        None
+    """
+    box_stats = box_plot_stats(unstacked_fp, group_col)
+    if box_stats.empty:
+        return
+    overall_median = unstacked_fp['Fantasy Points'].median()
+    bxp_stats = [dict(row, label = str(group)) for group, row in zip(box_stats.index, box_stats.to_dict('records'))]
+    line_props = {'color' : '.3', 'linewidth' : 2}
+    #Boxes are patches, which take an edgecolor (a color would also set the facecolor painted over below)
+    box_props = {'edgecolor' : '.3', 'linewidth' : 2}
+    boxes = plt.gca().bxp(bxp_stats, positions = range(len(bxp_stats)), widths = .8, patch_artist = True, boxprops = box_props, whiskerprops = line_props, capprops = line_props, medianprops = line_props, flierprops = {'marker' : 'd', 'markerfacecolor' : '.3', 'markeredgecolor' : '.3', 'markersize' : 5})
+    for box, median in zip(boxes['boxes'], box_stats['med']):
+        box.set_facecolor(cmap(median / (overall_median / .5)))
+
+
+@instrumented
+@render_cached
+def plot_median_fantasy_points_age(age_median_series, position, download = False, *, output_dir = None, show = True):
     """
     Plot the median fantasy points by age for a given position
     Arguments:
         age_df: pd.Series, median fantasy points by age for a given position
         position: string, position to label the visualization as
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
@@ -29,20 +277,22 @@ def plot_median_fantasy_points_age(age_median_series, position, download = False
     plt.ylabel('Individually Scaled Fantasy Points')
     plt.xlabel('Age')
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/{pos}_median_fantasy_points_age.png'.format(pos = position.replace(' ', '_'))))
-    plt.show()
+        save_figure('{pos}_median_fantasy_points_age.png'.format(pos = position.replace(' ', '_')), output_dir = output_dir)
+    finish_figure(show)
 
 
-def plot_median_fantasy_points_career_season(age_median_series, position, download = False):
+@instrumented
+@render_cached
+def plot_median_fantasy_points_career_season(age_median_series, position, download = False, *, output_dir = None, show = True):
     """
     Plot the median fantasy points by age for a given position
     Arguments:
         age_df: pd.Series, median fantasy points by age for a given position
         position: string, position to label the visualization as
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
@@ -52,44 +302,42 @@ def plot_median_fantasy_points_career_season(age_median_series, position, downlo
     plt.ylabel('Individually Scaled Fantasy Points')
     plt.xlabel('Age')
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/{pos}_median_fantasy_points_career_season.png'.format(pos = position.replace(' ', '_'))))
-    plt.show()
+        save_figure('{pos}_median_fantasy_points_career_season.png'.format(pos = position.replace(' ', '_')), output_dir = output_dir)
+    finish_figure(show)
 
 
-def plot_box_and_whiskers_age(unstacked_age_fp, position, download = False):
+@instrumented
+@render_cached
+def plot_box_and_whiskers_age(unstacked_age_fp, position, download = False, *, output_dir = None, show = True):
     """
     Plot the box and whiskers plots by ages for a given position
     Arguments:
         unstacked_age_fp: pd.DataFrame, unstacked fantasy points by age for a given position
         position: string, position to label the visualization as
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
     plt.figure(figsize = (20, 12))
     #Plot the heatmap
     cmap = sns.diverging_palette(10, 133, as_cmap=True)
-    median_map = unstacked_age_fp[['Age', 'Fantasy Points']].groupby('Age').median()['Fantasy Points']
-    overall_median = unstacked_age_fp['Fantasy Points'].median()
-    my_boxplot_palette = {x: cmap(median_map[x] / (overall_median / .5)) for x in unstacked_age_fp['Age']}
-    sns.boxplot(x = unstacked_age_fp['Age'], y = unstacked_age_fp['Fantasy Points'], linewidth = 2, palette = my_boxplot_palette)
+    draw_box_plot(unstacked_age_fp, 'Age', cmap)
     plt.title('{pos} Fantasy Points by Age'.format(pos = position), fontsize = 24)
     plt.ylabel('Individually Scaled Fantasy Points', fontsize = 18)
     plt.xlabel('Age', fontsize = 18)
     plt.xticks(fontsize = 14)
     plt.yticks(fontsize = 14)
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/{pos}_box_and_whiskers_age.png'.format(pos = position.replace(' ', '_'))))
-    plt.show()
+        save_figure('{pos}_box_and_whiskers_age.png'.format(pos = position.replace(' ', '_')), output_dir = output_dir)
+    finish_figure(show)
 
 
-def plot_box_and_whiskers_age_with_table(unstacked_age_fp, p_vals_and_meds, position, download = False):
+@instrumented
+@render_cached
+def plot_box_and_whiskers_age_with_table(unstacked_age_fp, p_vals_and_meds, position, download = False, *, output_dir = None, show = True):
     """
     Plot the box and whiskers plots by ages for a given position
     Arguments:
@@ -97,63 +345,63 @@ def plot_box_and_whiskers_age_with_table(unstacked_age_fp, p_vals_and_meds, posi
         p_vals_and_meds: pd.DataFrame, the p-values and medians for each age jump
         position: string, position to label the visualization as
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
     plt.figure(figsize = (20, 12))
     cmap = sns.diverging_palette(10, 133, as_cmap=True)
-    median_map = unstacked_age_fp[['Age', 'Fantasy Points']].groupby('Age').median()['Fantasy Points']
-    overall_median = unstacked_age_fp['Fantasy Points'].median()
-    my_boxplot_palette = {x: cmap(median_map[x] / (overall_median / .5)) for x in unstacked_age_fp['Age']}
-    sns.boxplot(x = unstacked_age_fp['Age'], y = unstacked_age_fp['Fantasy Points'], linewidth = 2, palette = my_boxplot_palette)
+    draw_box_plot(unstacked_age_fp, 'Age', cmap)
     med_val_color_fx = lambda x : (x / max([x[0] for x in p_vals_and_meds.values])) + .5
     p_val_color_fx = lambda x : (1, 1, 0, .8) if x <= .05 else (.211, .211, .211, .3)
     my_table_palette = [[cmap(med_val_color_fx(x)), p_val_color_fx(y)] for x, y in p_vals_and_meds.fillna(1).values]
-    table = plt.table(cellText = [x.round(8) for x in p_vals_and_meds.values], cellColours=my_table_palette, colLabels = p_vals_and_meds.columns, rowLabels=p_vals_and_meds.index, loc = 'right', bbox = [1.1, 0, .3, 1])
-    table.set_fontsize(20)
+    #With every player filtered out there are no jumps to tabulate
+    if len(p_vals_and_meds):
+        table = plt.table(cellText = [x.round(8) for x in p_vals_and_meds.values], cellColours=my_table_palette, colLabels = p_vals_and_meds.columns, rowLabels=p_vals_and_meds.index, loc = 'right', bbox = [1.1, 0, .3, 1])
+        table.set_fontsize(20)
     plt.title('{pos} Fantasy Points by Age'.format(pos = position), fontsize = 24)
     plt.ylabel('Individually Scaled Fantasy Points', fontsize = 20)
     plt.xlabel('Age', fontsize = 20)
     plt.xticks(fontsize = 14)
     plt.yticks(fontsize = 14)
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/{pos}_box_and_whiskers_age_with_table.png'.format(pos = position.replace(' ', '_'))), bbox_inches = "tight", pad_inches = 1)
-    plt.show()
+        save_figure('{pos}_box_and_whiskers_age_with_table.png'.format(pos = position.replace(' ', '_')), output_dir = output_dir, bbox_inches = "tight", pad_inches = 1)
+    finish_figure(show)
 
 
-def plot_box_and_whiskers_career_season(unstacked_career_season_fp, position, download = False):
+@instrumented
+@render_cached
+def plot_box_and_whiskers_career_season(unstacked_career_season_fp, position, download = False, *, output_dir = None, show = True):
     """
     Plot the box and whiskers plots by career season for a given position
     Arguments:
         unstacked_career_season_fp: pd.DataFrame, unstacked fantasy points by career season for a given position
         position: string, position to label the visualization as
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
     plt.figure(figsize = (20, 12))
     cmap = sns.diverging_palette(10, 133, as_cmap=True)
-    median_map = unstacked_career_season_fp[['Career Season', 'Fantasy Points']].groupby('Career Season').median()['Fantasy Points']
-    overall_median = unstacked_career_season_fp['Fantasy Points'].median()
-    my_boxplot_palette = {x: cmap(median_map[x] / (overall_median / .5)) for x in unstacked_career_season_fp['Career Season']}
-    sns.boxplot(x = unstacked_career_season_fp['Career Season'], y = unstacked_career_season_fp['Fantasy Points'], linewidth = 2, palette = my_boxplot_palette)
+    draw_box_plot(unstacked_career_season_fp, 'Career Season', cmap)
     plt.title('{pos} Fantasy Points by Season in Career'.format(pos = position), fontsize = 24)
     plt.ylabel('Individually Scaled Fantasy Points', fontsize = 18)
     plt.xlabel('Career Season', fontsize = 18)
     plt.xticks(fontsize = 14)
     plt.yticks(fontsize = 14)
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/{pos}_box_and_whiskers_career_season.png'.format(pos = position.replace(' ', '_'))))
-    plt.show()
+        save_figure('{pos}_box_and_whiskers_career_season.png'.format(pos = position.replace(' ', '_')), output_dir = output_dir)
+    finish_figure(show)
 
 
-def plot_box_and_whiskers_career_season_with_table(unstacked_career_season_fp, p_vals_and_meds, position, download = False):
+@instrumented
+@render_cached
+def plot_box_and_whiskers_career_season_with_table(unstacked_career_season_fp, p_vals_and_meds, position, download = False, *, output_dir = None, show = True):
     """
     Plot the box and whiskers plots by career season for a given position
     Arguments:
@@ -161,39 +409,43 @@ def plot_box_and_whiskers_career_season_with_table(unstacked_career_season_fp, p
         p_vals_and_meds: pd.DataFrame, the p-values and medians for each season in career jump
         position: string, position to label the visualization as
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
     plt.figure(figsize = (20, 12))
     cmap = sns.diverging_palette(10, 133, as_cmap=True)
-    median_map = unstacked_career_season_fp[['Career Season', 'Fantasy Points']].groupby('Career Season').median()['Fantasy Points']
-    overall_median = unstacked_career_season_fp['Fantasy Points'].median()
-    my_boxplot_palette = {x: cmap(median_map[x] / (overall_median / .5)) for x in unstacked_career_season_fp['Career Season']}
-    sns.boxplot(x = unstacked_career_season_fp['Career Season'], y = unstacked_career_season_fp['Fantasy Points'], linewidth = 2, palette = my_boxplot_palette)
+    draw_box_plot(unstacked_career_season_fp, 'Career Season', cmap)
     med_val_color_fx = lambda x : (x / max([x[0] for x in p_vals_and_meds.values])) + .5
     p_val_color_fx = lambda x : (1, 1, 0, .8) if x <= .05 else (.211, .211, .211, .3)
     my_table_palette = [[cmap(med_val_color_fx(x)), p_val_color_fx(y)] for x, y in p_vals_and_meds.fillna(1).values]
-    table = plt.table(cellText = [x.round(7) for x in p_vals_and_meds.values], cellColours=my_table_palette, colLabels = p_vals_and_meds.columns, rowLabels=p_vals_and_meds.index, loc = 'right', bbox = [1.1, 0, .3, 1])
-    table.set_fontsize(20)
+    #With every player filtered out there are no jumps to tabulate
+    if len(p_vals_and_meds):
+        table = plt.table(cellText = [x.round(7) for x in p_vals_and_meds.values], cellColours=my_table_palette, colLabels = p_vals_and_meds.columns, rowLabels=p_vals_and_meds.index, loc = 'right', bbox = [1.1, 0, .3, 1])
+        table.set_fontsize(20)
     plt.title('{pos} Fantasy Points by Season in Career'.format(pos = position), fontsize = 24)
     plt.ylabel('Individually Scaled Fantasy Points', fontsize = 18)
     plt.xlabel('Career Season', fontsize = 18)
     plt.xticks(fontsize = 14)
     plt.yticks(fontsize = 14)
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/{pos}_box_and_whiskers_career_season_with_table.png'.format(pos = position.replace(' ', '_'))), bbox_inches = "tight", pad_inches = 1)
-    plt.show()
+        save_figure('{pos}_box_and_whiskers_career_season_with_table.png'.format(pos = position.replace(' ', '_')), output_dir = output_dir, bbox_inches = "tight", pad_inches = 1)
+    finish_figure(show)
 
 
-def plot_heatmap_p_values_age_jumps(p_vals, download = False):
+@instrumented
+@render_cached
+def plot_heatmap_p_values_age_jumps(p_vals, download = False, *, output_dir = None, show = True):
     """
     Plot the heatmap of p-values for age jumps
     Arguments:
         p_vals: pd.DataFrame, p-values for age jumps
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
@@ -207,18 +459,20 @@ def plot_heatmap_p_values_age_jumps(p_vals, download = False):
     plt.xticks(fontsize = 10)
     plt.title('P-Values for Paired T-Tests by Age Jump', fontsize = 20)
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/heatmap_p_values_age_jumps.png'))
-    plt.show()
+        save_figure('heatmap_p_values_age_jumps.png', output_dir = output_dir)
+    finish_figure(show)
 
-def plot_heatmap_p_values_career_season_jumps(p_vals, download = False):
+@instrumented
+@render_cached
+def plot_heatmap_p_values_career_season_jumps(p_vals, download = False, *, output_dir = None, show = True):
     """
     Plot the heatmap of p-values for career season jumps
     Arguments:
         p_vals: pd.DataFrame, p-values for career season jumps
         download: boolean, default false, whether to save the plot to the visualizations folder
+        keyword:
+            output_dir: string, default '../visualizations', folder to save the plot to
+            show: boolean, default true, whether to show the plot, otherwise it is closed to free its memory
     Returns:
         None
     """
@@ -232,8 +486,104 @@ def plot_heatmap_p_values_career_season_jumps(p_vals, download = False):
     plt.xticks(fontsize = 10)
     plt.title('P-Values for Paired T-Tests by Career Season Jump', fontsize = 20)
     if download:
-        if not os.path.exists(os.path.abspath('../visualizations/')):
-            Logger.debug('Making visualizations folder')
-            os.mkdir(os.path.abspath('../visualizations'))
-        plt.savefig(os.path.abspath('../visualizations/heatmap_p_values_career_szn_jumps.png'))
-    plt.show()
+        save_figure('heatmap_p_values_career_szn_jumps.png', output_dir = output_dir)
+    finish_figure(show)
+
+
+POSITION_NAMES = {'QB' : 'Quarter Back', 'RB' : 'Running Back', 'WR' : 'Wide Receiver', 'TE' : 'Tight End'}
+
+
+@contextmanager
+def agg_backend():
+    """
+    Draw with the non-interactive Agg backend, switching back to the previous backend on exit so an interactive session
+      rendering in process keeps its own
+    Returns:
+        None
+    """
+    backend = plt.get_backend()
+    if backend.lower() == 'agg':
+        yield
+        return
+    plt.switch_backend('Agg')
+    try:
+        yield
+    finally:
+        plt.switch_backend(backend)
+
+
+@instrumented
+def render_figure_task(task):
+    """
+    Render one figure, run in a worker process by render_all, which sets the Agg backend
+    Arguments:
+        task: tuple of (kind, args, output_dir), where kind is 'age', 'career_season', 'heatmap_age' or
+          'heatmap_career_season'. For 'age' and 'career_season' args is (age_df, position, min_years, fp_cutoff_flat,
+          alternative), for the heatmaps it is the p-values dataframe
+    Returns:
+        kind: string, the kind of figure rendered
+    """
+    kind, args, output_dir = task
+    if kind in ('age', 'career_season'):
+        age_df, position, min_years, fp_cutoff_flat, alternative = args
+        if kind == 'age':
+            unstacked = analysis.unstack_and_normalize_fantasy_points_and_age(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+            med_p_val = analysis.median_and_p_vals_by_age(age_df, alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+            plot_box_and_whiskers_age_with_table(unstacked, med_p_val, position, True, output_dir = output_dir, show = False)
+        else:
+            unstacked = analysis.unstack_and_normalize_fantasy_points_and_career_season(age_df, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+            med_p_val = analysis.median_and_p_vals_by_career_season(age_df, alternative = alternative, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+            plot_box_and_whiskers_career_season_with_table(unstacked, med_p_val, position, True, output_dir = output_dir, show = False)
+    elif kind == 'heatmap_age':
+        plot_heatmap_p_values_age_jumps(args, True, output_dir = output_dir, show = False)
+    elif kind == 'heatmap_career_season':
+        plot_heatmap_p_values_career_season_jumps(args, True, output_dir = output_dir, show = False)
+    else:
+        raise ValueError('Unknown figure kind {k}'.format(k = kind))
+    return kind
+
+
+@instrumented
+def render_all(age_dfs, *, min_years_dict = {}, fp_cutoff_flat_dict = {}, alternative = 'greater', output_dir = None, max_workers = None):
+    """
+    Render the box and whiskers plots with tables by age and by career season for every position, and the p-value
+      heatmaps, across a process pool using the non-interactive Agg backend
+    Arguments:
+        age_dfs: dictionary, position abbreviation to pd.DataFrame of fantasy points by age, e.g. {'QB' : qb_age_df}
+        keyword:
+            min_years_dict: dictionary, minimum number of years played by position, e.g. {'QB' : 4}. Default is 0 for all positions
+            fp_cutoff_flat_dict: dictionary, minimum fantasy points to have hit in a year by position, e.g. {'QB' : 95.19}. Default is 0 for all positions
+            alternative: string, default 'greater', alternative hypothesis for paired t-test
+            output_dir: string, default '../visualizations', folder to save the figures to
+            max_workers: int, default None (one per CPU), number of worker processes, 1 renders in this process
+    Returns:
+        None
+    """
+    tasks = []
+    for pos, age_df in age_dfs.items():
+        for kind in ('age', 'career_season'):
+            tasks.append((kind, (age_df, POSITION_NAMES.get(pos, pos), min_years_dict.get(pos, 0), fp_cutoff_flat_dict.get(pos, 0), alternative), output_dir))
+    if all(pos in age_dfs for pos in ('QB', 'RB', 'WR', 'TE')):
+        position_dfs = [age_dfs[pos] for pos in ('QB', 'RB', 'WR', 'TE')]
+        tasks.append(('heatmap_age', analysis.paired_t_test_by_age_and_position(*position_dfs, alternative = alternative, min_years_dict = min_years_dict, fp_cutoff_flat_dict = fp_cutoff_flat_dict), output_dir))
+        tasks.append(('heatmap_career_season', analysis.paired_t_test_by_career_season_and_position(*position_dfs, alternative = alternative, min_years_dict = min_years_dict, fp_cutoff_flat_dict = fp_cutoff_flat_dict), output_dir))
+    if max_workers == 1:
+        with agg_backend():
+            for task in tasks:
+                render_figure_task(task)
+    else:
+        with ProcessPoolExecutor(max_workers = max_workers, initializer = plt.switch_backend, initargs = ('Agg',)) as executor:
+            for _, metrics in executor.map(functools.partial(call_in_worker, render_figure_task), tasks):
+                METRICS.merge(metrics)
+
+
+if __name__ == '__main__':
+    #Run from the notebooks folder, like the notebook, so the ../data and ../visualizations paths resolve
+    import etl
+    parser = argparse.ArgumentParser(description = 'Render every visualization without a display')
+    parser.add_argument('--output-dir', default = '../visualizations', help = 'folder to save the figures to')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes')
+    cli_args = parser.parse_args()
+    with open(package_directory + '/data-params.json') as fh:
+        data_cfg = json.load(fh)
+    render_all({pos : etl.get_fantasy_points_by_age(pos) for pos in data_cfg['positions']}, min_years_dict = data_cfg.get('min_years', {}), fp_cutoff_flat_dict = data_cfg.get('fp_cutoff_flat', {}), output_dir = cli_args.output_dir, max_workers = cli_args.workers)
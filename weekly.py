@@ -0,0 +1,310 @@
+import json
+import numpy as np
+import os
+import pandas as pd
+import sys
+package_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(package_directory)
+import analysis
+import etl
+from instrumentation import instrumented
+import jump_stats
+
+import logging
+import logging_config
+logging_config.configure_logging()
+Logger = logging.getLogger(__name__)
+
+#Ages and weeks every player's weekly points are stored over, games outside them are dropped
+WEEKLY_AGE_RANGE = (20, 45)
+WEEKS_PER_SEASON = 18
+#Players read from the memory-mapped array at a time, about 30 MB of weekly points at the default shape
+CHUNK_SIZE = 16384
+#Game log written for a player that failed to fetch, leaving their row NaN
+EMPTY_GAME_LOG = pd.DataFrame({'Age' : [], 'Week' : [], '*Fantasy Points*' : []})
+
+
+def weekly_paths(position):
+    """
+    Get the files the weekly points of a position are stored in
+    Arguments:
+        position: string, two letter position abbreviation
+    Returns:
+        points_path: string, path of the .npy array of weekly points
+        index_path: string, path of the .json player index
+    """
+    return (os.path.abspath('../data/raw/{pos}_weekly_points.npy'.format(pos = position)),
+            os.path.abspath('../data/raw/{pos}_weekly_index.json'.format(pos = position)))
+
+
+class WeeklyStore:
+    """
+    Fantasy points of every player by age and week, held in a memory-mapped float32 array of players x ages x weeks
+      (NaN for weeks not played) with a player index, so analyses read it a chunk of players at a time instead of
+      loading it into memory
+    Arguments:
+        points: np.memmap, players x ages x weeks fantasy points
+        players: list, player name of each row
+        first_age: int, age of the first column, columns run one season apart
+    """
+    def __init__(self, points, players, first_age):
+        self.points = points
+        self.players = np.asarray(players, dtype = object)
+        self.first_age = int(first_age)
+
+    def __len__(self):
+        return len(self.players)
+
+    @property
+    def ages(self):
+        return np.arange(self.first_age, self.first_age + self.points.shape[1])
+
+    @classmethod
+    def create(cls, position, players, *, age_range = WEEKLY_AGE_RANGE, n_weeks = WEEKS_PER_SEASON):
+        """
+        Make an empty store on disk for a position, replacing any existing one
+        Arguments:
+            position: string, two letter position abbreviation
+            players: list, player names
+            keyword:
+                age_range: tuple, default WEEKLY_AGE_RANGE, first and last age stored
+                n_weeks: int, default WEEKS_PER_SEASON, number of weeks stored per season
+        Returns:
+            store: WeeklyStore, store of NaN weekly points, open for writing
+        """
+        points_path, index_path = weekly_paths(position)
+        os.makedirs(os.path.dirname(points_path), exist_ok = True)
+        points = np.lib.format.open_memmap(points_path, mode = 'w+', dtype = np.float32, shape = (len(players), age_range[1] - age_range[0] + 1, n_weeks))
+        for start in range(0, len(players), CHUNK_SIZE):
+            points[start:start + CHUNK_SIZE] = np.nan
+        with open(index_path, 'w') as fh:
+            json.dump({'players' : list(players), 'first_age' : age_range[0]}, fh)
+        return cls(points, players, age_range[0])
+
+    @classmethod
+    def open(cls, position, *, mode = 'r'):
+        """
+        Open the store of a position written by ingest_weekly
+        Arguments:
+            position: string, two letter position abbreviation
+            keyword:
+                mode: string, default 'r', memory map mode, 'r+' to write to the store
+        Returns:
+            store: WeeklyStore, the store
+        """
+        points_path, index_path = weekly_paths(position)
+        with open(index_path) as fh:
+            index = json.load(fh)
+        return cls(np.load(points_path, mmap_mode = mode), index['players'], index['first_age'])
+
+    def write_game_logs(self, start, game_logs):
+        """
+        Write the game logs of consecutive players into the store
+        Arguments:
+            start: int, row of the first player
+            game_logs: list, game log dataframe of each player, with 'Age', 'Week' and '*Fantasy Points*' columns
+        Returns:
+            None
+        """
+        block = np.full((len(game_logs),) + self.points.shape[1:], np.nan, dtype = np.float32)
+        rows = np.repeat(np.arange(len(game_logs)), [len(g) for g in game_logs])
+        if len(rows):
+            ages = np.concatenate([np.asarray(g['Age'], dtype = np.int64) for g in game_logs]) - self.first_age
+            weeks = np.concatenate([np.asarray(g['Week'], dtype = np.int64) for g in game_logs]) - 1
+            points = np.concatenate([np.asarray(g['*Fantasy Points*'], dtype = float) for g in game_logs])
+            stored = (ages >= 0) & (ages < block.shape[1]) & (weeks >= 0) & (weeks < block.shape[2])
+            if not stored.all():
+                Logger.debug('Dropped {n} games outside the ages and weeks stored'.format(n = int((~stored).sum())))
+            block[rows[stored], ages[stored], weeks[stored]] = points[stored]
+        self.points[start:start + len(game_logs)] = block
+
+    def season_points(self, start, stop, *, per_game = False):
+        """
+        Aggregate the weekly points of a range of players to one value per season
+        Arguments:
+            start: int, row of the first player
+            stop: int, row after the last player
+            keyword:
+                per_game: boolean, default false, whether to average over the games played instead of summing them
+        Returns:
+            df: pd.DataFrame, fantasy points by age, with rows as players, columns as ages, NaN for seasons not played
+        """
+        block = np.asarray(self.points[start:stop])
+        games = (~np.isnan(block)).sum(axis = 2)
+        totals = np.nansum(block, axis = 2, dtype = float)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            values = np.where(games > 0, totals / games if per_game else totals, np.nan)
+        return pd.DataFrame(values, index = self.players[start:stop], columns = pd.Index(self.ages, name = 'Age'))
+
+    def chunks(self, *, per_game = False, chunk_size = CHUNK_SIZE):
+        """
+        Iterate over the players a chunk at a time, aggregated to one value per season
+        Arguments:
+            keyword:
+                per_game: boolean, default false, whether to average over the games played instead of summing them
+                chunk_size: int, default CHUNK_SIZE, number of players per chunk
+        Returns:
+            chunks: generator of pd.DataFrame, fantasy points by age of each chunk of players
+        """
+        for start in range(0, len(self), chunk_size):
+            yield self.season_points(start, min(start + chunk_size, len(self)), per_game = per_game)
+
+
+@instrumented
+def ingest_weekly(position, *, scraper = None, years = None, chunk_size = 256):
+    """
+    Scrape the game logs of every player of a position into a new weekly store, a chunk of players at a time so only
+      one chunk of game logs is ever held in memory
+    Arguments:
+        position: string, two letter position abbreviation
+        keyword:
+            scraper: module, default pfr_scraping, module exposing get_all_players_slugs and
+              get_player_game_logs_from_slug (pfr_scraping_stub can be used offline)
+            years: list, default the years in data-params.json, seasons to get the players of
+            chunk_size: int, default 256, number of players fetched before they are written to the store
+    Returns:
+        store: WeeklyStore, the weekly points of every player
+    """
+    scraper = scraper or etl.load_pfr_scraping()
+    if scraper is None:
+        raise ImportError('pfr_scraping is not available, pass a scraper to ingest_weekly')
+    with open(package_directory + '/data-params.json') as fh:
+        data_cfg = json.load(fh)
+    scraping_cfg = data_cfg.get('scraping', {})
+    limiter = etl.TokenBucket(1 / scraping_cfg.get('seconds_per_request', 6))
+    retries = scraping_cfg.get('retries', 3)
+    backoff = scraping_cfg.get('backoff', 2)
+    player_slugs = {}
+    for y in years or data_cfg['years']:
+        player_slugs.update(etl.call_with_retries(scraper.get_all_players_slugs, y, position, limiter = limiter, retries = retries, backoff = backoff))
+    players = list(player_slugs)
+    store = WeeklyStore.create(position, players)
+    for start in range(0, len(players), chunk_size):
+        chunk_slugs = {player : player_slugs[player] for player in players[start:start + chunk_size]}
+        game_logs = etl.get_player_career_stats(chunk_slugs, scraper = scraper, limiter = limiter, max_workers = scraping_cfg.get('max_workers', 4), retries = retries, backoff = backoff, method = 'get_player_game_logs_from_slug')
+        store.write_game_logs(start, [game_logs.get(player, EMPTY_GAME_LOG) for player in chunk_slugs])
+        store.points.flush()
+        Logger.debug('Ingested weekly points of {n} of {t} {pos} players'.format(n = start + len(chunk_slugs), t = len(players), pos = position))
+    return store
+
+
+@instrumented
+def fantasy_points_by_age(store, *, per_game = False, chunk_size = CHUNK_SIZE):
+    """
+    Aggregate a weekly store to the fantasy points by age table etl.get_fantasy_points_by_age returns
+    Arguments:
+        store: WeeklyStore, weekly points
+        keyword:
+            per_game: boolean, default false, whether to average over the games played instead of summing them
+            chunk_size: int, default CHUNK_SIZE, number of players read at a time
+    Returns:
+        df: pd.DataFrame, fantasy points by age, with rows as players, columns as the ages anyone played
+    """
+    age_df = pd.concat(list(store.chunks(per_game = per_game, chunk_size = chunk_size))) if len(store) else store.season_points(0, 0)
+    return age_df.dropna(axis = 1, how = 'all')
+
+
+def normalized_fantasy_points_chunks(store, *, by = 'age', min_years = 0, fp_cutoff_flat = 0, per_game = False, chunk_size = CHUNK_SIZE):
+    """
+    Filter and normalize a weekly store a chunk of players at a time, as analysis.normalized_fantasy_points_by_age and
+      analysis.normalized_fantasy_points_by_career_season do. Both are per player, so chunks match the full table's rows
+    Arguments:
+        store: WeeklyStore, weekly points
+        keyword:
+            by: string, default 'age', either 'age' or 'career_season'
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            per_game: boolean, default false, whether seasons are averaged over the games played instead of summed
+            chunk_size: int, default CHUNK_SIZE, number of players read at a time
+    Returns:
+        chunks: generator of pd.DataFrame, normalized fantasy points of each chunk of players that pass the filters,
+          with rows as players, columns as ages or career seasons
+    """
+    for age_df in store.chunks(per_game = per_game, chunk_size = chunk_size):
+        fp_age = analysis.normalize_fantasy_points_by_age(age_df.dropna(axis = 1, how = 'all'), min_years = min_years, fp_cutoff_flat = fp_cutoff_flat)
+        yield fp_age if by == 'age' else analysis.career_season_views(fp_age)[0]
+
+
+@instrumented
+def jump_statistics(store, *, by = 'age', min_years = 0, fp_cutoff_flat = 0, per_game = False, chunk_size = CHUNK_SIZE):
+    """
+    Stream a weekly store into the running paired t-test and median statistics of jump_stats.JumpStatsStore, a chunk of
+      players at a time, so only the normalized seasons (not the weeks) are ever held in memory
+    Arguments:
+        store: WeeklyStore, weekly points
+        keyword:
+            by: string, default 'age', either 'age' or 'career_season'
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            per_game: boolean, default false, whether seasons are averaged over the games played instead of summed
+            chunk_size: int, default CHUNK_SIZE, number of players read at a time
+    Returns:
+        stats: jump_stats.JumpStatsStore, statistics of every player, without their raw points
+    """
+    stats = jump_stats.JumpStatsStore(by, min_years, fp_cutoff_flat)
+    for age_df in store.chunks(per_game = per_game, chunk_size = chunk_size):
+        stats.accumulate(age_df, 1)
+        #Medians by age cover every age anyone played, as the columns of the season table do
+        played = age_df.columns[age_df.notna().any(axis = 0)]
+        if len(played):
+            low, high = stats.age_range or (played.min(), played.max())
+            stats.age_range = (int(min(low, played.min())), int(max(high, played.max())))
+    return stats
+
+
+def paired_t_test(store, *, by = 'age', alternative = 'greater', min_years = 0, fp_cutoff_flat = 0, per_game = False, chunk_size = CHUNK_SIZE):
+    """
+    Get the paired t-test p-values by jump of a weekly store, as analysis.paired_t_test_by_age and
+      analysis.paired_t_test_by_career_season do on the season table, streaming over the store
+    Arguments:
+        store: WeeklyStore, weekly points
+        keyword:
+            by: string, default 'age', either 'age' or 'career_season'
+            alternative: string, default 'greater', alternative hypothesis for paired t-test
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            per_game: boolean, default false, whether seasons are averaged over the games played instead of summed
+            chunk_size: int, default CHUNK_SIZE, number of players read at a time
+    Returns:
+        p_values: pd.Series, paired t-test p-values by jump
+    """
+    stats = jump_statistics(store, by = by, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat, per_game = per_game, chunk_size = chunk_size)
+    return stats.paired_t_test_table(alternative = alternative)['P-value'].rename(None)
+
+
+def median_fantasy_points(store, *, by = 'age', min_years = 0, fp_cutoff_flat = 0, per_game = False, chunk_size = CHUNK_SIZE):
+    """
+    Get the median normalized fantasy points of a weekly store, as analysis.median_fantasy_points_by_age and
+      analysis.median_fantasy_points_by_career_season do on the season table, streaming over the store
+    Arguments:
+        store: WeeklyStore, weekly points
+        keyword:
+            by: string, default 'age', either 'age' or 'career_season'
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            per_game: boolean, default false, whether seasons are averaged over the games played instead of summed
+            chunk_size: int, default CHUNK_SIZE, number of players read at a time
+    Returns:
+        medians: pd.Series, median fantasy points by age or career season
+    """
+    return jump_statistics(store, by = by, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat, per_game = per_game, chunk_size = chunk_size).medians()
+
+
+def median_and_p_vals(store, *, by = 'age', alternative = 'greater', min_years = 0, fp_cutoff_flat = 0, per_game = False, chunk_size = CHUNK_SIZE):
+    """
+    Get the changes in median and paired t-test p-values by jump of a weekly store, as analysis.median_and_p_vals_by_age
+      and analysis.median_and_p_vals_by_career_season do on the season table, in one pass over the store
+    Arguments:
+        store: WeeklyStore, weekly points
+        keyword:
+            by: string, default 'age', either 'age' or 'career_season'
+            alternative: string, default 'greater', alternative hypothesis for paired t-test
+            min_years: int, minimum number of years played
+            fp_cutoff_flat: float, minimum fantasy points to have hit in a year
+            per_game: boolean, default false, whether seasons are averaged over the games played instead of summed
+            chunk_size: int, default CHUNK_SIZE, number of players read at a time
+    Returns:
+        med_p_vals: pd.DataFrame, with columns Change in Median and P-value by jump
+    """
+    stats = jump_statistics(store, by = by, min_years = min_years, fp_cutoff_flat = fp_cutoff_flat, per_game = per_game, chunk_size = chunk_size)
+    return stats.median_and_p_vals(alternative = alternative)